@@ -0,0 +1,481 @@
+"""Offline benchmarks for mtweets.
+
+    python benchmark.py [--stream FILE] [--json] [--output FILE]
+                        [--compare FILE] [--tolerance 0.1] [benchmark ...]
+
+The network benchmarks run against a local mtweets.fakeserver, nothing
+leaves the machine. --json prints the results as a JSON document, --output
+saves it to a file and --compare checks the results against a saved file,
+exiting with status 1 when a metric regressed more than the tolerance.
+Metrics ending in _per_second are better higher, metrics with _bytes or
+_microseconds are better lower, the rest are informative. The sizes of the
+benchmark inputs (INPUT_METRICS) are informative too.
+
+--stream replays a stream file (one status per line) or a recording made by
+mtweets.replay.StreamRecorder instead of a synthetic stream.
+"""
+
+import sys, os
+import time
+import random
+import platform
+import tempfile
+
+from StringIO import StringIO
+from optparse import OptionParser
+
+sys.path.append('%s/oauth/'%(os.getcwd()))
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+from oauth import OAuthToken
+
+from mtweets.api import API
+from mtweets.api import __version__
+from mtweets.utils import TwitterClient
+from mtweets.asyncapi import AsyncAPI
+from mtweets.models import Model
+from mtweets.multipart import MultipartBody
+from mtweets.models import ModelParser
+from mtweets.streaming import Stream
+from mtweets.decoding import BACKENDS
+from mtweets.decoding import JSONDecoder
+from mtweets.decoding import get_decoder
+from mtweets.fakeserver import FakeTwitterServer
+from mtweets.dispatch import ProcessDispatcher
+from mtweets.streaming import _Producer
+from mtweets.streaming import _StreamReader
+from mtweets.replay import _Replay
+from mtweets.replay import recording_files
+
+############################################################################
+## Synthetic data
+############################################################################
+
+SOURCES = ['web', '<a href="http://twitter.com/devices">txt</a>',
+           '<a href="http://www.tweetdeck.com">TweetDeck</a>']
+LANGS = ['en', 'es', 'ja', 'pt']
+
+def make_user(id):
+    return {u'id': id, u'screen_name': u'user%d'%id, u'name': u'User %d'%id,
+            u'location': random.choice([u'Mexico', u'Tokyo', u'']),
+            u'description': u'about user %d'%id, u'url': None,
+            u'protected': False, u'verified': False,
+            u'followers_count': random.randint(0, 10000),
+            u'friends_count': random.randint(0, 1000),
+            u'statuses_count': random.randint(0, 50000),
+            u'favourites_count': 0, u'listed_count': 3,
+            u'created_at': u'Wed Mar 03 19:37:35 +0000 2010',
+            u'utc_offset': -21600, u'time_zone': u'Central Time (US & Canada)',
+            u'lang': random.choice(LANGS), u'geo_enabled': False,
+            u'profile_image_url': u'http://a1.twimg.com/profile_images/%d/a.png'%id,
+            u'following': None, u'notifications': None}
+
+def make_status(id, user):
+    return {u'id': id, u'text': u'status number %d from the benchmark'%id,
+            u'created_at': u'Wed Aug 11 19:37:35 +0000 2010',
+            u'source': unicode(random.choice(SOURCES)), u'truncated': False,
+            u'in_reply_to_status_id': None, u'in_reply_to_user_id': None,
+            u'in_reply_to_screen_name': None, u'favorited': False,
+            u'retweeted': False, u'retweet_count': 0, u'geo': None,
+            u'coordinates': None, u'place': None, u'contributors': None,
+            u'user': user}
+
+def make_timeline(pages, per_page=200, authors=50):
+    """Pages of statuses as decoded by the JSON library, every page is a new
+    object tree like it is for real responses."""
+    result = []
+    id = 1
+    for page in range(pages):
+        statuses = []
+        for i in range(per_page):
+            statuses.append(make_status(id, make_user(random.randint(1, authors))))
+            id += 1
+        result.append(statuses)
+    return result
+
+def best_time(func, number, repeat=3):
+    """Best wall time of number calls to func out of repeat runs."""
+    best = None
+    for i in range(repeat):
+        started = time.time()
+        for j in xrange(number):
+            func()
+        elapsed = time.time() - started
+        if best is None or elapsed < best:
+            best = elapsed
+    return max(best, 1e-9)
+
+_server = None
+
+def fake_server():
+    """Fake twitter shared by the network benchmarks, without rate limit."""
+    global _server
+    if _server is None:
+        _server = FakeTwitterServer(rate_limit=None, statuses=3200,
+                                    followers=50000, stream_limit=20000).start()
+    return _server
+
+def fake_client(klass=API, **kwargs):
+    client = klass(('consumer key', 'consumer secret'),
+                   base_urls=fake_server().base_urls(), **kwargs)
+    client.token = OAuthToken('token key', 'token secret')
+    return client
+
+############################################################################
+## Requests
+############################################################################
+
+def bench_signing(number=2000):
+    """OAuth signing of a resource request, building an OAuthRequest as
+    fetch_resource did before and with the cached signer of
+    TwitterClient.sign()."""
+    client = TwitterClient(('consumer key', 'consumer secret'))
+    client.token = OAuthToken('token key', 'token secret')
+    method = client._get_signature_method()
+    url = 'http://api.twitter.com/1/statuses/home_timeline.json'
+    params = {'count': 200, 'since_id': 21017907772, 'include_entities': 1}
+    def sign():
+        request = client._get_resource_request(url, dict(params), 'GET')
+        request.sign_request(method, client.consumer, client.token)
+        request.to_url()
+    def fast_sign():
+        '%s?%s'%(url, client.sign(url, params, 'GET'))
+    elapsed = best_time(sign, number)
+    fast_elapsed = best_time(fast_sign, number)
+    return {'requests': number,
+            'signatures_per_second': int(number / elapsed),
+            'signature_microseconds': round(elapsed / number * 1e6, 2),
+            'fast_signatures_per_second': int(number / fast_elapsed),
+            'fast_signature_microseconds': round(fast_elapsed / number * 1e6, 2),
+            'speedup': round(elapsed / fast_elapsed, 2)}
+
+def bench_decoding(pages=5):
+    """Decoding of timeline responses, as the resource decorators do, with
+    every JSON backend installed and with the models parser."""
+    random.seed(1)
+    bodies = [json.dumps(page) for page in make_timeline(pages)]
+    statuses = pages * 200
+    result = {'statuses': statuses,
+              'response_bytes': sum(len(body) for body in bodies) / pages}
+    for name in BACKENDS:
+        try:
+            decoder = JSONDecoder(name)
+        except ImportError:
+            continue
+        def decode():
+            for body in bodies:
+                decoder.load(StringIO(body))
+        result['%s_statuses_per_second'%name] = int(statuses / best_time(decode, 1))
+
+    decoder = get_decoder()
+    parser = ModelParser()
+    def decode_models():
+        for body in bodies:
+            parser.parse(decoder.load(StringIO(body)))
+    result['decoder'] = decoder.name
+    result['models_statuses_per_second'] = int(statuses / best_time(decode_models, 1))
+    return result
+
+def bench_multipart(size=700 * 1024, number=50):
+    """Multipart encoding of a profile image of size bytes with
+    MultipartBody, joined in memory and streamed from disk in the blocks
+    httplib sends."""
+    image = os.urandom(size)
+    fields = [('include_entities', 'true')]
+    fd, path = tempfile.mkstemp(suffix='.png')
+    try:
+        os.write(fd, image)
+        os.close(fd)
+        def join():
+            ''.join(MultipartBody(fields, [('image', path)]))
+        elapsed = best_time(join, number)
+        def stream():
+            body = MultipartBody(fields, [('image', path)])
+            while body.read(8192):
+                pass
+        streaming_elapsed = best_time(stream, number)
+    finally:
+        os.remove(path)
+    return {'image_bytes': size,
+            'encodings_per_second': int(number / elapsed),
+            'megabytes_per_second': round(size * number / elapsed / 1e6, 1),
+            'streaming_encodings_per_second': int(number / streaming_elapsed),
+            'streaming_megabytes_per_second': round(size * number / streaming_elapsed / 1e6, 1)}
+
+def bench_pagination(count=200):
+    """Paginated fetches from the fake server, with and without prefetch."""
+    api = fake_client()
+    result = {}
+    for prefetch in (False, True):
+        started = time.time()
+        statuses = 0
+        for status in api.iter_timeline('home_timeline_get', count=count,
+                                        prefetch=prefetch):
+            statuses += 1
+        elapsed = time.time() - started
+        key = prefetch and 'prefetch_' or ''
+        result['statuses'] = statuses
+        result['%stimeline_statuses_per_second'%key] = int(statuses / elapsed)
+
+        started = time.time()
+        ids = 0
+        for chunk in api.iter_follower_ids(user_id=1, prefetch=prefetch):
+            ids += len(chunk)
+        result['ids'] = ids
+        result['%sids_per_second'%key] = int(ids / (time.time() - started))
+    return result
+
+def bench_async_fanout(requests=200, latency=0.02, concurrency=20):
+    """Requests sent one after the other and fanned out with AsyncAPI to a
+    fake server that answers after latency seconds. The sync throughput
+    should be close to 1 / latency, the async one to concurrency / latency."""
+    server = FakeTwitterServer(latency=latency, rate_limit=None).start()
+    try:
+        api = API(('consumer key', 'consumer secret'), base_urls=server.base_urls())
+        api.token = OAuthToken('token key', 'token secret')
+        started = time.time()
+        for id in xrange(1, requests + 1):
+            api.user_show(user_id=id)
+        sync_elapsed = time.time() - started
+
+        async_api = AsyncAPI(api, concurrency)
+        try:
+            started = time.time()
+            async_api.gather([async_api.user_show(user_id=id)
+                              for id in xrange(1, requests + 1)])
+            async_elapsed = time.time() - started
+        finally:
+            async_api.close()
+    finally:
+        server.stop()
+    # time of a sync request beyond the latency of the server: the work of
+    # the client and the fake server, a stalled connection shows up here
+    overhead = sync_elapsed / requests - latency
+    return {'requests': requests,
+            'latency': latency,
+            'concurrency': concurrency,
+            'sync_overhead_microseconds': round(max(overhead, 0) * 1e6, 2),
+            'sync_requests_per_second': int(requests / sync_elapsed),
+            'async_requests_per_second': int(requests / async_elapsed),
+            'speedup': round(sync_elapsed / async_elapsed, 2)}
+
+def bench_stream_lines():
+    """Lines per second read by Stream from the fake streaming endpoint."""
+    stream = fake_client(Stream)
+    result = {}
+    for decode in (False, 'lazy', True):
+        started = time.time()
+        lines = 0
+        for status in stream.iter_sample(decode=decode):
+            lines += 1
+        name = {False: 'raw', 'lazy': 'lazy', True: 'decoded'}[decode]
+        result['lines'] = lines
+        result['%s_lines_per_second'%name] = int(lines / (time.time() - started))
+    return result
+
+############################################################################
+## Memory
+############################################################################
+
+def deep_sizeof(obj, seen=None):
+    """Bytes used by obj and everything it references, shared objects are
+    counted once."""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.iteritems():
+            size += deep_sizeof(key, seen) + deep_sizeof(value, seen)
+    elif isinstance(obj, (list, tuple)):
+        for item in obj:
+            size += deep_sizeof(item, seen)
+    elif isinstance(obj, Model):
+        for name in obj.__slots__ + ('extra',):
+            size += deep_sizeof(getattr(obj, name), seen)
+    return size
+
+def bench_models_memory(pages=20):
+    """Memory of timeline pages kept as raw dicts and as models."""
+    random.seed(1)
+    raw = make_timeline(pages)
+    random.seed(1)
+    parser = ModelParser()
+    models = [parser.parse(page) for page in make_timeline(pages)]
+    statuses = pages * 200
+    raw_bytes = deep_sizeof(raw)
+    model_bytes = deep_sizeof(models)
+    return {'statuses': statuses,
+            'dict_bytes': raw_bytes,
+            'model_bytes': model_bytes,
+            'dict_bytes_per_status': raw_bytes / statuses,
+            'model_bytes_per_status': model_bytes / statuses,
+            'ratio': round(float(model_bytes) / raw_bytes, 3)}
+
+############################################################################
+## Streaming
+############################################################################
+
+def write_stream_file(path, statuses=20000):
+    """Writes a synthetic stream, one JSON status per line."""
+    random.seed(1)
+    fp = open(path, 'wb')
+    try:
+        for id in xrange(1, statuses + 1):
+            status = make_status(id, make_user(random.randint(1, 5000)))
+            fp.write(json.dumps(status) + '\r\n')
+    finally:
+        fp.close()
+
+def handle_status(status):
+    """Handler of the pipeline benchmark, runs in the worker processes."""
+    if status['user']['followers_count'] > 5000:
+        return status['id']
+
+def _open_stream_file(path):
+    """Plain stream file or StreamRecorder recording played at full speed."""
+    if os.path.isdir(path) or path.endswith(('.gz', '.bz2')):
+        return _Replay(recording_files(path), None)
+    return open(path, 'rb')
+
+def _replay(path, callback, dispatcher=None):
+    fp = _open_stream_file(path)
+    try:
+        producer = _Producer()
+        producer.set_stream_callback(_StreamReader(fp), callback, dispatcher)
+        started = time.time()
+        producer.start()
+        producer.join()
+        if dispatcher is not None:
+            dispatcher.join()
+        return time.time() - started
+    finally:
+        fp.close()
+
+def bench_stream_pipeline(path=None, processes=None):
+    """Statuses per second decoded and handled by the producer thread and by
+    a ProcessDispatcher replaying the same stream file."""
+    remove = path is None
+    if path is None:
+        path = tempfile.mktemp(prefix='mtweets-stream-')
+        write_stream_file(path)
+    try:
+        lines = sum(1 for line in _open_stream_file(path) if line.strip())
+        loads = get_decoder().loads
+        def decode_and_handle(line):
+            if line.strip():
+                handle_status(loads(line))
+        thread_time = _replay(path, decode_and_handle)
+
+        dispatcher = ProcessDispatcher(processes, ordered=True)
+        process_time = _replay(path, handle_status, dispatcher)
+        return {'statuses': lines,
+                'processes': dispatcher.processes,
+                'thread_statuses_per_second': int(lines / thread_time),
+                'process_statuses_per_second': int(lines / process_time),
+                'errors': dispatcher.errors}
+    finally:
+        if remove:
+            os.remove(path)
+
+############################################################################
+## Main
+############################################################################
+
+BENCHMARKS = [
+    ('signing', bench_signing),
+    ('decoding', bench_decoding),
+    ('multipart', bench_multipart),
+    ('pagination', bench_pagination),
+    ('async_fanout', bench_async_fanout),
+    ('stream_lines', bench_stream_lines),
+    ('models_memory', bench_models_memory),
+    ('stream_pipeline', bench_stream_pipeline),
+]
+
+# benchmarks that accept --stream
+STREAM_FILE_BENCHMARKS = ('stream_pipeline',)
+
+# sizes of the data a benchmark works on, not results of mtweets
+INPUT_METRICS = ('response_bytes', 'image_bytes', 'dict_bytes',
+                 'dict_bytes_per_status')
+
+def compare(results, baseline, tolerance):
+    """compare(results, baseline, tolerance) -> list of regression messages"""
+    regressions = []
+    for name, metrics in results['benchmarks'].items():
+        old = baseline.get('benchmarks', {}).get(name, {})
+        for key, value in metrics.items():
+            previous = old.get(key)
+            if (key in INPUT_METRICS or not previous or
+                not isinstance(value, (int, float))):
+                continue
+            change = float(value - previous) / previous
+            if key.endswith('_per_second'):
+                worse = change < -tolerance
+            elif '_bytes' in key or '_microseconds' in key:
+                worse = change > tolerance
+            else:
+                continue
+            if worse:
+                regressions.append('%s.%s: %s -> %s (%+.1f%%)'%(name, key, previous, value, change * 100))
+    return regressions
+
+def main():
+    parser = OptionParser(usage="%prog [options] [benchmark ...]")
+    parser.add_option('--stream', dest='stream', default=None,
+                      help="recorded stream file replayed by stream benchmarks")
+    parser.add_option('--json', dest='json', action='store_true', default=False,
+                      help="print the results as JSON")
+    parser.add_option('--output', dest='output', default=None,
+                      help="save the JSON results to this file")
+    parser.add_option('--compare', dest='compare', default=None,
+                      help="JSON results of a previous run to compare with")
+    parser.add_option('--tolerance', dest='tolerance', type='float', default=0.1,
+                      help="allowed relative regression, 0.1 by default")
+    options, names = parser.parse_args()
+
+    results = {'mtweets': __version__,
+               'python': platform.python_version(),
+               'platform': platform.platform(),
+               'time': int(time.time()),
+               'benchmarks': {}}
+    for name, bench in BENCHMARKS:
+        if names and name not in names:
+            continue
+        if name in STREAM_FILE_BENCHMARKS and options.stream:
+            result = bench(options.stream)
+        else:
+            result = bench()
+        results['benchmarks'][name] = result
+        if not options.json:
+            print name, result
+
+    if options.json:
+        print json.dumps(results, indent=2, sort_keys=True)
+    if options.output:
+        fp = open(options.output, 'w')
+        try:
+            json.dump(results, fp, indent=2, sort_keys=True)
+        finally:
+            fp.close()
+    if options.compare:
+        fp = open(options.compare)
+        try:
+            baseline = json.load(fp)
+        finally:
+            fp.close()
+        regressions = compare(results, baseline, options.tolerance)
+        for message in regressions:
+            print >>sys.stderr, 'regression', message
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -13,3 +13,14 @@ like as Tweet entities, and how use each parameter
 
 from api import API
 from streaming import Stream
+from streaming import ReconnectPolicy
+from asyncapi import AsyncAPI
+from apipool import APIPool
+from batch import BatchExecutor
+from batch import Mutation
+from search import SearchPoller
+from search import SearchScheduler
+from dispatch import StreamDispatcher
+from dispatch import ProcessDispatcher
+from replay import StreamRecorder
+from replay import ReplayStream
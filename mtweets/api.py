@@ -16,16 +16,30 @@ like as Tweet entities, and how use each parameter
 __author__ = "Luis C. Cruz <carlitos.kyo@gmail.com>"
 __version__ = "0.1"
 
-import urllib, mimetypes, mimetools
+import urllib
 
 from urlparse import urlparse
 
 from mtweets.utils import AuthError
 from mtweets.utils import RequestError
 from mtweets.utils import TwitterClient
+from mtweets.paging import compact_ids
+from mtweets.paging import iter_cursor
+from mtweets.paging import iter_timeline
+from mtweets.paging import iter_search
+from mtweets.paging import SEARCH_LIMIT
+from mtweets.concurrency import WorkerPool
+from mtweets.batch import BatchExecutor
+from mtweets.batch import Mutation
+from mtweets.ratelimit import DEFAULT_FAMILY
 from mtweets.utils import simple_decorator as _simple_decorator
 from mtweets.utils import authentication_required as _authentication_required
 
+# Maximum number of users accepted by users/lookup in a single request
+USER_LOOKUP_BATCH = 100
+# Maximum number of users added by a single create_all request
+LIST_CREATE_ALL_BATCH = 100
+
 class API(TwitterClient):
     """ This handle simple authentication flow.
     
@@ -126,12 +140,7 @@ class API(TwitterClient):
         """
         version = version or self.apiVersion
         
-        if len(kwargs) > 0:
-            url = "http://api.twitter.com/%d/statuses/public_timeline.json?%s"%(version, urllib.urlencode(kwargs))
-        else:
-            url = "http://api.twitter.com/%d/statuses/public_timeline.json"%version
-            
-        return self.opener.open(url)
+        return self.fetch_endpoint('public_timeline_get', (), kwargs, version)
         
     @_authentication_required
     def home_timeline_get(self, version=None, **kwargs):
@@ -179,7 +188,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/statuses/home_timeline.json"%version, kwargs)      
+        return self.fetch_endpoint('home_timeline_get', (), kwargs, version)      
     
     @_authentication_required
     def friends_timeline_get(self, version=None, **kwargs):
@@ -239,7 +248,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/statuses/friends_timeline.json"%version, kwargs)
+        return self.fetch_endpoint('friends_timeline_get', (), kwargs, version)
         
     @_simple_decorator
     def user_timeline_get(self, version=None, **kwargs): 
@@ -312,7 +321,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/statuses/user_timeline.json"%version, kwargs)
+        return self.fetch_endpoint('user_timeline_get', (), kwargs, version)
     
     @_authentication_required
     def mentions_get(self, version=None, **kwargs):
@@ -373,7 +382,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/statuses/mentions.json"%version, kwargs)
+        return self.fetch_endpoint('mentions_get', (), kwargs, version)
         
     @_authentication_required
     def retweeted_of_me_get(self, version=None, **kwargs):
@@ -417,7 +426,7 @@ class API(TwitterClient):
 
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/statuses/retweets_of_me.json"%version, kwargs)
+        return self.fetch_endpoint('retweeted_of_me_get', (), kwargs, version)
     
     @_authentication_required
     def retweeted_by_me_get(self, version=None, **kwargs):
@@ -460,7 +469,7 @@ class API(TwitterClient):
 
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/statuses/retweeted_by_me.json"%version, kwargs)
+        return self.fetch_endpoint('retweeted_by_me_get', (), kwargs, version)
                 
     @_authentication_required
     def retweeted_to_me_get(self, version=None, **kwargs):
@@ -503,8 +512,44 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/statuses/retweeted_to_me.json"%version, kwargs)
+        return self.fetch_endpoint('retweeted_to_me_get', (), kwargs, version)
+        
+    def iter_timeline(self, method, since_id=None, max_id=None, count=200,
+                      limit=None, prefetch=True, **kwargs):
+        """iter_timeline(method, since_id=None, max_id=None, count=200, limit=None, prefetch=True)
         
+        Generator that walks a timeline backward yielding its statuses from
+        the newest to the oldest. The next max_id is computed from the last
+        status of each page and the boundary status is not repeated.
+        
+        >>> for status in api.iter_timeline('home_timeline_get', since_id=saved_id):
+        ...     archive(status)
+        
+        Parameters:
+            method - Name of the timeline method (home_timeline_get,
+                     user_timeline_get, mentions_get, retweeted_of_me_get,
+                     direct_messages_get, ...) or the bound method itself.
+            
+            since_id - Stop when this status is reached, useful to catch up
+                       from a saved status id.
+                       
+            max_id - Start from this status id (included).
+            
+            count - Statuses requested per page, up to 200.
+            
+            limit - Maximum number of statuses to return, defaults to the
+                    statuses twitter keeps for the timeline (800 or 3200).
+            
+            prefetch - Request the next page in a background thread while the
+                       current one is consumed. Default True.
+            
+            Any other parameter is passed to the timeline method.
+        """
+        if isinstance(method, basestring):
+            method = getattr(self, method)
+        return iter_timeline(method, since_id, max_id, count, limit, prefetch,
+                             **kwargs)
+    
     ############################################################################
     ## Status methods
     ############################################################################
@@ -538,7 +583,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/statuses/show/%d.json"%(version, id), kwargs)
+        return self.fetch_endpoint('status_show', (id,), kwargs, version)
         
     @_authentication_required
     def status_update(self, status, version=None, **kwargs):
@@ -592,7 +637,7 @@ class API(TwitterClient):
         """
         version = version or self.apiVersion
         kwargs['status'] = status
-        return self.fetch_resource("http://api.twitter.com/%d/statuses/update.json"%version, kwargs, 'POST')
+        return self.fetch_endpoint('status_update', (), kwargs, version)
         
     @_authentication_required
     def status_destroy(self, id, version=None, **kwargs):
@@ -623,7 +668,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/statuses/destroy/%s.json"%(version, id), kwargs, 'POST')
+        return self.fetch_endpoint('status_destroy', (id,), kwargs, version)
         
     @_authentication_required    
     def status_retweet(self, id, version=None, **kwargs):
@@ -653,7 +698,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/statuses/retweet/%s.json"%(version, id), kwargs, 'POST')
+        return self.fetch_endpoint('status_retweet', (id,), kwargs, version)
         
     @_simple_decorator
     def retweets_get(self, id, version=None, **kwargs):
@@ -686,7 +731,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/statuses/retweets/%s.json"%(version, id), kwargs)
+        return self.fetch_endpoint('retweets_get', (id,), kwargs, version)
     
     @_authentication_required
     def retweeted_by_get(self, id, version=None, **kwargs):
@@ -721,7 +766,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/statuses/%s/retweeted_by.json"%(version, id), kwargs)
+        return self.fetch_endpoint('retweeted_by_get', (id,), kwargs, version)
     
     @_authentication_required
     def retweeted_by_ids_get(self, id, version=None, **kwargs):
@@ -756,7 +801,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/statuses/%s/retweeted_by/ids.json"%(version, id), kwargs)
+        return self.fetch_endpoint('retweeted_by_ids_get', (id,), kwargs, version)
     
     ############################################################################
     ## User methods
@@ -808,7 +853,7 @@ class API(TwitterClient):
         if screen_name is not None:
             kwargs['screen_name'] = screen_name
             
-        return self.fetch_resource("http://api.twitter.com/%d/users/show.json"%(version), kwargs)
+        return self.fetch_endpoint('user_show', (), kwargs, version)
     
     @_authentication_required
     def user_lookup(self, ids=None, screen_names=None, version=None, **kwargs):
@@ -842,16 +887,79 @@ class API(TwitterClient):
         Statuses for the users in question will be returned inline if they exist.
         Requires authentication!
         """
-        if user_id is None and screen_name is None:
-            raise RequestError('user_lookup(): Need one of the following parameter: user_id or screen_name')
+        if ids is None and screen_names is None:
+            raise RequestError('user_lookup(): Need one of the following parameter: ids or screen_names')
         
         version = version or self.apiVersion
         if ids is not None:
-            kwargs['user_id'] = ','.join(ids)
+            kwargs['user_id'] = ','.join([str(id) for id in ids])
         if screen_names is not None:
             kwargs['screen_name'] = ','.join(screen_names)
             
-        return self.fetch_resource("http://api.twitter.com/%d/users/lookup.json"%version, kwargs, 'POST')
+        return self.fetch_endpoint('user_lookup', (), kwargs, version)
+    
+    def hydrate_users(self, ids, screen_names=False, concurrency=4,
+                      version=None, **kwargs):
+        """hydrate_users(ids, screen_names=False, concurrency=4) -> (users, missing)
+        
+        Returns the extended information of any number of users. The ids are
+        split in batches of 100 for user_lookup and the batches are requested
+        concurrently.
+        
+        Parameters:
+            ids - Any iterable of user ids, or screen names if screen_names
+                  is True. Repeated values are requested once.
+            
+            screen_names - ids are screen names instead of user ids.
+            
+            concurrency - Number of batches requested at the same time.
+            
+            include_entities - see user_lookup.
+            
+            version (number) - API version to request. Entire mtweets class
+                               defaults to 1, but you can override on a 
+                               function-by-function or class basis - (version=2), etc.
+        
+        users is a list with the found users in the same order of ids, and
+        missing the ids that were not returned (suspended or deleted users).
+        Requires authentication!
+        """
+        if screen_names:
+            key = lambda user: user['screen_name'].lower()
+            normalize = lambda value: value.lower()
+            param = 'screen_names'
+        else:
+            key = lambda user: user['id']
+            normalize = long
+            param = 'ids'
+        
+        unique = []
+        seen = set()
+        for value in ids:
+            value = normalize(value)
+            if value not in seen:
+                seen.add(value)
+                unique.append(value)
+        
+        def lookup(batch):
+            params = dict(kwargs)
+            params[param] = batch
+            return self.user_lookup(version=version, **params)
+        
+        batches = [unique[i:i + USER_LOOKUP_BATCH]
+                   for i in xrange(0, len(unique), USER_LOOKUP_BATCH)]
+        workers = WorkerPool(max(1, min(concurrency, len(batches))))
+        try:
+            found = {}
+            for users in workers.map(lookup, batches):
+                for user in users:
+                    found[key(user)] = user
+        finally:
+            workers.shutdown()
+        
+        users = [found[value] for value in unique if value in found]
+        missing = [value for value in unique if value not in found]
+        return users, missing
         
     @_authentication_required
     def user_search(self, query, version=None, **kwargs):
@@ -886,7 +994,7 @@ class API(TwitterClient):
         """
         version = version or self.apiVersion
         kwargs['q'] = query
-        return self.fetch_resource("http://api.twitter.com/%d/users/search.json"%version, kwargs)
+        return self.fetch_endpoint('user_search', (), kwargs, version)
         
     @_simple_decorator
     def user_suggestions(self, version=None):
@@ -902,7 +1010,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/users/suggestions.json"%version)
+        return self.fetch_endpoint('user_suggestions', version=version)
     
     @_simple_decorator
     def user_suggestions_slug(self, slug, version=None):
@@ -920,7 +1028,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/users/suggestions/%s.json"%(version, slug))
+        return self.fetch_endpoint('user_suggestions_slug', (slug,), version=version)
     
     @_simple_decorator
     def user_profile_image(self, screen_name, version=None, **kwargs):
@@ -953,7 +1061,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/users/profile_image/%s.json"%(version, screen_name), kwargs)
+        return self.fetch_endpoint('user_profile_image', (screen_name,), kwargs, version)
     
     @_simple_decorator
     def user_statuses_friends(self, version=None, **kwargs):
@@ -1004,7 +1112,7 @@ class API(TwitterClient):
                that user).
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/statuses/friends.json"%(version), kwargs)
+        return self.fetch_endpoint('user_statuses_friends', (), kwargs, version)
     
     @_simple_decorator
     def user_statuses_followers(self, version=None, **kwargs):
@@ -1050,7 +1158,7 @@ class API(TwitterClient):
                that user).
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/statuses/followers.json"%(version), kwargs)
+        return self.fetch_endpoint('user_statuses_followers', (), kwargs, version)
     
     ############################################################################
     ## Trends methods
@@ -1070,7 +1178,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.opener.open("http://api.twitter.com/%d/trends.json"%(version))
+        return self.fetch_endpoint('trends_get', version=version)
         
     @_simple_decorator
     def trends_current(self, version=None, **kwargs):
@@ -1089,11 +1197,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        if len(kwargs) > 0:
-            url = "http://api.twitter.com/%d/trends/current.json?%s"%(version, urllib.urlencode(kwargs))
-        else:
-            url = "http://api.twitter.com/%d/trends/current.json"%version                
-        return self.opener.open(url)        
+        return self.fetch_endpoint('trends_current', (), kwargs, version)
     
     @_simple_decorator
     def trends_dialy(self, version=None, **kwargs):
@@ -1115,11 +1219,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        if len(kwargs) > 0:
-            url = "http://api.twitter.com/%s/trends/daily.json?%s"%(version, urllib.urlencode(kwargs))
-        else:
-            url = "http://api.twitter.com/%s/trends/daily.json"%version                
-        return self.opener.open(url)
+        return self.fetch_endpoint('trends_dialy', (), kwargs, version)
 
     @_simple_decorator
     def trends_weekly(self, version=None, **kwargs):
@@ -1141,11 +1241,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        if len(kwargs) > 0:
-            url = "http://api.twitter.com/%d/trends/weekly.json?%s"%(version, urllib.urlencode(kwargs))
-        else:
-            url = "http://api.twitter.com/%d/trends/weekly.json"%version                
-        return self.opener.open(url)
+        return self.fetch_endpoint('trends_weekly', (), kwargs, version)
         
     ############################################################################
     ## Local trends methods
@@ -1179,11 +1275,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        if len(kwargs) > 0:
-            url = "http://api.twitter.com/%d/trends/available.json?%s"%(version, urllib.urlencode(kwargs))
-        else:
-            url = "http://api.twitter.com/%d/trends/available.json"%version                
-        return self.opener.open(url)
+        return self.fetch_endpoint('trends_available', (), kwargs, version)
     
     @_simple_decorator
     def trends_woeid_get(self, woeid, version=None):
@@ -1210,7 +1302,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.opener.open("http://api.twitter.com/%d/trends/%d.json"%(version, woeid))
+        return self.fetch_endpoint('trends_woeid_get', (woeid,), version=version)
     
     ############################################################################
     ## List methods
@@ -1239,7 +1331,7 @@ class API(TwitterClient):
         """
         version = version or self.apiVersion
         kwargs['name'] = name
-        return self.fetch_resource("http://api.twitter.com/%d/%s/lists.json"%(version, user), kwargs, 'POST')
+        return self.fetch_endpoint('user_list', (user,), kwargs, version)
     
     @_authentication_required
     def user_list_id(self, user, id, version=None, **kwargs):
@@ -1264,7 +1356,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/%s/lists/%s.json"%(version, user, id), kwargs, 'POST')
+        return self.fetch_endpoint('user_list_id', (user, id), kwargs, version)
             
     @_authentication_required    
     def user_list_get(self, user, version=None, **kwargs):
@@ -1287,7 +1379,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/%s/lists.json"%(version, user), kwargs)
+        return self.fetch_endpoint('user_list_get', (user,), kwargs, version)
     
     @_authentication_required
     def user_list_id_get(self, user, id, version=None, **kwargs):
@@ -1306,7 +1398,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/%s/lists/%s.json"%(version, user, id), kwargs)
+        return self.fetch_endpoint('user_list_id_get', (user, id), kwargs, version)
     
     @_authentication_required
     def user_list_id_delete(self, user, id, version=None, **kwargs):
@@ -1325,7 +1417,7 @@ class API(TwitterClient):
         """
         version = version or self.apiVersion
         kwargs['_method'] = 'DELETE' # to support REST delete method
-        return self.fetch_resource("http://api.twitter.com/%d/%s/lists/%s.json"%(version, user, id), kwargs, 'POST')
+        return self.fetch_endpoint('user_list_id_delete', (user, id), kwargs, version)
     
     @_simple_decorator
     def user_list_statuses_get(self, user, id, version=None, **kwargs):
@@ -1365,7 +1457,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.opener.open("http://api.twitter.com/%d/%s/lists/%s/statuses.json?%s"%(version, user, id, urllib.urlencode(kwargs)))
+        return self.fetch_endpoint('user_list_statuses_get', (user, id), kwargs, version)
         
     @_authentication_required
     def user_list_memberships_get(self, user, version=None, **kwargs):
@@ -1386,7 +1478,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/%s/lists/memberships.json"%(version, user), kwargs)
+        return self.fetch_endpoint('user_list_memberships_get', (user,), kwargs, version)
     
     @_authentication_required
     def user_list_subscriptions_get(self, user, version=None, **kwargs):
@@ -1407,7 +1499,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/%s/lists/subscriptions.json"%(version, user), kwargs)
+        return self.fetch_endpoint('user_list_subscriptions_get', (user,), kwargs, version)
     
     ############################################################################
     ## List members methods
@@ -1443,7 +1535,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/%s/%s/members.json"%(version, user, id), kwargs)
+        return self.fetch_endpoint('user_list_members_get', (user, id), kwargs, version)
     
     @_authentication_required
     def user_list_members_add(self, user, list_id, user_id, version=None, **kwargs):
@@ -1465,11 +1557,11 @@ class API(TwitterClient):
         """
         version = version or self.apiVersion
         kwargs['id'] = user_id
-        return self.fetch_resource("http://api.twitter.com/%d/%s/%s/members.json"%(version, user, list_id), kwargs, 'POST')
+        return self.fetch_endpoint('user_list_members_add', (user, list_id), kwargs, version)
     
     @_authentication_required
-    def user_list_members_create_all(self, user, list_id, ids, screen_names, version=None, **kwargs):
-        """user_list_members_create_all(user, list_id, ids, screen_names)
+    def user_list_members_create_all(self, user, list_id, ids=None, screen_names=None, version=None, **kwargs):
+        """user_list_members_create_all(user, list_id, ids=None, screen_names=None)
         
         Adds multiple members to a list, by specifying a comma-separated list of
         member ids or screen names. The authenticated user must own the list to
@@ -1492,10 +1584,95 @@ class API(TwitterClient):
         """
         version = version or self.apiVersion
         if ids is not None:
-            kwargs['user_id'] = ','.join(ids)
+            kwargs['user_id'] = ','.join([str(id) for id in ids])
         if screen_names is not None:
             kwargs['screen_name'] = ','.join(screen_names)
-        return self.fetch_resource("http://api.twitter.com/%s/%s/%s/create_all.json"%(version, user, list_id), kwargs, 'POST')
+        return self.fetch_endpoint('user_list_members_create_all', (user, list_id), kwargs, version)
+    
+    def sync_list_members(self, user, list_id, target_ids, concurrency=8,
+                          prefetch=True, verify=False, version=None):
+        """sync_list_members(user, list_id, target_ids, concurrency=8, prefetch=True, verify=False)
+        
+        Makes the members of a list the users of target_ids. The current
+        members are paged with cursors and compared with the target in
+        memory, the missing users are added with create_all in batches of
+        100 and the users not in the target are removed concurrently. The
+        mutations are retried like in mtweets.batch.BatchExecutor.
+        
+        Parameters:
+            user - username of the owner of the list.
+            
+            list_id - The id or slug of the list.
+            
+            target_ids - Any iterable of user ids.
+            
+            concurrency - Number of requests running at the same time.
+            
+            prefetch - Request the next page of members while the current
+                       one is compared.
+            
+            verify - Read the members again after the changes to report the
+                     users really added.
+            
+            version (number) - API version to request. Entire mtweets class
+                               defaults to 1, but you can override on a 
+                               function-by-function or class basis - (version=2), etc.
+        
+        Returns a dict with the number of members before, the users sent to
+        create_all (requested_additions), removed and unchanged, the failed
+        MutationResult, the requests sent (calls), the requests of adding and
+        removing each user with its own call (naive_calls) and the difference
+        (calls_saved). create_all skips the users it can not add (suspended,
+        protected...) without an error, with verify the dict also has the
+        users really added (added) and the ids that were not (not_added).
+        Requires authentication!
+        """
+        def read_members():
+            pages = 0
+            members = set()
+            for users in iter_cursor(self.user_list_members_get, 'users', -1,
+                                     prefetch, user=user, id=list_id,
+                                     version=version, models=False):
+                pages += 1
+                members.update([user_data['id'] for user_data in users])
+            return members, pages
+        
+        current, pages = read_members()
+        
+        target = set([long(id) for id in target_ids])
+        additions = sorted(target - current)
+        removals = sorted(current - target)
+        
+        mutations = [Mutation('user_list_members_create_all', user, list_id,
+                              additions[i:i + LIST_CREATE_ALL_BATCH],
+                              version=version)
+                     for i in xrange(0, len(additions), LIST_CREATE_ALL_BATCH)]
+        mutations.extend([Mutation('user_list_members_delete', user, list_id,
+                                   id, version=version) for id in removals])
+        report = BatchExecutor(self, concurrency).run(mutations)
+        
+        requested = removed = 0
+        for result in report.succeeded:
+            if result.mutation.method == 'user_list_members_create_all':
+                requested += len(result.mutation.args[2])
+            else:
+                removed += 1
+        calls = pages + report.summary()['calls']
+        naive_calls = pages + len(additions) + len(removals)
+        result = {'members': len(current),
+                  'requested_additions': requested,
+                  'removed': removed,
+                  'unchanged': len(current & target),
+                  'failed': report.failed}
+        if verify:
+            after, verify_pages = read_members()
+            calls += verify_pages
+            result['added'] = len(after.intersection(additions))
+            result['not_added'] = [id for id in additions if id not in after]
+        result['calls'] = calls
+        result['naive_calls'] = naive_calls
+        result['calls_saved'] = naive_calls - calls
+        return result
     
     @_authentication_required
     def user_list_members_delete(self, user, list_id, user_id, version=None, **kwargs):
@@ -1518,7 +1695,7 @@ class API(TwitterClient):
         version = version or self.apiVersion
         kwargs['id'] = user_id
         kwargs['_method'] = 'DELETE'
-        return self.fetch_resource("http://api.twitter.com/%d/%s/%s/members.json"%(version, user, list_id), kwargs, 'POST')
+        return self.fetch_endpoint('user_list_members_delete', (user, list_id), kwargs, version)
         
     @_authentication_required
     def user_list_is_member(self, user, list_id, user_id, version=None, **kwargs):
@@ -1547,7 +1724,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/%s/%s/members/%s.json"%(version, user, list_id, user_id), kwargs)
+        return self.fetch_endpoint('user_list_is_member', (user, list_id, user_id), kwargs, version)
     
     ############################################################################
     ## List subscribers methods
@@ -1583,7 +1760,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/%s/%s/subscribers.json"%(version, user, id), kwargs)
+        return self.fetch_endpoint('user_list_subscribers_get', (user, id), kwargs, version)
     
     @_authentication_required
     def user_list_subscribers(self, user, list_id, version=None, **kwargs):
@@ -1601,7 +1778,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/%s/%s/subscribers.json"%(version, user, list_id), kwargs, 'POST')
+        return self.fetch_endpoint('user_list_subscribers', (user, list_id), kwargs, version)
     
     @_authentication_required
     def user_list_subscribers_delete(self, user, list_id, version=None, **kwargs):
@@ -1620,7 +1797,7 @@ class API(TwitterClient):
         """
         version = version or self.apiVersion
         kwargs['_method'] = 'DELETE'
-        return self.fetch_resource("http://api.twitter.com/%d/%s/%s/subscribers.json"%(version, user, list_id), kwargs, 'POST')
+        return self.fetch_endpoint('user_list_subscribers_delete', (user, list_id), kwargs, version)
             
     @_authentication_required
     def user_list_is_subscriber(self, user, list_id, user_id, version=None, **kwargs):
@@ -1649,7 +1826,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/%s/%s/subscribers/%s.json"%(version, user, list_id, user_id), kwargs)
+        return self.fetch_endpoint('user_list_is_subscriber', (user, list_id, user_id), kwargs, version)
     
     ############################################################################
     ## Direct messages methods
@@ -1693,7 +1870,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/direct_messages.json"%(version), kwargs)
+        return self.fetch_endpoint('direct_messages_get', (), kwargs, version)
             
     @_authentication_required
     def direct_messages_sent_get(self, version=None, **kwargs):
@@ -1732,7 +1909,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/direct_messages/sent.json"%(version), kwargs)
+        return self.fetch_endpoint('direct_messages_sent_get', (), kwargs, version)
     
     @_authentication_required
     def direct_messages_new(self, text, user_id=None, screen_name=None, version = None, **kwargs):
@@ -1778,7 +1955,7 @@ class API(TwitterClient):
         if screen_name is not None:
             kwargs['screen_name'] = screen_name
             
-        return self.fetch_resource("http://api.twitter.com/%d/direct_messages/new.json"%(version), kwargs, 'POST')        
+        return self.fetch_endpoint('direct_messages_new', (), kwargs, version)        
 
     @_authentication_required
     def direct_messages_destroy(self, id, version=None, **kwargs):
@@ -1804,7 +1981,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/direct_messages/destroy/%s.json" % (version, id), kwargs, 'POST')
+        return self.fetch_endpoint('direct_messages_destroy', (id,), kwargs, version)
     
     ############################################################################
     ## Friendship methods
@@ -1837,7 +2014,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/friendships/create.json"%(version), kwargs, 'POST')
+        return self.fetch_endpoint('friendship_create', (), kwargs, version)
     
     @_authentication_required    
     def friendship_destroy(self, version=None, **kwargs):
@@ -1863,7 +2040,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/friendships/destroy.json"%(version), kwargs, 'POST')
+        return self.fetch_endpoint('friendship_destroy', (), kwargs, version)
     
     @_simple_decorator
     def friendship_exists(self, user_a, user_b, version=None, **kwargs):
@@ -1886,7 +2063,7 @@ class API(TwitterClient):
         version = version or self.apiVersion
         kwargs['user_a'] = user_a
         kwargs['user_b'] = user_b
-        return self.fetch_resource("http://api.twitter.com/%d/friendships/exists.json"%(version), kwargs)
+        return self.fetch_endpoint('friendship_exists', (), kwargs, version)
         
     @_simple_decorator
     def friendship_show(self, version=None, **kwargs):
@@ -1908,7 +2085,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/friendships/show.json"%(version), kwargs)
+        return self.fetch_endpoint('friendship_show', (), kwargs, version)
     
     @_authentication_required
     def friendship_incoming(self, version=None, **kwargs):
@@ -1928,7 +2105,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/friendships/incoming.json"%(version), kwargs)
+        return self.fetch_endpoint('friendship_incoming', (), kwargs, version)
     
     @_authentication_required
     def friendship_outgoing(self, version=None, **kwargs):
@@ -1949,7 +2126,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/friendships/outgoing.json"%(version), kwargs)
+        return self.fetch_endpoint('friendship_outgoing', (), kwargs, version)
         
     ############################################################################
     ## Friends and Followers methods
@@ -1998,7 +2175,7 @@ class API(TwitterClient):
         if screen_name is not None:
             kwargs['screen_name'] = screen_name
             
-        return self.fetch_resource("http://api.twitter.com/%d/friends/ids.json"%(version), kwargs)
+        return self.fetch_endpoint('friendship_ids_get', (), kwargs, version)
     
     @_simple_decorator
     def followers_ids_get(self, user_id=None, screen_name=None, version=None, **kwargs):
@@ -2042,7 +2219,66 @@ class API(TwitterClient):
         if screen_name is not None:
             kwargs['screen_name'] = screen_name
             
-        return self.fetch_resource("http://api.twitter.com/%d/followers/ids.json"%(version), kwargs)
+        return self.fetch_endpoint('followers_ids_get', (), kwargs, version)
+    
+    def iter_friend_ids(self, user_id=None, screen_name=None, compact=False,
+                        prefetch=True, version=None, **kwargs):
+        """iter_friend_ids(user_id=None, screen_name=None, compact=False, prefetch=True)
+        
+        Generator over the IDs of every user the specified user is following,
+        yielding one chunk (up to 5000 IDs) per page. Paging with the cursor
+        is done for you.
+        
+        Parameters:
+            user_id, screen_name - see friendship_ids_get.
+            
+            compact - Yield arrays of 64 bits integers instead of lists of
+                      ints, they take about a quarter of the memory.
+            
+            prefetch - Request the next page in a background thread while the
+                       current one is consumed. Default True.
+            
+            version (number) - API version to request. Entire mtweets class
+                               defaults to 1, but you can override on a 
+                               function-by-function or class basis - (version=2), etc.
+        """
+        return self._iter_ids(self.friendship_ids_get, user_id, screen_name,
+                              compact, prefetch, version, kwargs)
+    
+    def iter_follower_ids(self, user_id=None, screen_name=None, compact=False,
+                          prefetch=True, version=None, **kwargs):
+        """iter_follower_ids(user_id=None, screen_name=None, compact=False, prefetch=True)
+        
+        Generator over the IDs of every user following the specified user,
+        yielding one chunk (up to 5000 IDs) per page. Paging with the cursor
+        is done for you.
+        
+        Parameters:
+            user_id, screen_name - see followers_ids_get.
+            
+            compact - Yield arrays of 64 bits integers instead of lists of
+                      ints, they take about a quarter of the memory.
+            
+            prefetch - Request the next page in a background thread while the
+                       current one is consumed. Default True.
+            
+            version (number) - API version to request. Entire mtweets class
+                               defaults to 1, but you can override on a 
+                               function-by-function or class basis - (version=2), etc.
+        """
+        return self._iter_ids(self.followers_ids_get, user_id, screen_name,
+                              compact, prefetch, version, kwargs)
+    
+    def _iter_ids(self, method, user_id, screen_name, compact, prefetch,
+                  version, kwargs):
+        cursor = kwargs.pop('cursor', -1)
+        pages = iter_cursor(method, 'ids', cursor, prefetch, user_id=user_id,
+                            screen_name=screen_name, version=version, **kwargs)
+        for ids in pages:
+            if compact:
+                yield compact_ids(ids)
+            else:
+                yield ids
 
     ############################################################################
     ## Friends and Followers methods
@@ -2073,7 +2309,7 @@ class API(TwitterClient):
                                 function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/account/verify_credentials.json"%version, kwargs)
+        return self.fetch_endpoint('verify_credentials', (), kwargs, version)
     
     @_simple_decorator
     def rate_limit_status(self, version=None, **kwargs):
@@ -2092,7 +2328,24 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/account/rate_limit_status.json"%version, kwargs)
+        return self.fetch_endpoint('rate_limit_status', (), kwargs, version)
+    
+    def rate_limit_sync(self, version=None):
+        """ rate_limit_sync()
+        
+        Seeds self.rate_limiter with the budget returned by rate_limit_status,
+        call it once before starting a job to schedule from the first request.
+        Returns the rate limit status. This call does not count against the
+        rate limit.
+        
+        Parameters:                                
+             version (number) - API version to request. Entire mtweets class
+                               defaults to 1, but you can override on a 
+                               function-by-function or class basis - (version=2), etc.
+        """
+        status = self.rate_limit_status(version)
+        self.rate_limiter.seed(DEFAULT_FAMILY, status)
+        return status
     
     @_authentication_required
     def end_session(self, version = None):
@@ -2107,7 +2360,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/account/end_session.json" % version)
+        return self.fetch_endpoint('end_session', version=version)
     
     @_authentication_required
     def delivery_device_update(self, device_name="none", version=None, **kwargs):
@@ -2135,7 +2388,7 @@ class API(TwitterClient):
         """
         version = version or self.apiVersion
         kwargs['device'] = device_name
-        return self.fetch_resource("http://api.twitter.com/%d/account/update_delivery_device.json"%version, kwargs, 'POST')
+        return self.fetch_endpoint('delivery_device_update', (), kwargs, version)
     
     @_authentication_required
     def profile_colors_update(self, version=None, **kwargs):
@@ -2172,14 +2425,14 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/account/update_profile_colors.json"%version, kwargs, 'POST')
+        return self.fetch_endpoint('profile_colors_update', (), kwargs, version)
     
     @_authentication_required
     def profile_image_image(self, filename, version=None, **kwargs):
         """ profile_image_image(filename)
 
-        Updates the authenticating user's profile image. Note that this method
-        expects raw multipart data, not a URL to an image.
+        Updates the authenticating user's profile image. The file is sent as
+        multipart data, not a URL to an image.
         This method asynchronously processes the uploaded file before updating
         the user's profile image URL. You can either update your local cache the
         next time you request the user's information, or, at least 5 seconds
@@ -2188,11 +2441,12 @@ class API(TwitterClient):
 
 
         Parameters:
-            image - The avatar image for the profile. Must be a valid GIF, JPG,
-                    or PNG image of less than 700 kilobytes in size. Images with
-                    width larger than 500 pixels will be scaled down. Animated
-                    GIFs will be converted to a static GIF of the first frame,
-                    removing the animation.
+            filename - Path of the image, it is streamed from disk. Must be
+                       a valid GIF, JPG, or PNG image of less than 700
+                       kilobytes in size. Images with width larger than 500
+                       pixels will be scaled down. Animated GIFs will be
+                       converted to a static GIF of the first frame,
+                       removing the animation.
                     
             include_entities - When set to either true, t or 1, each tweet
                                will include a node called "entities,". This
@@ -2209,17 +2463,8 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         
-        ## FIXME: improve this method
         version = version or self.apiVersion
-        files = [("image", filename, open(filename, 'rb').read())]
-        fields = []
-        content_type, body = self._encode_multipart_formdata(fields, files)
-        old_headers = self.opener.addheaders
-        self.opener.addheaders = [('Content-Type', content_type), ('Content-Length', str(len(body)))].extends(self.opener.addheaders)
-        kwargs[''] = body
-        data = self.fetch_resource("http://api.twitter.com/%d/account/update_profile_image.json"%version, kwargs, 'POST')
-        self.opener.addheaders = old_headers
-        return data
+        return self.fetch_multipart('profile_image_image', kwargs.items(), [('image', filename)], version)
         
     @_authentication_required
     def profile_background_image_update(self, filename, version=None, **kwargs):
@@ -2228,11 +2473,12 @@ class API(TwitterClient):
         Updates the authenticating user's profile background image.
 
         Parameters:
-            image - The avatar image for the profile. Must be a valid GIF, JPG,
-                    or PNG image of less than 700 kilobytes in size. Images with
-                    width larger than 500 pixels will be scaled down. Animated
-                    GIFs will be converted to a static GIF of the first frame,
-                    removing the animation.
+            filename - Path of the image, it is streamed from disk. Must be
+                       a valid GIF, JPG, or PNG image of less than 700
+                       kilobytes in size. Images with width larger than 500
+                       pixels will be scaled down. Animated GIFs will be
+                       converted to a static GIF of the first frame,
+                       removing the animation.
                     
             tile - Whether or not to tile the background image. If set to true
                    the background image will be displayed tiled. The image will
@@ -2252,17 +2498,8 @@ class API(TwitterClient):
                                defaults to 1, but you can override on a 
                                function-by-function or class basis - (version=2), etc.
         """
-        ## FIXME: improve this method
         version = version or self.apiVersion
-        files = [("image", filename, open(filename, 'rb').read())]
-        fields = []
-        content_type, body = self._encode_multipart_formdata(fields, files)
-        old_headers = self.opener.addheaders
-        self.opener.addheaders = [('Content-Type', content_type), ('Content-Length', str(len(body)))].extends(self.opener.addheaders)
-        kwargs[''] = body
-        data = self.fetch_resource("http://api.twitter.com/%d/account/update_profile_background_image.json"%version, kwargs, 'POST')
-        self.opener.addheaders = old_headers
-        return data
+        return self.fetch_multipart('profile_background_image_update', kwargs.items(), [('image', filename)], version)
 
     @_authentication_required
     def profile_update(self, version=None, **kwargs):
@@ -2300,7 +2537,7 @@ class API(TwitterClient):
 
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/account/update_profile.json"%version, kwargs, 'POST')
+        return self.fetch_endpoint('profile_update', (), kwargs, version)
 
     ############################################################################
     ## Favorities methods
@@ -2336,10 +2573,8 @@ class API(TwitterClient):
         """
         version = version or self.apiVersion
         if id is not None:
-            url = "http://api.twitter.com/%d/favorites/%s.json"%(version, id)
-        else:
-            url = "http://api.twitter.com/%d/favorites.json"%(version)
-        return self.fetch_resource(url, kwargs)
+            return self.fetch_endpoint('favorites_get_id', (id,), kwargs, version)
+        return self.fetch_endpoint('favorites_get', (), kwargs, version)
     
     @_authentication_required
     def favorite_create(self, id, version=None, **kwargs):
@@ -2366,7 +2601,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/favorites/create/%s.json"%(version, id), kwargs, 'POST')
+        return self.fetch_endpoint('favorite_create', (id,), kwargs, version)
     
     @_authentication_required
     def favorite_destroy(self, id, version=None, **kwargs):
@@ -2394,7 +2629,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/favorites/destroy/%s.json"%(version, id), kwargs, 'POST')
+        return self.fetch_endpoint('favorite_destroy', (id,), kwargs, version)
         
     ############################################################################
     ## Notification methods
@@ -2440,7 +2675,7 @@ class API(TwitterClient):
         if screen_name is not None:
             kwargs['screen_name'] = screen_name
             
-        return self.fetch_resource("http://api.twitter.com/%d/notifications/follow.json"%(version), kwargs, 'POST')
+        return self.fetch_endpoint('notification_follow', (), kwargs, version)
     
     @_authentication_required
     def notification_leave(self, user_id=None, screen_name=None, version=None, **kwargs):
@@ -2482,7 +2717,7 @@ class API(TwitterClient):
         if screen_name is not None:
             kwargs['screen_name'] = screen_name
             
-        return self.fetch_resource("http://api.twitter.com/%d/notifications/leave.json"%(version), kwargs, 'POST')
+        return self.fetch_endpoint('notification_leave', (), kwargs, version)
     
     ############################################################################
     ## Block methods
@@ -2529,7 +2764,7 @@ class API(TwitterClient):
         if screen_name is not None:
             kwargs['screen_name'] = screen_name
             
-        return self.fetch_resource("http://api.twitter.com/%d/blocks/create.json"%(version), kwargs, 'POST')
+        return self.fetch_endpoint('block_create', (), kwargs, version)
 
     @_authentication_required
     def block_destroy(self, user_id=None, screen_name=None, version = None):
@@ -2571,7 +2806,7 @@ class API(TwitterClient):
         if screen_name is not None:
             kwargs['screen_name'] = screen_name
             
-        return self.fetch_resource("http://api.twitter.com/%d/blocks/destroy.json"%(version), kwargs, 'POST')
+        return self.fetch_endpoint('block_destroy', (), kwargs, version)
 
     @_authentication_required
     def block_exists(self, user_id=None, screen_name=None, version=None, **kwargs):
@@ -2614,7 +2849,7 @@ class API(TwitterClient):
         if screen_name is not None:
             kwargs['screen_name'] = screen_name
             
-        return self.fetch_resource("http://api.twitter.com/%d/blocks/exists.json"%(version), kwargs)
+        return self.fetch_endpoint('block_exists', (), kwargs, version)
     
     @_authentication_required
     def block_get(self, version=None, **kwargs):
@@ -2640,7 +2875,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/blocks/blocking.json"%(version), kwargs)
+        return self.fetch_endpoint('block_get', (), kwargs, version)
     
     @_authentication_required
     def blocked_get_ids(self, version=None):
@@ -2652,7 +2887,7 @@ class API(TwitterClient):
             version (number) - Optional. API version to request. Entire mtweets class defaults to 1, but you can override on a function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/blocks/blocking/ids.json"%(version))
+        return self.fetch_endpoint('blocked_get_ids', version=version)
     
     ############################################################################
     ## Spam methods
@@ -2698,7 +2933,7 @@ class API(TwitterClient):
         if screen_name is not None:
             kwargs['screen_name'] = screen_name
             
-        return self.fetch_resource("http://api.twitter.com/%d/report_spam.json"%(version), kwargs)
+        return self.fetch_endpoint('report_spam', (), kwargs, version)
     
     ############################################################################
     ## saved searches methods
@@ -2716,7 +2951,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/saved_searches.json"%(version))
+        return self.fetch_endpoint('saved_searches_get', version=version)
     
     @_authentication_required
     def saved_searches_show(self, id, version=None):
@@ -2733,8 +2968,9 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/saved_searches/show/%s.json"%(version, id))
+        return self.fetch_endpoint('saved_searches_show', (id,), version=version)
     
+    @_authentication_required
     def saved_searches_create(self, query, version=None):
         """saved_searches_create(query)
 
@@ -2749,7 +2985,7 @@ class API(TwitterClient):
         """
         version = version or self.apiVersion
         kwargs = {'query':query}
-        return self.fetch_resource("http://api.twitter.com/%d/saved_searches/create.json"%(version), kwargs, 'POST')
+        return self.fetch_endpoint('saved_searches_create', (), kwargs, version)
     
     @_authentication_required
     def saved_searches_destroy(self, id, version = None):
@@ -2766,7 +3002,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/saved_searches/destroy/%s.json"%(version, id), http_method='POST')
+        return self.fetch_endpoint('saved_searches_destroy', (id,), version=version)
     
     ############################################################################
     ## Geo methods
@@ -2854,7 +3090,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/geo/search.json"%(version), kwargs)
+        return self.fetch_endpoint('geo_search', (), kwargs, version)
     
     @_simple_decorator
     def geo_similar_places(self, lat, long, name, version=None, **kwargs):
@@ -2909,7 +3145,7 @@ class API(TwitterClient):
         kwargs['lat'] = lat
         kwargs['long'] = long
         kwargs['name'] = name
-        return self.fetch_resource("http://api.twitter.com/%d/geo/similar_places.json"%(version), kwargs)
+        return self.fetch_endpoint('geo_similar_places', (), kwargs, version)
     
     @_simple_decorator
     def geo_reverse_geocode(self, lat, long, version=None, **kwargs):
@@ -2962,7 +3198,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/geo/reverse_geocode.json"%(version), kwargs)
+        return self.fetch_endpoint('geo_reverse_geocode', (), kwargs, version)
     
     @_simple_decorator
     def geo_id(self, place_id, version=None):
@@ -2979,7 +3215,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.fetch_resource("http://api.twitter.com/%d/geo/id/%s.json"%(version, place_id))
+        return self.fetch_endpoint('geo_id', (place_id,), version=version)
     
     @_authentication_required
     def geo_place(self, name, contained_within, token, lat, long, version=None, **kwargs):
@@ -3029,7 +3265,7 @@ class API(TwitterClient):
         kwargs['token'] = token
         kwargs['lat'] = lat
         kwargs['long'] = long
-        return self.fetch_resource("http://api.twitter.com/%d/geo/place.json"%(version), kwargs, 'POST')
+        return self.fetch_endpoint('geo_place', (), kwargs, version)
     
     ############################################################################
     ## Legal methods
@@ -3049,7 +3285,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.opener.open("http://api.twitter.com/%d/legal/tos.json"%(version))
+        return self.fetch_endpoint('legal_tos', version=version)
     
     @_simple_decorator
     def legal_privacy(self, version=None):
@@ -3064,7 +3300,7 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.opener.open("http://api.twitter.com/%d/legal/tos.json"%(version))
+        return self.fetch_endpoint('legal_privacy', version=version)
     
     ############################################################################
     ## Help methods
@@ -3083,17 +3319,18 @@ class API(TwitterClient):
                                function-by-function or class basis - (version=2), etc.
         """
         version = version or self.apiVersion
-        return self.opener.open("http://api.twitter.com/%d/help/test..json"%(version))
+        return self.fetch_endpoint('help_test', version=version)
     
     ############################################################################
     ## search methods
     ############################################################################
 
     @_simple_decorator
-    def help_test(self, q, **kwargs):
-        """ help_test()
+    def search(self, q, **kwargs):
+        """ search(q)
 
-        Returns the string "ok" in the requested format with a 200 OK HTTP status code.
+        Returns the tweets that match a query, one page of results. See
+        iter_search to page through all of them.
 
         Parameters:            
             q - Search query. Should be URL encoded. Queries will be limited by
@@ -3146,44 +3383,42 @@ class API(TwitterClient):
                                recent: return only the most recent results in the response
                                popular: return only the most popular results in the response.
         """
-        version = version or self.apiVersion
         kwargs['q'] = q
-        return self.opener.open("http://search.twitter.com/search.json?%s"%(urllib.urlencode(kwargs)))
-
-    # The following methods are apart from the other Account methods, because they rely on a whole multipart-data posting function set.
+        return self.fetch_endpoint('search', (), kwargs)
     
+    def iter_search(self, q, rpp=100, limit=SEARCH_LIMIT, since_id=None,
+                    prefetch=True, **kwargs):
+        """iter_search(q, rpp=100, limit=1500, since_id=None, prefetch=True)
+        
+        Generator over the results of a query from the newest to the oldest,
+        paging with rpp and page up to the 1500 results reachable through
+        search.
+        
+        >>> for result in api.iter_search('#python', since_id=last_id):
+        ...     index(result)
+        
+        Parameters:
+            q - Search query.
+            
+            rpp - Results per page, up to 100.
+            
+            limit - Maximum number of results to return.
+            
+            since_id - Stop at the results older than this id.
+            
+            prefetch - Request the next page in a background thread while the
+                       current one is consumed. Default True.
+            
+            Any other parameter (lang, locale, geocode, result_type...) is
+            passed to search.
+        """
+        return iter_search(self.search, q, rpp, limit, since_id, prefetch,
+                           **kwargs)
+
     ############################################################################
     ## Other methods
     ############################################################################
     
-    def _encode_multipart_formdata(self, fields, files):
-        BOUNDARY = mimetools.choose_boundary()
-        CRLF = '\r\n'
-        L = []
-        for (key, value) in fields:
-            L.append('--' + BOUNDARY)
-            L.append('Content-Disposition: form-data; name="%s"' % key)
-            L.append('')
-            L.append(value)
-        for (key, filename, value) in files:
-            L.append('--' + BOUNDARY)
-            L.append('Content-Disposition: form-data; name="%s"; filename="%s"' % (key, filename))
-            L.append('Content-Type: %s' % self._get_content_type(filename))
-            L.append('')
-            L.append(value)
-        L.append('--' + BOUNDARY + '--')
-        L.append('')
-        body = CRLF.join(L)
-        content_type = 'multipart/form-data; boundary=%s' % BOUNDARY
-        return content_type, body
-
-    def _get_content_type(self, filename):
-        """ get_content_type(self, filename)
-
-        	Exactly what you think it does. :D
-        """
-        return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
-
     def _unicode2utf8(self, text):
         try:
             if isinstance(text, unicode):
@@ -0,0 +1,303 @@
+"""mtweets - Easy Twitter utilities in Python
+
+Pool of API clients, one per authorized account.
+
+Twitter limits the requests of every token, APIPool spreads the calls over
+many tokens of the same application so the throughput grows with the number
+of accounts. The resource methods of API whose response does not depend on
+the authenticated user (shared in mtweets.endpoints) are exposed with the
+same signature and each call is sent with the token that has the most
+remaining budget for the rate limit family of the method. The members share
+the keep-alive connections, the cache and the JSON decoder.
+
+    >>> pool = mtweets.APIPool((key, secret), [datastore_a, datastore_b])
+    >>> pool.add_token(token_c)
+    >>> pool.rate_limit_sync()
+    >>> timeline = pool.user_timeline_get(screen_name='twitter')
+    >>> async_pool = mtweets.AsyncAPI(pool, concurrency=50)
+
+The calls go to any account, so the pool only has the reads of public data
+(users, user timelines, lists, ids, search...). The methods that act on or
+read an account (updates, follows, home timeline, direct messages, blocks,
+saved searches...) are sent with member(token_key) or each().
+"""
+
+import sys
+import time
+
+from threading import Lock
+
+from mtweets.api import API
+from mtweets.connection import ConnectionPool
+from mtweets.concurrency import WorkerPool
+from mtweets.concurrency import gather
+from mtweets.decoding import get_decoder
+from mtweets.ratelimit import RateLimiter
+from mtweets.ratelimit import DEFAULT_FAMILY
+from mtweets.ratelimit import rate_limit_family
+from mtweets.utils import AuthError
+from mtweets.utils import RateLimitError
+
+from oauth import OAuthDataStoreMixin
+
+# remaining budget of a token whose budget is not known yet
+UNKNOWN_BUDGET = sys.maxint
+
+class TokenStore(OAuthDataStoreMixin):
+    """Datastore that holds a single token in memory."""
+
+    def __init__(self, token):
+        self.token = token
+
+    def save_token(self, oauth_token):
+        self.token = oauth_token
+
+    def delete_token(self):
+        self.token = None
+
+    def lookup_token(self):
+        return self.token
+
+class _Member(object):
+
+    def __init__(self, api):
+        self.api = api
+        self.active = 0
+        self.calls = 0
+
+class APIPool(object):
+    """Dispatch API calls over the tokens of many accounts.
+
+    Parameters:
+        oauth_params - key, secret tokens for OAuth of the application.
+
+        datastores - Datastores (with lookup_token()) of the authorized
+                     accounts, each one becomes the oauth_datastore of a
+                     member API. More can be added with add() and
+                     add_token().
+
+        reserve - Requests per window never used on each token, left for
+                  other clients of the same accounts.
+
+        max_wait - Maximum seconds a call waits for a window reset when
+                   every token is exhausted, RateLimitError is raised when
+                   it would need to wait longer. None waits as needed.
+
+        Any other parameter is passed to every API, like user_agent, cache,
+        models or base_urls, except rate_limiter: each member has its own.
+    """
+
+    def __init__(self, oauth_params, datastores=(), reserve=0, max_wait=None,
+                 **kwargs):
+        if 'rate_limiter' in kwargs:
+            raise TypeError("APIPool(): each member has its own rate limiter, "
+                            "use reserve and max_wait instead of rate_limiter")
+        self.oauth_params = oauth_params
+        self.reserve = reserve
+        self.max_wait = max_wait
+        kwargs.setdefault('connection_pool', ConnectionPool())
+        kwargs.setdefault('decoder', get_decoder())
+        kwargs.setdefault('version', 1)
+        self.connection_pool = kwargs['connection_pool']
+        self.apiVersion = kwargs['version']
+        self.api_kwargs = kwargs
+        self.members = []
+        self._lock = Lock()
+        for datastore in datastores:
+            self.add(datastore)
+
+    def __len__(self):
+        return len(self.members)
+
+    def add(self, datastore):
+        """add(datastore) -> API
+
+        Adds the account whose token is returned by datastore.lookup_token().
+        """
+        token = datastore.lookup_token()
+        if token is None:
+            raise AuthError("APIPool.add(): the datastore has no token")
+        api = API(self.oauth_params,
+                  rate_limiter=RateLimiter(reserve=self.reserve, max_wait=0),
+                  **self.api_kwargs)
+        api.oauth_datastore = datastore
+        api.token = token
+        self._lock.acquire()
+        try:
+            self.members.append(_Member(api))
+        finally:
+            self._lock.release()
+        return api
+
+    def add_token(self, token):
+        """add_token(token) -> API
+
+        Adds an account from its OAuthToken.
+        """
+        return self.add(TokenStore(token))
+
+    def member(self, token_key):
+        """member(token_key) -> API of the account with this token"""
+        for member in self.members:
+            if member.api.token.key == token_key:
+                return member.api
+        raise KeyError(token_key)
+
+    @property
+    def apis(self):
+        return [member.api for member in self.members]
+
+    ############################################################################
+    ## Dispatch
+    ############################################################################
+
+    def _remaining(self, member, family, now):
+        if family is None:
+            return UNKNOWN_BUDGET
+        budget = member.api.rate_limiter.budget(family)
+        if budget is None:
+            return UNKNOWN_BUDGET
+        if budget['reset'] is not None and budget['reset'] <= now:
+            return budget['limit']
+        return budget['remaining']
+
+    def _select(self, family, exhausted):
+        now = time.time()
+        self._lock.acquire()
+        try:
+            best = best_score = None
+            for member in self.members:
+                if member in exhausted:
+                    continue
+                score = (self._remaining(member, family, now) - member.active,
+                         -member.calls)
+                if best is None or score > best_score:
+                    best, best_score = member, score
+            if best is not None:
+                best.active += 1
+                best.calls += 1
+            return best
+        finally:
+            self._lock.release()
+
+    def _release(self, member):
+        self._lock.acquire()
+        try:
+            member.active -= 1
+        finally:
+            self._lock.release()
+
+    def _wait_reset(self, name, family):
+        resets = [member.api.rate_limiter.budget(family) for member in self.members]
+        resets = [budget['reset'] for budget in resets
+                  if budget is not None and budget['reset'] is not None]
+        wait = resets and min(resets) - time.time() or 0
+        if self.max_wait is not None and wait > self.max_wait:
+            raise RateLimitError("%s(): %s rate limit exhausted for every token"%(name, family), 400)
+        if wait > 0:
+            time.sleep(wait)
+
+    def call(self, name, *args, **kwargs):
+        """call(name, *args, **kwargs) -> result of the API method name
+
+        Sends the call with the token with the most remaining budget. A
+        token exhausted before the request is sent is skipped for the next
+        best one.
+        """
+        if not self.members:
+            raise AuthError("%s(): APIPool has no tokens"%(name))
+        family = rate_limit_family(name)
+        exhausted = set()
+        while True:
+            member = self._select(family, exhausted)
+            if member is None:
+                self._wait_reset(name, family)
+                exhausted.clear()
+                continue
+            try:
+                return getattr(member.api, name)(*args, **kwargs)
+            except RateLimitError:
+                exhausted.add(member)
+            finally:
+                self._release(member)
+
+    ############################################################################
+    ## Rate limit
+    ############################################################################
+
+    def rate_limit_sync(self, version=None):
+        """rate_limit_sync()
+
+        Seeds the rate limiter of every member, see API.rate_limit_sync.
+        Returns {token key: rate limit status}.
+        """
+        return dict((member.api.token.key, member.api.rate_limit_sync(version))
+                    for member in self.members)
+
+    def budget(self, family=DEFAULT_FAMILY):
+        """budget(family='rest') -> {token key: budget or None}"""
+        return dict((member.api.token.key, member.api.rate_limiter.budget(family))
+                    for member in self.members)
+
+    ############################################################################
+    ## Accounts
+    ############################################################################
+
+    def each(self, name, calls, concurrency=10, return_exceptions=True):
+        """each(name, calls, concurrency=10, return_exceptions=True) -> {token key: result}
+
+        Calls the API method name of many accounts at the same time, for the
+        requests that belong to an account, like profile updates. Each call
+        is sent with its own token.
+
+        >>> pool.each('profile_image_image', {'token a': 'a.png', 'token b': 'b.png'})
+
+        Parameters:
+            calls - dict {token key: arguments tuple}, a single argument
+                    can be given without the tuple.
+
+            concurrency - Number of calls running at the same time.
+
+            return_exceptions - The failed calls return their exception
+                                instead of raising it.
+        """
+        apis = dict((member.api.token.key, member.api) for member in self.members)
+        keys = list(calls)
+        for key in keys:
+            if key not in apis:
+                raise KeyError(key)
+        concurrency = max(1, min(concurrency, len(keys)))
+        self.connection_pool.reserve(concurrency)
+        workers = WorkerPool(concurrency)
+        try:
+            futures = []
+            for key in keys:
+                args = calls[key]
+                if not isinstance(args, tuple):
+                    args = (args,)
+                futures.append(workers.submit(getattr(apis[key], name), *args))
+            results = gather(futures, return_exceptions)
+        finally:
+            workers.shutdown()
+        return dict(zip(keys, results))
+
+def _make_pooled_method(name, method):
+    def pooled_method(self, *args, **kwargs):
+        return self.call(name, *args, **kwargs)
+    pooled_method.__name__ = name
+    pooled_method.__doc__ = method.__doc__
+    pooled_method.resource = True
+    return pooled_method
+
+# the shared reads, the account resources are sent by member() and each()
+for _name, _method in API.__dict__.items():
+    if getattr(_method, 'resource', False) and _method.endpoint.shared:
+        setattr(APIPool, _name, _make_pooled_method(_name, _method))
+del _name, _method
+
+# helpers of API built on its resource methods, every page or batch is
+# dispatched on its own
+for _name in ('iter_timeline', 'hydrate_users', 'iter_friend_ids',
+              'iter_follower_ids', '_iter_ids'):
+    setattr(APIPool, _name, API.__dict__[_name])
+del _name
@@ -0,0 +1,71 @@
+"""mtweets - Easy Twitter utilities in Python
+
+Concurrent variant of the API class.
+
+Every resource method of API (user_timeline_get, user_show, status_show,
+favorites_get, ...) is exposed by AsyncAPI with the same signature but
+returns a Future immediately, the request runs in a bounded pool of worker
+threads that share the OAuth signing and the keep-alive connections of the
+wrapped API instance.
+
+    >>> api = mtweets.API((key, secret), 'my app')
+    >>> api.oauth_datastore = datastore_object
+    >>> async_api = mtweets.AsyncAPI(api, concurrency=50)
+    >>> futures = [async_api.user_timeline_get(user_id=id) for id in ids]
+    >>> timelines = async_api.gather(futures)
+"""
+
+from mtweets.api import API
+from mtweets.concurrency import WorkerPool
+from mtweets.concurrency import gather
+
+class AsyncAPI(object):
+    """Fan out API calls over `concurrency` threads.
+
+    Parameters:
+        api - Authorized API instance used to sign and send the requests.
+
+        concurrency - Maximum number of requests running at the same time.
+                      The connection pool of api is grown to keep alive at
+                      least this number of connections per host.
+
+    Attributes not related to resources (fetch_for_authorize, token,
+    oauth_datastore, ...) are read from the wrapped api.
+    """
+
+    def __init__(self, api, concurrency=10):
+        self.api = api
+        self.concurrency = concurrency
+        self.workers = WorkerPool(concurrency)
+
+        api.connection_pool.reserve(concurrency)
+
+    def __getattr__(self, name):
+        return getattr(self.api, name)
+
+    def submit(self, func, *args, **kwargs):
+        """submit(func, *args, **kwargs) -> Future
+
+        Runs any callable, like a bound method of the api, in the workers.
+        """
+        return self.workers.submit(func, *args, **kwargs)
+
+    def gather(self, futures, return_exceptions=False):
+        """gather(futures, return_exceptions=False) -> list of results"""
+        return gather(futures, return_exceptions)
+
+    def close(self):
+        """Stops the worker threads."""
+        self.workers.shutdown()
+
+def _make_async_method(name, method):
+    def async_method(self, *args, **kwargs):
+        return self.workers.submit(getattr(self.api, name), *args, **kwargs)
+    async_method.__name__ = name
+    async_method.__doc__ = method.__doc__
+    return async_method
+
+for _name, _method in API.__dict__.items():
+    if getattr(_method, 'resource', False):
+        setattr(AsyncAPI, _name, _make_async_method(_name, _method))
+del _name, _method
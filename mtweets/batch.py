@@ -0,0 +1,274 @@
+"""mtweets - Easy Twitter utilities in Python
+
+Batch execution of mutations (follow, unfollow, block, favorite, list
+membership, destroy...).
+
+BatchExecutor runs a list of Mutation with bounded concurrency through an
+API, so its rate limiter paces the requests. Transient failures (5xx, 420,
+rate limit) are retried with exponential backoff. A retry can find the
+mutation already applied by the attempt that failed (twitter answers 403 to
+a repeated follow and 404 to a repeated destroy), those errors are reported
+as already applied instead of failures, so retrying is idempotent. Network
+errors, where the request may have been applied without an answer, are only
+retried for the methods listed in ALREADY_APPLIED_CODES.
+
+    >>> executor = BatchExecutor(api, concurrency=8)
+    >>> report = executor.run([Mutation('block_create', user_id=id) for id in spammers])
+    >>> report.summary()
+    {'total': 5000, 'ok': 4990, 'already_applied': 3, 'failed': 7, ...}
+    >>> for result in report.failed:
+    ...     print result.mutation, result.error
+"""
+
+import time
+import random
+import socket
+import httplib
+import urllib2
+
+from mtweets.concurrency import WorkerPool
+from mtweets.ratelimit import rate_limit_family
+from mtweets.utils import RequestError
+from mtweets.utils import RateLimitError
+
+OK = 'ok'
+ALREADY_APPLIED = 'already_applied'
+FAILED = 'failed'
+
+# HTTP status codes worth retrying
+TRANSIENT_CODES = (420, 429, 500, 502, 503, 504)
+
+# errors that mean that a previous attempt of the mutation was applied, the
+# methods with no codes can be repeated without errors
+ALREADY_APPLIED_CODES = {
+    'block_create': (),
+    'user_list_members_add': (),
+    'user_list_members_create_all': (),
+    'friendship_create': (403,),
+    'friendship_destroy': (403, 404),
+    'block_destroy': (404,),
+    'favorite_create': (403,),
+    'favorite_destroy': (403, 404),
+    'status_update': (403,),
+    'status_retweet': (403,),
+    'status_destroy': (404,),
+    'direct_messages_destroy': (404,),
+    'user_list_members_delete': (404,),
+    'user_list_id_delete': (404,),
+    'saved_searches_destroy': (404,),
+}
+
+class Mutation(object):
+    """A call of an API method, like Mutation('friendship_create', user_id=12).
+
+    Parameters:
+        method - Name of the API method.
+
+        Any other argument is passed to the method.
+    """
+
+    __slots__ = ('method', 'args', 'kwargs')
+
+    def __init__(self, method, *args, **kwargs):
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+
+    def __repr__(self):
+        params = [repr(arg) for arg in self.args]
+        params.extend(['%s=%r'%item for item in sorted(self.kwargs.items())])
+        return '%s(%s)'%(self.method, ', '.join(params))
+
+class MutationResult(object):
+    """Outcome of a Mutation.
+
+    Attributes:
+        mutation - The Mutation.
+
+        status - 'ok', 'already_applied' or 'failed'.
+
+        result - Response of the method when status is 'ok'.
+
+        error - Last exception when status is not 'ok'.
+
+        attempts - Number of requests sent.
+
+        elapsed - Seconds from the first attempt to the outcome, backoff
+                  included.
+    """
+
+    __slots__ = ('mutation', 'status', 'result', 'error', 'attempts', 'elapsed')
+
+    def __init__(self, mutation, status, result=None, error=None, attempts=1,
+                 elapsed=0.0):
+        self.mutation = mutation
+        self.status = status
+        self.result = result
+        self.error = error
+        self.attempts = attempts
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return '<MutationResult %s %s after %d attempts>'%(self.mutation,
+                                                          self.status,
+                                                          self.attempts)
+
+class BatchReport(object):
+    """Results of BatchExecutor.run in the order of the mutations."""
+
+    def __init__(self, results, elapsed):
+        self.results = results
+        self.elapsed = elapsed
+
+    def __len__(self):
+        return len(self.results)
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def _with_status(self, status):
+        return [result for result in self.results if result.status == status]
+
+    @property
+    def succeeded(self):
+        return [result for result in self.results if result.status != FAILED]
+
+    @property
+    def failed(self):
+        return self._with_status(FAILED)
+
+    def summary(self):
+        """summary() -> dict with the counts and throughput of the batch"""
+        total = len(self.results)
+        calls = sum([result.attempts for result in self.results])
+        latencies = sorted([result.elapsed for result in self.results])
+        elapsed = self.elapsed or 1e-9
+        return {'total': total,
+                OK: len(self._with_status(OK)),
+                ALREADY_APPLIED: len(self._with_status(ALREADY_APPLIED)),
+                FAILED: len(self._with_status(FAILED)),
+                'calls': calls,
+                'retries': calls - total,
+                'elapsed': round(self.elapsed, 3),
+                'mutations_per_second': round(total / elapsed, 2),
+                'calls_per_second': round(calls / elapsed, 2),
+                'latency_median': latencies and round(latencies[total // 2], 3) or 0,
+                'latency_p95': latencies and round(latencies[int(total * 0.95)], 3) or 0,
+                'latency_max': latencies and round(latencies[-1], 3) or 0}
+
+class BatchExecutor(object):
+    """Runs mutations concurrently with retries.
+
+    Parameters:
+        api - API of the account the mutations act on, the requests are
+              paced by its rate limiter. An APIPool is rejected, it would
+              send each mutation from any of its accounts, use
+              pool.member(token_key).
+
+        concurrency - Maximum number of requests running at the same time.
+
+        retries - Attempts after the first one for transient failures.
+
+        backoff - Seconds before the first retry, doubled on every retry
+                  with some jitter.
+
+        max_backoff - Maximum seconds between retries.
+
+        callback - Called with each MutationResult as soon as it is known,
+                   from the worker threads, to follow the progress of long
+                   batches. Its errors are ignored.
+    """
+
+    def __init__(self, api, concurrency=10, retries=3, backoff=1.0,
+                 max_backoff=60.0, callback=None):
+        if hasattr(api, 'members'):
+            raise TypeError("BatchExecutor(): mutations need the API of an "
+                            "account, use APIPool.member(token_key)")
+        self.api = api
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.callback = callback
+
+        api.connection_pool.reserve(concurrency)
+
+    def _transient(self, mutation, error):
+        if isinstance(error, RateLimitError):
+            return True
+        if isinstance(error, RequestError):
+            if error.error_code in TRANSIENT_CODES:
+                return True
+            # twitter answers 400 when the rate limit is exhausted
+            limiter = getattr(self.api, 'rate_limiter', None)
+            family = rate_limit_family(mutation.method)
+            if error.error_code == 400 and limiter is not None and family is not None:
+                budget = limiter.budget(family)
+                return budget is not None and budget['remaining'] <= 0
+            return False
+        # the request may have been applied, retry only when a repeat is
+        # detected or harmless
+        return (mutation.method in ALREADY_APPLIED_CODES and
+                isinstance(error, (urllib2.URLError, socket.error,
+                                   httplib.HTTPException)))
+
+    def _delay(self, attempt):
+        delay = min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+        return delay * random.uniform(0.5, 1.0)
+
+    def execute(self, mutation):
+        """execute(mutation) -> MutationResult
+
+        Runs a single mutation with retries, in the calling thread.
+        """
+        started = time.time()
+        try:
+            method = getattr(self.api, mutation.method)
+        except AttributeError, e:
+            return self._report(MutationResult(mutation, FAILED, None, e, 0))
+        applied_codes = ALREADY_APPLIED_CODES.get(mutation.method, ())
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = method(*mutation.args, **mutation.kwargs)
+            except Exception, e:
+                if (attempt > 1 and isinstance(e, RequestError) and
+                    e.error_code in applied_codes):
+                    outcome = MutationResult(mutation, ALREADY_APPLIED, None, e,
+                                             attempt, time.time() - started)
+                    break
+                if attempt > self.retries or not self._transient(mutation, e):
+                    outcome = MutationResult(mutation, FAILED, None, e, attempt,
+                                             time.time() - started)
+                    break
+                time.sleep(self._delay(attempt))
+            else:
+                outcome = MutationResult(mutation, OK, result, None, attempt,
+                                         time.time() - started)
+                break
+        return self._report(outcome)
+
+    def _report(self, outcome):
+        if self.callback is not None:
+            try:
+                self.callback(outcome)
+            except Exception:
+                # a failing progress callback does not stop the batch
+                pass
+        return outcome
+
+    def run(self, mutations):
+        """run(mutations) -> BatchReport
+
+        Runs every mutation and waits for all of them, the failures are in
+        the report, never raised.
+        """
+        mutations = list(mutations)
+        started = time.time()
+        workers = WorkerPool(max(1, min(self.concurrency, len(mutations))))
+        try:
+            results = workers.map(self.execute, mutations)
+        finally:
+            workers.shutdown()
+        return BatchReport(results, time.time() - started)
@@ -0,0 +1,217 @@
+"""mtweets - Easy Twitter utilities in Python
+
+Response cache for read only resources.
+
+The raw body of the responses is cached, a hit skips the OAuth signing, the
+rate limit budget and the HTTP request. Every backend evicts the least
+recently used responses when the stored bytes exceed max_bytes.
+
+    >>> api = mtweets.API((key, secret), cache=MemoryCache(max_bytes=1 << 24))
+    >>> api.trends_current()  # requested
+    >>> api.trends_current()  # cached for 5 minutes
+
+Set cache_ttls on the client to change the time to live (in seconds) of each
+method, a method without ttl is never cached.
+"""
+
+import os
+import time
+
+try:
+    from hashlib import sha1
+except ImportError:
+    from sha import new as sha1
+
+from collections import deque
+from threading import Lock
+
+from mtweets.endpoints import ENDPOINTS
+
+# Default time to live in seconds of the cacheable methods, from the
+# endpoint registry
+CACHE_TTLS = dict((name, endpoint.ttl) for name, endpoint in ENDPOINTS.items()
+                  if endpoint.ttl)
+
+def cache_key(client, method_name, args, kwargs):
+    """cache_key(client, method_name, args, kwargs) -> str
+
+    Key of a method call, the token of the client is part of the key because
+    some responses depend on the authenticated user.
+    """
+    token = getattr(client, 'token', None)
+    parts = [method_name, str(client.apiVersion), token and token.key or '',
+             repr(args), repr(sorted(kwargs.items()))]
+    return sha1('\0'.join(parts)).hexdigest()
+
+############################################################################
+## Backends
+############################################################################
+
+class MemoryCache(object):
+    """LRU cache in memory bounded by the bytes of the stored responses.
+
+    The entries are [expires, data, use] and the uses are queued in order as
+    (use, key), the queued uses older than the last use of their key are
+    skipped when the oldest entry is evicted.
+    """
+
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = {}
+        self._uses = deque()
+        self._use = 0
+        self._lock = Lock()
+
+    def _touch(self, key, entry):
+        self._use += 1
+        entry[2] = self._use
+        self._uses.append((self._use, key))
+        if len(self._uses) > 2 * len(self._entries) + 64:
+            # drop the stale uses of the keys read many times
+            self._uses = deque(sorted([(entry[2], key) for key, entry
+                                       in self._entries.iteritems()]))
+
+    def get(self, key):
+        """get(key) -> data or None if missing or expired"""
+        self._lock.acquire()
+        try:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._entries[key]
+                self.size -= len(entry[1])
+                return None
+            self._touch(key, entry)
+            return entry[1]
+        finally:
+            self._lock.release()
+
+    def set(self, key, data, ttl):
+        if len(data) > self.max_bytes:
+            return
+        self._lock.acquire()
+        try:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[1])
+            entry = self._entries[key] = [time.time() + ttl, data, 0]
+            self._touch(key, entry)
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                use, oldest = self._uses.popleft()
+                evicted = self._entries.get(oldest)
+                if evicted is not None and evicted[2] == use:
+                    del self._entries[oldest]
+                    self.size -= len(evicted[1])
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        self._lock.acquire()
+        try:
+            self._entries.clear()
+            self._uses.clear()
+            self.size = 0
+        finally:
+            self._lock.release()
+
+class FileCache(object):
+    """LRU cache in a local directory bounded by the bytes of the stored
+    responses. Each response is a file whose first line is its expiration
+    time, the modification time of the file tracks the last use.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._lock = Lock()
+        self._index = {}
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith('.tmp'):
+                os.remove(path)
+                continue
+            stat = os.stat(path)
+            self._index[name] = [stat.st_size, stat.st_mtime]
+            self.size += stat.st_size
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        """get(key) -> data or None if missing or expired"""
+        self._lock.acquire()
+        try:
+            if key not in self._index:
+                return None
+            try:
+                fp = open(self._path(key), 'rb')
+                try:
+                    expires = float(fp.readline())
+                    data = fp.read()
+                finally:
+                    fp.close()
+            except (IOError, ValueError):
+                self._remove(key)
+                return None
+            if expires < time.time():
+                self._remove(key)
+                return None
+            now = time.time()
+            self._index[key][1] = now
+            os.utime(self._path(key), (now, now))
+            return data
+        finally:
+            self._lock.release()
+
+    def set(self, key, data, ttl):
+        if len(data) > self.max_bytes:
+            return
+        self._lock.acquire()
+        try:
+            if key in self._index:
+                self._remove(key)
+            tmp = self._path(key) + '.tmp'
+            fp = open(tmp, 'wb')
+            try:
+                fp.write('%f\n'%(time.time() + ttl))
+                fp.write(data)
+            finally:
+                fp.close()
+            os.rename(tmp, self._path(key))
+            size = os.path.getsize(self._path(key))
+            self._index[key] = [size, time.time()]
+            self.size += size
+            if self.size > self.max_bytes:
+                self._evict()
+        finally:
+            self._lock.release()
+
+    def _evict(self):
+        entries = sorted(self._index.items(), key=lambda item: item[1][1])
+        for key, (size, last_used) in entries:
+            if self.size <= self.max_bytes:
+                break
+            self._remove(key)
+
+    def _remove(self, key):
+        size, last_used = self._index.pop(key)
+        self.size -= size
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        self._lock.acquire()
+        try:
+            for key in self._index.keys():
+                self._remove(key)
+        finally:
+            self._lock.release()
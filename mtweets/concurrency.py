@@ -0,0 +1,238 @@
+"""mtweets - Easy Twitter utilities in Python
+
+Small thread based concurrency helpers shared by the library: a Future
+object, a bounded WorkerPool and gather().
+
+    >>> workers = WorkerPool(10)
+    >>> futures = [workers.submit(api.user_show, user_id=i) for i in ids]
+    >>> users = gather(futures)
+"""
+
+import sys
+
+from Queue import Full
+from Queue import Queue
+from threading import Event
+from threading import Lock
+from threading import Thread
+
+############################################################################
+## Future
+############################################################################
+
+class Future(object):
+    """Result of a call that is running in other thread."""
+
+    def __init__(self):
+        self._event = Event()
+        self._lock = Lock()
+        self._result = None
+        self._exc_info = None
+        self._callbacks = []
+
+    def set_result(self, result):
+        self._result = result
+        self._finish()
+
+    def set_exception(self, exc_info):
+        """set_exception(exc_info)
+
+        exc_info should be the tuple returned by sys.exc_info()
+        """
+        self._exc_info = exc_info
+        self._finish()
+
+    def _finish(self):
+        self._lock.acquire()
+        try:
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        finally:
+            self._lock.release()
+        for callback in callbacks:
+            callback(self)
+
+    def add_done_callback(self, callback):
+        """add_done_callback(callback)
+
+        callback(future) is called when the future finishes, immediately if
+        it is already done.
+        """
+        self._lock.acquire()
+        try:
+            if not self._event.isSet():
+                self._callbacks.append(callback)
+                return
+        finally:
+            self._lock.release()
+        callback(self)
+
+    def done(self):
+        return self._event.isSet()
+
+    def exception(self, timeout=None):
+        self.wait(timeout)
+        if self._exc_info is not None:
+            return self._exc_info[1]
+        return None
+
+    def wait(self, timeout=None):
+        self._event.wait(timeout)
+        if not self._event.isSet():
+            raise RuntimeError("Future.wait(): timed out after %s seconds"%timeout)
+
+    def result(self, timeout=None):
+        """result(timeout=None)
+
+        Waits for the call and returns its result, exceptions raised by the
+        call are raised again here with the original traceback.
+        """
+        self.wait(timeout)
+        if self._exc_info is not None:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._result
+
+############################################################################
+## Workers
+############################################################################
+
+_STOP = object()
+
+class WorkerPool(object):
+    """Runs calls in at most `size` daemon threads.
+
+    Threads are started on demand and live until shutdown() is called.
+    """
+
+    def __init__(self, size=10):
+        if size < 1:
+            raise ValueError("WorkerPool(): size should be greater than 0")
+        self.size = size
+        self._queue = Queue()
+        self._threads = []
+        self._lock = Lock()
+
+    def _start_thread(self):
+        self._lock.acquire()
+        try:
+            if len(self._threads) < self.size:
+                thread = Thread(target=self._work)
+                thread.setDaemon(True)
+                thread.start()
+                self._threads.append(thread)
+        finally:
+            self._lock.release()
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            future, func, args, kwargs = item
+            try:
+                future.set_result(func(*args, **kwargs))
+            except:
+                future.set_exception(sys.exc_info())
+
+    def submit(self, func, *args, **kwargs):
+        """submit(func, *args, **kwargs) -> Future"""
+        future = Future()
+        self._queue.put((future, func, args, kwargs))
+        if len(self._threads) < self.size:
+            self._start_thread()
+        return future
+
+    def map(self, func, iterable):
+        """map(func, iterable) -> list
+
+        Calls func for each item concurrently and returns the results in the
+        same order of iterable.
+        """
+        return gather([self.submit(func, item) for item in iterable])
+
+    def shutdown(self, wait=True):
+        self._lock.acquire()
+        try:
+            threads, self._threads = self._threads, []
+        finally:
+            self._lock.release()
+        for thread in threads:
+            self._queue.put(_STOP)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+def spawn(func, *args, **kwargs):
+    """spawn(func, *args, **kwargs) -> Future
+
+    Runs a single call in a new daemon thread.
+    """
+    future = Future()
+    def run():
+        try:
+            future.set_result(func(*args, **kwargs))
+        except:
+            future.set_exception(sys.exc_info())
+    thread = Thread(target=run)
+    thread.setDaemon(True)
+    thread.start()
+    return future
+
+def iter_prefetched(iterable, size=1):
+    """iter_prefetched(iterable, size=1) -> generator
+
+    Consumes iterable in a daemon thread that keeps up to `size` items ready,
+    exceptions raised by iterable are raised again in the consumer.
+    """
+    queue = Queue(size)
+    stop = Event()
+
+    def put(item):
+        while not stop.isSet():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((True, item)):
+                    return
+        except:
+            put((False, sys.exc_info()))
+        else:
+            put((False, None))
+
+    thread = Thread(target=produce)
+    thread.setDaemon(True)
+    thread.start()
+    try:
+        while True:
+            more, item = queue.get()
+            if not more:
+                if item is not None:
+                    raise item[0], item[1], item[2]
+                return
+            yield item
+    finally:
+        stop.set()
+
+def gather(futures, return_exceptions=False):
+    """gather(futures, return_exceptions=False) -> list
+
+    Waits for all the futures and returns their results in order. If
+    return_exceptions is True the exceptions are returned in place of the
+    results instead of being raised.
+    """
+    results = []
+    for future in futures:
+        if return_exceptions:
+            error = future.exception()
+            if error is not None:
+                results.append(error)
+                continue
+        results.append(future.result())
+    return results
@@ -0,0 +1,255 @@
+"""mtweets - Easy Twitter utilities in Python
+
+Keep-alive connection pooling for urllib2.
+
+Every request to twitter would otherwise pay a new TCP (and TLS) handshake,
+this module keeps the connections open and reuses them per host.
+
+    >>> pool = ConnectionPool(pool_size=20, per_host=4, idle_timeout=30)
+    >>> opener = urllib2.build_opener(KeepAliveHandler(pool),
+    ...                               KeepAliveHTTPSHandler(pool))
+"""
+
+import time
+import socket
+import httplib
+import urllib
+import urllib2
+
+from threading import Lock
+
+############################################################################
+## Pool
+############################################################################
+
+class ConnectionPool(object):
+    """Thread safe pool of idle httplib connections keyed by scheme and host.
+
+    Parameters:
+        pool_size - Maximum number of idle connections kept by the pool for
+                    all the hosts.
+
+        per_host - Maximum number of idle connections kept for a single host.
+                   A dict {host: limit} can be given to override this value
+                   per host, "default" key is used for unlisted hosts.
+
+        idle_timeout - Seconds that an idle connection is kept before being
+                       discarded.
+
+        timeout - Socket timeout for new connections, None uses the global
+                  default.
+    """
+
+    def __init__(self, pool_size=30, per_host=10, idle_timeout=60,
+                 timeout=None):
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        if isinstance(per_host, dict):
+            self.per_host = dict(per_host)
+        else:
+            self.per_host = {'default': per_host}
+        self.per_host.setdefault('default', 10)
+
+        self._idle = {}
+        self._size = 0
+        self._lock = Lock()
+
+    def _host_limit(self, host):
+        return self.per_host.get(host, self.per_host['default'])
+
+    def _new_connection(self, scheme, host):
+        if scheme == 'https':
+            klass = httplib.HTTPSConnection
+        else:
+            klass = httplib.HTTPConnection
+        if self.timeout is None:
+            return klass(host)
+        return klass(host, timeout=self.timeout)
+
+    def get(self, scheme, host):
+        """get(scheme, host) -> (connection, reused)
+
+        Returns an idle connection for the host or a new one when none is
+        available.
+        """
+        key = (scheme, host)
+        now = time.time()
+        self._lock.acquire()
+        try:
+            idle = self._idle.get(key, [])
+            while idle:
+                conn, last_used = idle.pop()
+                self._size -= 1
+                if now - last_used <= self.idle_timeout:
+                    return conn, True
+                conn.close()
+        finally:
+            self._lock.release()
+        return self._new_connection(scheme, host), False
+
+    def put(self, scheme, host, conn):
+        """put(scheme, host, conn)
+
+        Returns a connection to the pool, if the pool or the host is full the
+        connection is closed.
+        """
+        key = (scheme, host)
+        self._lock.acquire()
+        try:
+            idle = self._idle.setdefault(key, [])
+            if self._size >= self.pool_size or len(idle) >= self._host_limit(host):
+                conn.close()
+                return
+            idle.append((conn, time.time()))
+            self._size += 1
+        finally:
+            self._lock.release()
+
+    def reserve(self, connections):
+        """reserve(connections)
+
+        Grows the limits so at least this many connections per host are
+        kept alive, for clients that send that many requests at the same
+        time. The limits are never lowered.
+        """
+        self._lock.acquire()
+        try:
+            self.per_host['default'] = max(self.per_host['default'], connections)
+            self.pool_size = max(self.pool_size, connections)
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        """clear()
+
+        Closes all the idle connections.
+        """
+        self._lock.acquire()
+        try:
+            for idle in self._idle.itervalues():
+                for conn, last_used in idle:
+                    conn.close()
+            self._idle = {}
+            self._size = 0
+        finally:
+            self._lock.release()
+
+    def idle_count(self, scheme=None, host=None):
+        """idle_count(scheme=None, host=None) -> number of idle connections"""
+        self._lock.acquire()
+        try:
+            if host is None:
+                return self._size
+            return len(self._idle.get((scheme or 'http', host), []))
+        finally:
+            self._lock.release()
+
+############################################################################
+## urllib2 handlers
+############################################################################
+
+class _PooledSocket(object):
+    """Gives to socket._fileobject the recv/close interface over a response,
+    and returns the connection to the pool once the body was fully read.
+    """
+
+    def __init__(self, pool, scheme, host, conn, response):
+        self._pool = pool
+        self._scheme = scheme
+        self._host = host
+        self._conn = conn
+        self._response = response
+
+    def recv(self, amt):
+        data = self._response.read(amt)
+        if self._response.isclosed():
+            self._release()
+        return data
+
+    def close(self):
+        self._release()
+
+    def _release(self):
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        if self._response.isclosed() and not self._response.will_close:
+            self._pool.put(self._scheme, self._host, conn)
+        else:
+            # a partially read body (a stream) can not be reused
+            self._response.close()
+            conn.close()
+
+class _KeepAliveMixin(object):
+
+    def __init__(self, pool=None):
+        self._pool = pool or ConnectionPool()
+
+    def _keepalive_open(self, scheme, req):
+        host = req.get_host()
+        if not host:
+            raise urllib2.URLError('no host given')
+
+        headers = dict(self.parent.addheaders)
+        headers.update(req.unredirected_hdrs)
+        headers.update(req.headers)
+        headers['Connection'] = 'keep-alive'
+        headers = dict((name.title(), val) for name, val in headers.items())
+
+        conn, reused = self._pool.get(scheme, host)
+        try:
+            response = self._send(conn, req, headers)
+        except (socket.error, httplib.HTTPException), e:
+            conn.close()
+            if not reused:
+                raise urllib2.URLError(e)
+            # the server closed the idle connection, try with a fresh one
+            conn, reused = self._pool._new_connection(scheme, host), False
+            try:
+                response = self._send(conn, req, headers)
+            except (socket.error, httplib.HTTPException), e:
+                conn.close()
+                raise urllib2.URLError(e)
+
+        sock = _PooledSocket(self._pool, scheme, host, conn, response)
+        fp = socket._fileobject(sock, close=True)
+        resp = urllib.addinfourl(fp, response.msg, req.get_full_url())
+        resp.code = response.status
+        resp.msg = response.reason
+        return resp
+
+    def _send(self, conn, req, headers):
+        if req.has_data():
+            data = req.get_data()
+            if hasattr(data, 'seek'):
+                # a file-like body is sent again when the request is retried
+                data.seek(0)
+            if 'Content-Type' not in headers:
+                headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            if 'Content-Length' not in headers:
+                headers['Content-Length'] = '%d' % len(data)
+            conn.request(req.get_method(), req.get_selector(), data, headers)
+        else:
+            conn.request(req.get_method(), req.get_selector(), headers=headers)
+        return conn.getresponse()
+
+class KeepAliveHandler(_KeepAliveMixin, urllib2.HTTPHandler):
+    """urllib2 handler that reuses http connections through a ConnectionPool"""
+
+    def __init__(self, pool=None):
+        _KeepAliveMixin.__init__(self, pool)
+        urllib2.HTTPHandler.__init__(self)
+
+    def http_open(self, req):
+        return self._keepalive_open('http', req)
+
+class KeepAliveHTTPSHandler(_KeepAliveMixin, urllib2.HTTPSHandler):
+    """urllib2 handler that reuses https connections through a ConnectionPool"""
+
+    def __init__(self, pool=None):
+        _KeepAliveMixin.__init__(self, pool)
+        urllib2.HTTPSHandler.__init__(self)
+
+    def https_open(self, req):
+        return self._keepalive_open('https', req)
@@ -0,0 +1,140 @@
+"""mtweets - Easy Twitter utilities in Python
+
+Pluggable JSON decoding.
+
+JSONDecoder uses the fastest JSON library installed (ujson, simplejson
+with its C speedups or the standard json module). LazyStatus defers the
+decoding of a stream status until one of its fields is read, so the
+statuses that are dropped or stored raw are never decoded. It is deferred,
+not partial, decoding: the first read decodes the whole status. The REST
+responses are decoded when they arrive.
+
+    >>> api = mtweets.API((key, secret), decoder=JSONDecoder('ujson'))
+    >>> stream.sample(lazy_callback(handle, fields=('id', 'text', 'user')))
+"""
+
+# fastest first. cjson is faster than simplejson but decodes "\/" as "\\/",
+# which breaks the urls of the statuses, it is only used when asked for.
+BACKENDS = ('ujson', 'simplejson', 'json')
+
+def _backend_loads(name):
+    module = __import__(name)
+    if name == 'cjson':
+        return module.decode
+    return module.loads
+
+class JSONDecoder(object):
+    """Decodes JSON with the given backend, or the fastest one installed.
+
+    Parameters:
+        backend - One of BACKENDS or 'cjson', None picks the first one
+                  available.
+    """
+
+    def __init__(self, backend=None):
+        if backend is not None:
+            self.name = backend
+            self.loads = _backend_loads(backend)
+            return
+        for name in BACKENDS:
+            try:
+                self.loads = _backend_loads(name)
+            except ImportError:
+                continue
+            self.name = name
+            break
+        else:
+            raise Exception("mtweets requires a JSON library to work.")
+
+    def load(self, fp):
+        return self.loads(fp.read())
+
+    def __repr__(self):
+        return '<JSONDecoder %s>'%self.name
+
+_default_decoder = None
+
+def get_decoder():
+    """get_decoder() -> shared JSONDecoder with the fastest backend"""
+    global _default_decoder
+    if _default_decoder is None:
+        _default_decoder = JSONDecoder()
+    return _default_decoder
+
+############################################################################
+## Lazy statuses
+############################################################################
+
+class LazyStatus(object):
+    """A status that keeps its raw JSON until a field is read.
+
+    The first access decodes the whole status, building every nested dict,
+    and releases the raw string. With fields only those keys are kept after
+    that decoding, the other ones are built and dropped.
+
+    It behaves like a read only dict: status['id'], status.get('user'),
+    'text' in status, status.keys().
+    """
+
+    __slots__ = ('_raw', '_data', '_loads', '_fields')
+
+    def __init__(self, raw, loads=None, fields=None):
+        self._raw = raw
+        self._data = None
+        self._loads = loads or get_decoder().loads
+        self._fields = fields
+
+    def _decode(self):
+        data = self._loads(self._raw)
+        if self._fields is not None and isinstance(data, dict):
+            data = dict([(key, data[key]) for key in self._fields if key in data])
+        self._data = data
+        self._raw = None
+        return data
+
+    @property
+    def decoded(self):
+        return self._data is not None
+
+    @property
+    def raw(self):
+        """Raw JSON of the status if it was not decoded yet, else None."""
+        return self._raw
+
+    def to_dict(self):
+        return self._data if self._data is not None else self._decode()
+
+    def __getitem__(self, key):
+        return self.to_dict()[key]
+
+    def get(self, key, default=None):
+        return self.to_dict().get(key, default)
+
+    def __contains__(self, key):
+        return key in self.to_dict()
+
+    def keys(self):
+        return self.to_dict().keys()
+
+    def __iter__(self):
+        return iter(self.to_dict())
+
+    def __len__(self):
+        return len(self.to_dict())
+
+    def __repr__(self):
+        if self._data is None:
+            return '<LazyStatus %r>'%self._raw[:60]
+        return '<LazyStatus %r>'%self._data
+
+def lazy_callback(callback, fields=None, decoder=None):
+    """lazy_callback(callback, fields=None, decoder=None) -> stream callback
+
+    Wraps a stream callback so it receives LazyStatus objects instead of the
+    raw lines, keep-alive lines are skipped.
+    """
+    loads = (decoder or get_decoder()).loads
+    def wrapper(line):
+        if line.strip():
+            callback(LazyStatus(line, loads, fields))
+    return wrapper
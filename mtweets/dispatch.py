@@ -0,0 +1,434 @@
+"""mtweets - Easy Twitter utilities in Python
+
+Decoupled consumption of stream lines.
+
+By default Stream calls the callback in the thread that reads the socket, a
+slow callback stops the reading and twitter disconnects the clients that
+fall behind. A StreamDispatcher lets the reader push the raw lines into a
+bounded buffer that is consumed by a group of worker threads, and a
+ProcessDispatcher moves the decoding and the callback to worker processes.
+
+    >>> dispatcher = StreamDispatcher(workers=4, queue_size=10000,
+    ...                               overflow='drop_oldest')
+    >>> stream.sample(callback, dispatcher=dispatcher)
+    >>> dispatcher.stats()
+    {'depth': 12, 'max_depth': 840, 'dropped': 0, 'spilled': 0, ...}
+"""
+
+import os
+import time
+import tempfile
+import multiprocessing
+
+from Queue import Queue
+from collections import deque
+from threading import Condition
+from threading import Event
+from threading import Lock
+from threading import Semaphore
+from threading import Thread
+
+from mtweets.decoding import get_decoder
+
+BLOCK = 'block'
+DROP_OLDEST = 'drop_oldest'
+SPILL = 'spill'
+
+OVERFLOW_POLICIES = (BLOCK, DROP_OLDEST, SPILL)
+
+############################################################################
+## Buffer
+############################################################################
+
+class RingBuffer(object):
+    """Bounded FIFO of strings shared by threads.
+
+    Parameters:
+        maxsize - Number of items kept in memory.
+
+        overflow - What put() does when the buffer is full:
+                   'block' waits for free space, 'drop_oldest' discards the
+                   oldest item and 'spill' writes the new items to a
+                   temporary file that is read back, in order, when the
+                   memory buffer is drained.
+
+        spill_dir - Directory of the spill file, defaults to the system
+                    temporary directory.
+    """
+
+    def __init__(self, maxsize=10000, overflow=BLOCK, spill_dir=None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError("RingBuffer(): overflow should be one of %s"%(', '.join(OVERFLOW_POLICIES)))
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.spill_dir = spill_dir
+
+        self.max_depth = 0
+        self.dropped = 0
+        self.spilled = 0
+
+        self._items = deque()
+        self._cond = Condition()
+        self._closed = False
+        self._spill_writer = None
+        self._spill_reader = None
+        self._spill_pending = 0
+
+    def __len__(self):
+        return len(self._items) + self._spill_pending
+
+    def put(self, item):
+        self._cond.acquire()
+        try:
+            if self._closed:
+                raise ValueError("RingBuffer.put(): buffer is closed")
+            if self.overflow == SPILL:
+                if self._spill_pending or len(self._items) >= self.maxsize:
+                    self._spill(item)
+                    self._cond.notifyAll()
+                    return
+            elif len(self._items) >= self.maxsize:
+                if self.overflow == DROP_OLDEST:
+                    self._items.popleft()
+                    self.dropped += 1
+                else:
+                    while len(self._items) >= self.maxsize and not self._closed:
+                        self._cond.wait()
+            self._items.append(item)
+            if len(self._items) > self.max_depth:
+                self.max_depth = len(self._items)
+            self._cond.notifyAll()
+        finally:
+            self._cond.release()
+
+    def get(self):
+        """get() -> item or None when the buffer is closed and empty"""
+        self._cond.acquire()
+        try:
+            while not self._items and not self._spill_pending:
+                if self._closed:
+                    return None
+                self._cond.wait()
+            if not self._items:
+                self._unspill()
+            item = self._items.popleft()
+            self._cond.notifyAll()
+            return item
+        finally:
+            self._cond.release()
+
+    def close(self):
+        """Wakes up the consumers, they get None once the buffer is empty."""
+        self._cond.acquire()
+        try:
+            self._closed = True
+            self._cond.notifyAll()
+        finally:
+            self._cond.release()
+
+    def _spill(self, item):
+        if self._spill_writer is None:
+            fd, path = tempfile.mkstemp(prefix='mtweets-spill-', dir=self.spill_dir)
+            self._spill_writer = os.fdopen(fd, 'wb')
+            self._spill_reader = open(path, 'rb')
+            # the file is removed when both descriptors are closed
+            os.remove(path)
+        self._spill_writer.write('%d\n'%len(item))
+        self._spill_writer.write(item)
+        self._spill_pending += 1
+        self.spilled += 1
+
+    def _unspill(self):
+        """Moves up to maxsize spilled items back to memory."""
+        self._spill_writer.flush()
+        while self._spill_pending and len(self._items) < self.maxsize:
+            size = int(self._spill_reader.readline())
+            self._items.append(self._spill_reader.read(size))
+            self._spill_pending -= 1
+        if not self._spill_pending:
+            self._spill_writer.close()
+            self._spill_reader.close()
+            self._spill_writer = self._spill_reader = None
+
+############################################################################
+## Dispatcher
+############################################################################
+
+class StreamDispatcher(object):
+    """Runs the stream callback in `workers` threads fed by a RingBuffer.
+
+    Parameters:
+        workers - Number of threads calling the callback.
+
+        queue_size, overflow, spill_dir - see RingBuffer.
+
+    The callback receives the raw lines as without dispatcher, the order is
+    kept only with one worker. Exceptions raised by the callback are counted
+    in stats()['errors'] and do not stop the workers.
+    """
+
+    def __init__(self, workers=1, queue_size=10000, overflow=BLOCK,
+                 spill_dir=None):
+        self.workers = workers
+        self.buffer = RingBuffer(queue_size, overflow, spill_dir)
+        self.processed = 0
+        self.errors = 0
+        self._lock = Lock()
+        self._threads = []
+        self._callback = None
+
+    def start(self, callback):
+        self._callback = callback
+        for i in range(self.workers):
+            thread = Thread(target=self._work)
+            thread.setDaemon(True)
+            thread.start()
+            self._threads.append(thread)
+
+    def put(self, line):
+        self.buffer.put(line)
+
+    def close(self):
+        """No more lines, the workers exit once the buffer is drained."""
+        self.buffer.close()
+
+    def join(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _work(self):
+        while True:
+            line = self.buffer.get()
+            if line is None:
+                break
+            failed = False
+            try:
+                self._callback(line)
+            except Exception:
+                failed = True
+            self._lock.acquire()
+            try:
+                self.processed += 1
+                if failed:
+                    self.errors += 1
+            finally:
+                self._lock.release()
+
+    def stats(self):
+        """stats() -> dict with the queue depth and the counters"""
+        return {'depth': len(self.buffer),
+                'max_depth': self.buffer.max_depth,
+                'dropped': self.buffer.dropped,
+                'spilled': self.buffer.spilled,
+                'processed': self.processed,
+                'errors': self.errors}
+
+############################################################################
+## Process pipeline
+############################################################################
+
+def _process_batch(args):
+    """Decodes, filters and handles a batch of frames in a worker process."""
+    handler, filter, batch = args
+    loads = get_decoder().loads
+    results = []
+    errors = 0
+    for frame in batch:
+        if not frame.strip():
+            continue
+        try:
+            status = loads(frame)
+            if filter is not None and not filter(status):
+                continue
+            result = handler(status)
+        except Exception:
+            errors += 1
+            continue
+        if result is not None:
+            results.append(result)
+    return len(batch), errors, results
+
+class ProcessDispatcher(object):
+    """Decodes and handles the stream in a pool of worker processes.
+
+    The reader thread only groups the raw frames in batches that are sent to
+    the workers, where they are decoded, filtered and passed to the callback,
+    so the JSON decoding is not limited by the GIL. The callback (and filter)
+    receive decoded statuses and should be picklable, module level functions.
+
+        >>> dispatcher = ProcessDispatcher(processes=4, on_result=store)
+        >>> stream.firehose(handle_status, dispatcher=dispatcher)
+
+    Parameters:
+        processes - Number of worker processes, defaults to the CPU count.
+
+        batch_size - Frames sent to a worker at once.
+
+        batch_interval - Seconds after which a partial batch is sent, for
+                         slow streams. None waits for full batches.
+
+        max_pending - Batches sent and not finished, put() blocks when it is
+                      reached so the reader does not outrun the workers.
+                      Defaults to twice the processes.
+
+        ordered - Deliver the results of the batches in the stream order,
+                  otherwise as soon as each batch finishes.
+
+        filter - Optional filter(status) -> bool run in the workers before
+                 the callback.
+
+        on_result - Optional on_result(value) called in this process with
+                    every non None value returned by the callback. Its
+                    errors are counted in errors.
+    """
+
+    def __init__(self, processes=None, batch_size=500, batch_interval=0.5,
+                 max_pending=None, ordered=True, filter=None, on_result=None):
+        self.processes = processes or multiprocessing.cpu_count()
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.max_pending = max_pending or 2 * self.processes
+        self.ordered = ordered
+        self.filter = filter
+        self.on_result = on_result
+
+        self.batches = 0
+        self.pending = 0
+        self.processed = 0
+        self.errors = 0
+        self._batch = []
+        self._batch_start = None
+        self._pending = Semaphore(self.max_pending)
+        self._lock = Lock()
+        # taken while a batch is built and submitted, by put() and the
+        # flusher thread
+        self._batch_lock = Lock()
+        self._closed = Event()
+        self._results = Queue()
+        self._collector = None
+        self._flusher = None
+        self._pool = None
+        self._callback = None
+
+    def start(self, callback):
+        self._callback = callback
+        self._pool = multiprocessing.Pool(self.processes)
+        self._closed.clear()
+        self._collector = Thread(target=self._collect)
+        self._collector.setDaemon(True)
+        self._collector.start()
+        if self.batch_interval:
+            self._flusher = Thread(target=self._flush)
+            self._flusher.setDaemon(True)
+            self._flusher.start()
+
+    def put(self, line):
+        self._batch_lock.acquire()
+        try:
+            if not self._batch:
+                self._batch_start = time.time()
+            self._batch.append(line)
+            if len(self._batch) >= self.batch_size:
+                self._submit()
+        finally:
+            self._batch_lock.release()
+
+    def _flush(self):
+        """Sends the partial batches older than batch_interval."""
+        while True:
+            self._closed.wait(self.batch_interval / 2.0)
+            self._batch_lock.acquire()
+            try:
+                if self._closed.isSet():
+                    break
+                if (self._batch and
+                    time.time() - self._batch_start >= self.batch_interval):
+                    self._submit()
+            finally:
+                self._batch_lock.release()
+
+    def _submit(self):
+        batch, self._batch = self._batch, []
+        self._pending.acquire()
+        self._lock.acquire()
+        try:
+            self.batches += 1
+            self.pending += 1
+        finally:
+            self._lock.release()
+        args = ((self._callback, self.filter, batch),)
+        if self.ordered:
+            self._results.put(self._pool.apply_async(_process_batch, args))
+        else:
+            # the callback only runs for the batches that succeed, the
+            # collector reports the failures
+            self._results.put(self._pool.apply_async(_process_batch, args,
+                                                     callback=self._deliver))
+
+    def _collect(self):
+        while True:
+            result = self._results.get()
+            if result is None:
+                break
+            try:
+                values = result.get()
+            except Exception:
+                # the batch failed in the worker or could not reach it, its
+                # pending slot is released here
+                self._deliver((0, 1, []))
+                continue
+            if self.ordered:
+                self._deliver(values)
+
+    def _deliver(self, result):
+        processed, errors, values = result
+        self._lock.acquire()
+        try:
+            self.pending -= 1
+            self.processed += processed
+            self.errors += errors
+        finally:
+            self._lock.release()
+        self._pending.release()
+        if self.on_result is not None:
+            failed = 0
+            for value in values:
+                try:
+                    self.on_result(value)
+                except Exception:
+                    # raising here would stop the collector thread or the
+                    # result handler of the pool
+                    failed += 1
+            if failed:
+                self._lock.acquire()
+                try:
+                    self.errors += failed
+                finally:
+                    self._lock.release()
+
+    def close(self):
+        """Sends the partial batch and lets the workers finish."""
+        self._batch_lock.acquire()
+        try:
+            self._closed.set()
+            if self._batch:
+                self._submit()
+        finally:
+            self._batch_lock.release()
+        if self._collector is not None:
+            self._results.put(None)
+        self._pool.close()
+
+    def join(self, timeout=None):
+        self._pool.join()
+        if self._flusher is not None:
+            self._flusher.join(timeout)
+        if self._collector is not None:
+            self._collector.join(timeout)
+
+    def stats(self):
+        """stats() -> dict with the batches and lines counters"""
+        return {'batches': self.batches,
+                'pending': self.pending,
+                'processed': self.processed,
+                'errors': self.errors}
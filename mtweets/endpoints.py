@@ -0,0 +1,262 @@
+"""mtweets - Easy Twitter utilities in Python
+
+Registry of the twitter endpoints.
+
+Every endpoint used by API and Stream is described once here: its HTTP
+method, host, path template, whether it needs authentication, the rate limit
+family that counts it and how long its responses can be cached. The clients
+build the urls from this table, so the host and the scheme of every twitter
+API can be changed per client, for regional proxies, caching gateways or a
+local mtweets.fakeserver:
+
+    >>> api = mtweets.API((key, secret), scheme='https')
+    >>> api = mtweets.API((key, secret),
+    ...                   base_urls={'api.twitter.com': 'http://gateway:8080'})
+    >>> api.endpoint_url('status_show', (1234,))
+    'http://gateway:8080/1/statuses/show/1234.json'
+
+Path templates start with "/%d/" when the API is versioned, the version is
+filled by the client; the other %s are the arguments of the endpoint.
+"""
+
+API_HOST = 'api.twitter.com'
+SEARCH_HOST = 'search.twitter.com'
+STREAM_HOST = 'stream.twitter.com'
+
+# authentication of the endpoints: requests to AUTH_REQUIRED endpoints fail
+# without a token, AUTH_OPTIONAL requests are signed and AUTH_NONE requests
+# are sent without OAuth parameters.
+AUTH_REQUIRED = 'required'
+AUTH_OPTIONAL = 'optional'
+AUTH_NONE = None
+
+# rate limit family of the REST API
+REST = 'rest'
+# rate limit family of the search API, limited apart from the REST API
+SEARCH = 'search'
+# rate limit family of the unsigned REST requests, twitter counts them per IP
+# address instead of per token
+ANONYMOUS = 'anonymous'
+
+class Endpoint(object):
+    """An endpoint of the twitter APIs.
+
+    Parameters:
+        name - Name of the endpoint, the name of the API method that uses it.
+
+        http_method - 'GET' or 'POST'.
+
+        host - Twitter host, the clients may send it somewhere else.
+
+        path - Path template, see the module documentation.
+
+        auth - AUTH_REQUIRED, AUTH_OPTIONAL or AUTH_NONE.
+
+        family - Rate limit family that counts the requests, None when they
+                 are not rate limited.
+
+        ttl - Seconds the responses can be cached, None is not cacheable.
+
+        scheme - Default scheme, 'http' or 'https'.
+
+        shared - The endpoint is a read whose response does not depend on
+                 the authenticated user, any token of an APIPool can send
+                 it.
+    """
+
+    __slots__ = ('name', 'http_method', 'host', 'path', 'auth', 'family',
+                 'ttl', 'scheme', 'shared', 'versioned')
+
+    def __init__(self, name, http_method, host, path, auth=AUTH_REQUIRED,
+                 family=REST, ttl=None, scheme='http', shared=False):
+        self.name = name
+        self.http_method = http_method
+        self.host = host
+        self.path = path
+        self.auth = auth
+        self.family = family
+        self.ttl = ttl
+        self.scheme = scheme
+        self.shared = shared
+        self.versioned = path.startswith('/%d/')
+
+    def url(self, base, version, args=()):
+        """url(base, version, args=()) -> full url of the endpoint"""
+        if self.versioned:
+            args = (version,) + tuple(args)
+        if args:
+            return base + self.path % tuple(args)
+        return base + self.path
+
+    def __repr__(self):
+        return '<Endpoint %s %s %s%s>'%(self.name, self.http_method, self.host, self.path)
+
+ENDPOINTS = {}
+
+def register(name, http_method, host, path, auth=AUTH_REQUIRED, family=REST,
+             ttl=None, scheme='http', shared=False):
+    """register(name, http_method, host, path, auth=AUTH_REQUIRED, family=REST, ttl=None, scheme='http', shared=False)
+
+    Adds or replaces an endpoint of the registry, returns it.
+    """
+    endpoint = Endpoint(name, http_method, host, path, auth, family, ttl,
+                        scheme, shared)
+    ENDPOINTS[name] = endpoint
+    return endpoint
+
+def get_endpoint(name):
+    """get_endpoint(name) -> Endpoint, KeyError for unknown names"""
+    return ENDPOINTS[name]
+
+############################################################################
+## Table
+############################################################################
+
+# (name, http_method, host, path, auth, family, ttl, scheme), trailing
+# fields can be omitted and take the defaults of register(). POST requests
+# are not counted by the REST rate limit, except users/lookup.
+_TABLE = [
+    # OAuth
+    ('request_token', 'GET', API_HOST, '/oauth/request_token', AUTH_NONE, None, None, 'https'),
+    ('access_token', 'GET', API_HOST, '/oauth/access_token', AUTH_NONE, None, None, 'https'),
+    ('authorize', 'GET', API_HOST, '/oauth/authorize', AUTH_NONE, None, None, 'https'),
+    ('authenticate', 'GET', API_HOST, '/oauth/authenticate', AUTH_NONE, None, None, 'https'),
+    # Timeline
+    ('public_timeline_get', 'GET', API_HOST, '/%d/statuses/public_timeline.json', AUTH_NONE, ANONYMOUS, 60),
+    ('home_timeline_get', 'GET', API_HOST, '/%d/statuses/home_timeline.json', AUTH_REQUIRED),
+    ('friends_timeline_get', 'GET', API_HOST, '/%d/statuses/friends_timeline.json', AUTH_REQUIRED),
+    ('user_timeline_get', 'GET', API_HOST, '/%d/statuses/user_timeline.json', AUTH_OPTIONAL),
+    ('mentions_get', 'GET', API_HOST, '/%d/statuses/mentions.json', AUTH_REQUIRED),
+    ('retweeted_of_me_get', 'GET', API_HOST, '/%d/statuses/retweets_of_me.json', AUTH_REQUIRED),
+    ('retweeted_by_me_get', 'GET', API_HOST, '/%d/statuses/retweeted_by_me.json', AUTH_REQUIRED),
+    ('retweeted_to_me_get', 'GET', API_HOST, '/%d/statuses/retweeted_to_me.json', AUTH_REQUIRED),
+    # Status
+    ('status_show', 'GET', API_HOST, '/%d/statuses/show/%s.json', AUTH_OPTIONAL),
+    ('status_update', 'POST', API_HOST, '/%d/statuses/update.json', AUTH_REQUIRED, None),
+    ('status_destroy', 'POST', API_HOST, '/%d/statuses/destroy/%s.json', AUTH_REQUIRED, None),
+    ('status_retweet', 'POST', API_HOST, '/%d/statuses/retweet/%s.json', AUTH_REQUIRED, None),
+    ('retweets_get', 'GET', API_HOST, '/%d/statuses/retweets/%s.json', AUTH_OPTIONAL),
+    ('retweeted_by_get', 'GET', API_HOST, '/%d/statuses/%s/retweeted_by.json', AUTH_REQUIRED),
+    ('retweeted_by_ids_get', 'GET', API_HOST, '/%d/statuses/%s/retweeted_by/ids.json', AUTH_REQUIRED),
+    # User
+    ('user_show', 'GET', API_HOST, '/%d/users/show.json', AUTH_OPTIONAL, REST, 300),
+    ('user_lookup', 'POST', API_HOST, '/%d/users/lookup.json', AUTH_REQUIRED),
+    ('user_search', 'GET', API_HOST, '/%d/users/search.json', AUTH_REQUIRED),
+    ('user_suggestions', 'GET', API_HOST, '/%d/users/suggestions.json', AUTH_OPTIONAL, REST, 3600),
+    ('user_suggestions_slug', 'GET', API_HOST, '/%d/users/suggestions/%s.json', AUTH_OPTIONAL, REST, 3600),
+    ('user_profile_image', 'GET', API_HOST, '/%d/users/profile_image/%s.json', AUTH_OPTIONAL),
+    ('user_statuses_friends', 'GET', API_HOST, '/%d/statuses/friends.json', AUTH_OPTIONAL),
+    ('user_statuses_followers', 'GET', API_HOST, '/%d/statuses/followers.json', AUTH_OPTIONAL),
+    # Trends
+    ('trends_get', 'GET', API_HOST, '/%d/trends.json', AUTH_NONE, ANONYMOUS, 300),
+    ('trends_woeid_get', 'GET', API_HOST, '/%d/trends/%s.json', AUTH_NONE, ANONYMOUS, 300),
+    ('trends_current', 'GET', API_HOST, '/%d/trends/current.json', AUTH_NONE, ANONYMOUS, 300),
+    ('trends_dialy', 'GET', API_HOST, '/%d/trends/daily.json', AUTH_NONE, ANONYMOUS, 3600),
+    ('trends_weekly', 'GET', API_HOST, '/%d/trends/weekly.json', AUTH_NONE, ANONYMOUS, 3600),
+    ('trends_available', 'GET', API_HOST, '/%d/trends/available.json', AUTH_NONE, ANONYMOUS, 3600),
+    # List
+    ('user_list', 'POST', API_HOST, '/%d/%s/lists.json', AUTH_REQUIRED, None),
+    ('user_list_id', 'POST', API_HOST, '/%d/%s/lists/%s.json', AUTH_REQUIRED, None),
+    ('user_list_get', 'GET', API_HOST, '/%d/%s/lists.json', AUTH_REQUIRED),
+    ('user_list_id_get', 'GET', API_HOST, '/%d/%s/lists/%s.json', AUTH_REQUIRED),
+    ('user_list_id_delete', 'POST', API_HOST, '/%d/%s/lists/%s.json', AUTH_REQUIRED, None),
+    ('user_list_statuses_get', 'GET', API_HOST, '/%d/%s/lists/%s/statuses.json', AUTH_NONE, ANONYMOUS),
+    ('user_list_memberships_get', 'GET', API_HOST, '/%d/%s/lists/memberships.json', AUTH_REQUIRED),
+    ('user_list_subscriptions_get', 'GET', API_HOST, '/%d/%s/lists/subscriptions.json', AUTH_REQUIRED),
+    ('user_list_members_get', 'GET', API_HOST, '/%d/%s/%s/members.json', AUTH_REQUIRED),
+    ('user_list_members_add', 'POST', API_HOST, '/%d/%s/%s/members.json', AUTH_REQUIRED, None),
+    ('user_list_members_create_all', 'POST', API_HOST, '/%d/%s/%s/create_all.json', AUTH_REQUIRED, None),
+    ('user_list_members_delete', 'POST', API_HOST, '/%d/%s/%s/members.json', AUTH_REQUIRED, None),
+    ('user_list_is_member', 'GET', API_HOST, '/%d/%s/%s/members/%s.json', AUTH_REQUIRED),
+    ('user_list_subscribers_get', 'GET', API_HOST, '/%d/%s/%s/subscribers.json', AUTH_REQUIRED),
+    ('user_list_subscribers', 'POST', API_HOST, '/%d/%s/%s/subscribers.json', AUTH_REQUIRED, None),
+    ('user_list_subscribers_delete', 'POST', API_HOST, '/%d/%s/%s/subscribers.json', AUTH_REQUIRED, None),
+    ('user_list_is_subscriber', 'GET', API_HOST, '/%d/%s/%s/subscribers/%s.json', AUTH_REQUIRED),
+    # Direct messages
+    ('direct_messages_get', 'GET', API_HOST, '/%d/direct_messages.json', AUTH_REQUIRED),
+    ('direct_messages_sent_get', 'GET', API_HOST, '/%d/direct_messages/sent.json', AUTH_REQUIRED),
+    ('direct_messages_new', 'POST', API_HOST, '/%d/direct_messages/new.json', AUTH_REQUIRED, None),
+    ('direct_messages_destroy', 'POST', API_HOST, '/%d/direct_messages/destroy/%s.json', AUTH_REQUIRED, None),
+    # Friendship
+    ('friendship_create', 'POST', API_HOST, '/%d/friendships/create.json', AUTH_REQUIRED, None),
+    ('friendship_destroy', 'POST', API_HOST, '/%d/friendships/destroy.json', AUTH_REQUIRED, None),
+    ('friendship_exists', 'GET', API_HOST, '/%d/friendships/exists.json', AUTH_OPTIONAL),
+    ('friendship_show', 'GET', API_HOST, '/%d/friendships/show.json', AUTH_OPTIONAL),
+    ('friendship_incoming', 'GET', API_HOST, '/%d/friendships/incoming.json', AUTH_REQUIRED),
+    ('friendship_outgoing', 'GET', API_HOST, '/%d/friendships/outgoing.json', AUTH_REQUIRED),
+    ('friendship_ids_get', 'GET', API_HOST, '/%d/friends/ids.json', AUTH_OPTIONAL),
+    ('followers_ids_get', 'GET', API_HOST, '/%d/followers/ids.json', AUTH_OPTIONAL),
+    # Account
+    ('verify_credentials', 'GET', API_HOST, '/%d/account/verify_credentials.json', AUTH_REQUIRED),
+    ('rate_limit_status', 'GET', API_HOST, '/%d/account/rate_limit_status.json', AUTH_OPTIONAL, None),
+    ('end_session', 'GET', API_HOST, '/%d/account/end_session.json', AUTH_REQUIRED),
+    ('delivery_device_update', 'POST', API_HOST, '/%d/account/update_delivery_device.json', AUTH_REQUIRED, None),
+    ('profile_colors_update', 'POST', API_HOST, '/%d/account/update_profile_colors.json', AUTH_REQUIRED, None),
+    ('profile_image_image', 'POST', API_HOST, '/%d/account/update_profile_image.json', AUTH_REQUIRED, None),
+    ('profile_background_image_update', 'POST', API_HOST, '/%d/account/update_profile_background_image.json', AUTH_REQUIRED, None),
+    ('profile_update', 'POST', API_HOST, '/%d/account/update_profile.json', AUTH_REQUIRED, None),
+    # Favorites
+    ('favorite_create', 'POST', API_HOST, '/%d/favorites/create/%s.json', AUTH_REQUIRED, None),
+    ('favorite_destroy', 'POST', API_HOST, '/%d/favorites/destroy/%s.json', AUTH_REQUIRED, None),
+    ('favorites_get', 'GET', API_HOST, '/%d/favorites.json', AUTH_REQUIRED),
+    ('favorites_get_id', 'GET', API_HOST, '/%d/favorites/%s.json', AUTH_REQUIRED),
+    # Notification
+    ('notification_follow', 'POST', API_HOST, '/%d/notifications/follow.json', AUTH_REQUIRED, None),
+    ('notification_leave', 'POST', API_HOST, '/%d/notifications/leave.json', AUTH_REQUIRED, None),
+    # Block
+    ('block_create', 'POST', API_HOST, '/%d/blocks/create.json', AUTH_REQUIRED, None),
+    ('block_destroy', 'POST', API_HOST, '/%d/blocks/destroy.json', AUTH_REQUIRED, None),
+    ('block_exists', 'GET', API_HOST, '/%d/blocks/exists.json', AUTH_REQUIRED),
+    ('block_get', 'GET', API_HOST, '/%d/blocks/blocking.json', AUTH_REQUIRED),
+    ('blocked_get_ids', 'GET', API_HOST, '/%d/blocks/blocking/ids.json', AUTH_REQUIRED),
+    # Spam
+    ('report_spam', 'GET', API_HOST, '/%d/report_spam.json', AUTH_REQUIRED),
+    # Saved searches
+    ('saved_searches_get', 'GET', API_HOST, '/%d/saved_searches.json', AUTH_REQUIRED),
+    ('saved_searches_show', 'GET', API_HOST, '/%d/saved_searches/show/%s.json', AUTH_REQUIRED),
+    ('saved_searches_destroy', 'POST', API_HOST, '/%d/saved_searches/destroy/%s.json', AUTH_REQUIRED, None),
+    ('saved_searches_create', 'POST', API_HOST, '/%d/saved_searches/create.json', AUTH_REQUIRED, None),
+    # Geo
+    ('geo_search', 'GET', API_HOST, '/%d/geo/search.json', AUTH_OPTIONAL),
+    ('geo_similar_places', 'GET', API_HOST, '/%d/geo/similar_places.json', AUTH_OPTIONAL),
+    ('geo_reverse_geocode', 'GET', API_HOST, '/%d/geo/reverse_geocode.json', AUTH_OPTIONAL),
+    ('geo_id', 'GET', API_HOST, '/%d/geo/id/%s.json', AUTH_OPTIONAL, REST, 86400),
+    ('geo_place', 'POST', API_HOST, '/%d/geo/place.json', AUTH_REQUIRED, None),
+    # Legal
+    ('legal_tos', 'GET', API_HOST, '/%d/legal/tos.json', AUTH_NONE, ANONYMOUS, 86400),
+    ('legal_privacy', 'GET', API_HOST, '/%d/legal/privacy.json', AUTH_NONE, ANONYMOUS, 86400),
+    # Help
+    ('help_test', 'GET', API_HOST, '/%d/help/test.json', AUTH_NONE, ANONYMOUS),
+    # Search
+    ('search', 'GET', SEARCH_HOST, '/search.json', AUTH_NONE, SEARCH),
+    # Streaming, not counted by the REST rate limit
+    ('filter', 'POST', STREAM_HOST, '/statuses/filter.json', AUTH_REQUIRED, None),
+    ('firehose', 'GET', STREAM_HOST, '/statuses/firehose.json', AUTH_REQUIRED, None),
+    ('retweet', 'GET', STREAM_HOST, '/statuses/retweet.json', AUTH_REQUIRED, None),
+    ('sample', 'GET', STREAM_HOST, '/statuses/sample.json', AUTH_REQUIRED, None),
+]
+
+# reads that return the same data to every user, the other endpoints act on
+# or read the account of the token (home timeline, direct messages, blocks,
+# saved searches, private lists...)
+_SHARED = (
+    'public_timeline_get', 'user_timeline_get', 'status_show', 'retweets_get',
+    'retweeted_by_get', 'retweeted_by_ids_get',
+    'user_show', 'user_lookup', 'user_search', 'user_suggestions',
+    'user_suggestions_slug', 'user_profile_image', 'user_statuses_friends',
+    'user_statuses_followers',
+    'trends_get', 'trends_woeid_get', 'trends_current', 'trends_dialy',
+    'trends_weekly', 'trends_available',
+    'user_list_statuses_get', 'user_list_memberships_get',
+    'user_list_subscriptions_get', 'user_list_members_get',
+    'user_list_is_member', 'user_list_subscribers_get',
+    'user_list_is_subscriber',
+    'friendship_exists', 'friendship_ids_get', 'followers_ids_get',
+    'favorites_get_id',
+    'geo_search', 'geo_similar_places', 'geo_reverse_geocode', 'geo_id',
+    'legal_tos', 'legal_privacy', 'help_test', 'search',
+)
+
+for _row in _TABLE:
+    register(*_row, **{'shared': _row[0] in _SHARED})
+del _row
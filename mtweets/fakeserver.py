@@ -0,0 +1,665 @@
+"""mtweets - Easy Twitter utilities in Python
+
+Local stand-in of the twitter REST, search and streaming APIs.
+
+FakeTwitterServer answers the endpoints used by API and Stream with
+synthetic data, so the clients can be exercised, load tested and
+benchmarked without network access or credentials. Latency, rate limit
+headers, errors and the volume of the data are configurable.
+
+    >>> server = FakeTwitterServer(latency=0.05, error_rate=0.01).start()
+    >>> api = mtweets.API((key, secret), base_urls=server.base_urls())
+    >>> api.token = OAuthToken('token', 'secret')
+    >>> api.home_timeline_get(count=200)
+    >>> server.stop()
+
+It can run alone too, for other load tools:
+
+    python mtweets/fakeserver.py --port 8000 --latency 0.05
+
+The server does not check the OAuth signatures and the mutations (update,
+create, destroy...) do not change its data, they answer the object a
+successful request would return.
+"""
+
+import re
+import time
+import random
+import socket
+import urlparse
+import threading
+
+from optparse import OptionParser
+from SocketServer import ThreadingMixIn
+from BaseHTTPServer import HTTPServer
+from BaseHTTPServer import BaseHTTPRequestHandler
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+# hosts of the twitter APIs used by mtweets
+TWITTER_HOSTS = ('api.twitter.com', 'search.twitter.com', 'stream.twitter.com')
+
+CREATED_AT = 'Wed Aug 11 19:37:35 +0000 2010'
+SOURCES = ('web', '<a href="http://twitter.com/devices">txt</a>',
+           '<a href="http://www.tweetdeck.com">TweetDeck</a>')
+LANGS = ('en', 'es', 'ja', 'pt')
+TREND_NAMES = ('#python', '#twitter', 'mtweets', '#fail', 'World Cup',
+               '#nowplaying', 'Mexico', '#ff', 'Tokyo', '#followfriday')
+
+SAVED_SEARCHES = ('#python', 'mtweets', 'twitter api', 'from:user1', 'lang:es futbol')
+IDS_PAGE = 5000
+USERS_PAGE = 100
+
+############################################################################
+## Synthetic data
+############################################################################
+
+def make_user(id):
+    """make_user(id) -> user dict, always the same for the same id"""
+    return {'id': id, 'screen_name': 'user%d'%id, 'name': 'User %d'%id,
+            'location': ('Mexico', 'Tokyo', '')[id % 3],
+            'description': 'about user %d'%id, 'url': None,
+            'protected': False, 'verified': id % 100 == 0,
+            'followers_count': id * 7919 % 100000,
+            'friends_count': id * 104729 % 2000,
+            'statuses_count': id * 31 % 50000,
+            'favourites_count': 0, 'listed_count': id % 50,
+            'created_at': CREATED_AT, 'utc_offset': -21600,
+            'time_zone': 'Central Time (US & Canada)',
+            'lang': LANGS[id % len(LANGS)], 'geo_enabled': False,
+            'profile_image_url': 'http://a1.twimg.com/profile_images/%d/a.png'%id,
+            'following': None, 'notifications': None}
+
+def make_status(id, user_id, text=None):
+    """make_status(id, user_id, text=None) -> status dict"""
+    return {'id': id, 'text': text or 'status number %d from the fake server'%id,
+            'created_at': CREATED_AT, 'source': SOURCES[id % len(SOURCES)],
+            'truncated': False, 'in_reply_to_status_id': None,
+            'in_reply_to_user_id': None, 'in_reply_to_screen_name': None,
+            'favorited': False, 'retweeted': False, 'retweet_count': 0,
+            'geo': None, 'coordinates': None, 'place': None,
+            'contributors': None, 'user': make_user(user_id)}
+
+def make_list(id, user_id, slug=None):
+    slug = slug or 'list%d'%id
+    return {'id': id, 'name': slug, 'slug': slug,
+            'full_name': '@user%d/%s'%(user_id, slug), 'description': '',
+            'mode': 'public', 'uri': '/user%d/%s'%(user_id, slug),
+            'member_count': 0, 'subscriber_count': 0, 'following': False,
+            'user': make_user(user_id)}
+
+def make_saved_search(id, query):
+    return {'id': id, 'query': query, 'name': query, 'position': None,
+            'created_at': CREATED_AT}
+
+def make_search_result(id, user_id, query):
+    return {'id': id, 'text': 'result %d for %s'%(id, query),
+            'created_at': 'Wed, 11 Aug 2010 19:37:35 +0000',
+            'from_user': 'user%d'%user_id, 'from_user_id': user_id,
+            'to_user_id': None, 'iso_language_code': LANGS[id % len(LANGS)],
+            'source': SOURCES[id % len(SOURCES)],
+            'profile_image_url': 'http://a1.twimg.com/profile_images/%d/a.png'%user_id,
+            'metadata': {'result_type': 'recent'}}
+
+############################################################################
+## Server
+############################################################################
+
+class FakeTwitterServer(ThreadingMixIn, HTTPServer):
+    """Threaded HTTP/1.1 server that answers like twitter.
+
+    Parameters:
+        host, port - Address to listen, port 0 picks a free port.
+
+        latency - Seconds added to every response, or a (min, max) tuple
+                  for a random latency.
+
+        rate_limit - Requests per window allowed to each token, answered
+                     in the X-RateLimit-* headers. None disables the limit.
+
+        rate_limit_window - Seconds of the rate limit window.
+
+        error_rate - Probability of answering a REST request with one of
+                     error_codes instead of the resource.
+
+        error_codes - Codes used by error_rate.
+
+        users - Number of synthetic users.
+
+        statuses - Statuses of every timeline, the ids go from 1 to this.
+
+        followers - Ids returned by friends/ids and followers/ids, and
+                    users by the list members and subscribers.
+
+        search_results - Results available for every search query.
+
+        stream_limit - Statuses sent by each stream connection before it is
+                       closed, None keeps sending until the client leaves.
+
+        stream_rate - Statuses per second of the streams, None sends them
+                      as fast as possible.
+
+        verbose - Log the requests to stderr.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0, rate_limit=350,
+                 rate_limit_window=3600, error_rate=0.0,
+                 error_codes=(500, 502, 503), users=10000, statuses=3200,
+                 followers=20000, search_results=1500, stream_limit=10000,
+                 stream_rate=None, verbose=False):
+        HTTPServer.__init__(self, (host, port), _Handler)
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.error_rate = error_rate
+        self.error_codes = error_codes
+        self.users = users
+        self.statuses = statuses
+        self.followers = followers
+        self.search_results = search_results
+        self.stream_limit = stream_limit
+        self.stream_rate = stream_rate
+        self.verbose = verbose
+
+        self.requests = 0
+        self.errors = 0
+        self._limits = {}
+        self._injected = []
+        self._random = random.Random(0)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://%s:%d'%self.server_address[:2]
+
+    def base_urls(self):
+        """base_urls() -> dict for the base_urls parameter of the clients"""
+        return dict((host, self.url) for host in TWITTER_HOSTS)
+
+    def start(self):
+        """Serves in a daemon thread, returns the server."""
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.setDaemon(True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def inject_error(self, pattern, code=503, count=1):
+        """inject_error(pattern, code=503, count=1)
+
+        The next count requests whose path matches the regular expression
+        pattern are answered with code.
+        """
+        self._lock.acquire()
+        try:
+            self._injected.append([re.compile(pattern), code, count])
+        finally:
+            self._lock.release()
+
+    def _error_for(self, path, rest):
+        self._lock.acquire()
+        try:
+            self.requests += 1
+            for entry in self._injected:
+                if entry[0].search(path):
+                    entry[2] -= 1
+                    if not entry[2]:
+                        self._injected.remove(entry)
+                    self.errors += 1
+                    return entry[1]
+            if rest and self.error_rate and self._random.random() < self.error_rate:
+                self.errors += 1
+                return self._random.choice(self.error_codes)
+        finally:
+            self._lock.release()
+        return None
+
+    def _hit(self, token):
+        """Counts a request of token, -> (limit, remaining, reset) or None
+        when the limit is disabled. remaining is -1 when exhausted."""
+        if self.rate_limit is None:
+            return None
+        now = time.time()
+        self._lock.acquire()
+        try:
+            remaining, reset = self._limits.get(token, (self.rate_limit, 0))
+            if now >= reset:
+                remaining, reset = self.rate_limit, int(now + self.rate_limit_window)
+            remaining -= 1
+            self._limits[token] = (max(remaining, 0), reset)
+            return self.rate_limit, remaining, reset
+        finally:
+            self._lock.release()
+
+    def _status(self, token):
+        self._lock.acquire()
+        try:
+            remaining, reset = self._limits.get(token, (self.rate_limit, 0))
+        finally:
+            self._lock.release()
+        if time.time() >= reset:
+            remaining, reset = self.rate_limit, int(time.time() + self.rate_limit_window)
+        return remaining, reset
+
+    def _delay(self):
+        latency = self.latency
+        if isinstance(latency, (tuple, list)):
+            latency = self._random.uniform(*latency)
+        if latency:
+            time.sleep(latency)
+
+############################################################################
+## Endpoints
+############################################################################
+
+_VERSIONED = re.compile(r'^/(\d+)/(.+?)(?:\.json)?$')
+_UNVERSIONED = re.compile(r'^/(.+?)(?:\.json)?$')
+_AUTHORIZATION_TOKEN = re.compile(r'oauth_token="([^"]*)"')
+
+# (regular expression, handler method) tried in order over the path without
+# the version prefix and the extension
+ROUTES = [
+    (r'statuses/(public_timeline|home_timeline|friends_timeline|user_timeline|'
+     r'mentions|retweeted_by_me|retweeted_to_me|retweets_of_me)', 'timeline'),
+    (r'statuses/retweets/\d+', 'timeline'),
+    (r'statuses/(show|destroy|retweet)/(\d+)', 'status'),
+    (r'statuses/update', 'status'),
+    (r'statuses/\d+/retweeted_by', 'users'),
+    (r'statuses/\d+/retweeted_by/ids', 'ids'),
+    (r'statuses/(friends|followers)', 'cursored_users'),
+    (r'(friends|followers)/ids', 'ids'),
+    (r'friendships/(incoming|outgoing)', 'ids'),
+    (r'friendships/(create|destroy)', 'user'),
+    (r'friendships/exists', 'exists'),
+    (r'friendships/show', 'relationship'),
+    (r'blocks/(create|destroy|exists)', 'user'),
+    (r'blocks/blocking/ids', 'ids'),
+    (r'blocks/blocking', 'users'),
+    (r'users/show', 'user'),
+    (r'users/lookup', 'lookup'),
+    (r'users/search', 'users'),
+    (r'users/suggestions', 'suggestions'),
+    (r'users/suggestions/(\w+)', 'suggestion'),
+    (r'account/verify_credentials', 'user'),
+    (r'account/rate_limit_status', 'rate_limit_status'),
+    (r'account/update_profile_(image|background_image)', 'profile_image'),
+    (r'trends', 'trends'),
+    (r'trends/(current|daily|weekly)', 'trends_dated'),
+    (r'trends/available', 'trends_available'),
+    (r'trends/(\d+)', 'trends_location'),
+    (r'search', 'search'),
+    (r'help/test', 'ok'),
+    (r'saved_searches', 'saved_searches'),
+    (r'saved_searches/(show|destroy)/(\d+)', 'saved_search'),
+    (r'saved_searches/create', 'saved_search'),
+    (r'(\w+)/lists', 'lists'),
+    (r'(\w+)/lists/(memberships|subscriptions)', 'lists'),
+    (r'(\w+)/lists/([\w-]+)/statuses', 'timeline'),
+    (r'(\w+)/lists/([\w-]+)', 'list'),
+    (r'(\w+)/([\w-]+)/(members|subscribers)/create_all', 'list'),
+    (r'(\w+)/([\w-]+)/create_all', 'list'),
+    (r'(\w+)/([\w-]+)/(members|subscribers)/(\d+)', 'user'),
+    (r'(\w+)/([\w-]+)/(members|subscribers)', 'members'),
+]
+ROUTES = [(re.compile('^%s$'%pattern), name) for pattern, name in ROUTES]
+
+STREAM_ROUTES = re.compile(r'^statuses/(sample|filter|firehose|retweet)$')
+
+class _Handler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'FakeTwitter/0.1'
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        # the status line, headers and body are separate writes, without
+        # this a reused connection waits for the delayed ACK of the client
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_POST(self):
+        self._dispatch()
+
+    def do_DELETE(self):
+        self._dispatch()
+
+    def _read_params(self):
+        url = urlparse.urlparse(self.path)
+        params = dict(urlparse.parse_qsl(url.query, True))
+        length = int(self.headers.get('Content-Length') or 0)
+        body = length and self.rfile.read(length) or ''
+        self.body = body
+        if body and 'multipart' not in self.headers.get('Content-Type', ''):
+            params.update(urlparse.parse_qsl(body, True))
+        if 'oauth_token' not in params:
+            match = _AUTHORIZATION_TOKEN.search(self.headers.get('Authorization', ''))
+            if match is not None:
+                params['oauth_token'] = urlparse.unquote(match.group(1))
+        return url.path, params
+
+    def _dispatch(self):
+        path, self.params = self._read_params()
+        server = self.server
+        match = _VERSIONED.match(path)
+        stream = None
+        if match is None:
+            match = _UNVERSIONED.match(path)
+            stream = match and STREAM_ROUTES.match(match.group(1))
+            resource = match and match.group(1) or ''
+        else:
+            resource = match.group(2)
+
+        server._delay()
+        code = server._error_for(path, not stream)
+        if code is not None:
+            return self._send_json({'error': 'Injected error', 'request': path}, code)
+        if stream:
+            return self._stream(stream.group(1))
+
+        headers = {}
+        # like twitter, search, the rate limit status and the POST requests
+        # other than users/lookup are not counted
+        if (resource not in ('search', 'account/rate_limit_status') and
+            (self.command != 'POST' or resource == 'users/lookup')):
+            token = self.params.get('oauth_token') or self.client_address[0]
+            limit = server._hit(token)
+            if limit is not None:
+                headers['X-RateLimit-Limit'] = limit[0]
+                headers['X-RateLimit-Remaining'] = max(limit[1], 0)
+                headers['X-RateLimit-Reset'] = limit[2]
+                if limit[1] < 0:
+                    return self._send_json({'error': 'Rate limit exceeded.',
+                                            'request': path}, 400, headers)
+
+        for regexp, name in ROUTES:
+            match = regexp.match(resource)
+            if match is not None:
+                data = getattr(self, '_%s'%name)(*match.groups())
+                return self._send_json(data, 200, headers)
+        self._send_json({'error': 'Not found', 'request': path}, 404, headers)
+
+    def _send_json(self, data, code=200, headers=None):
+        body = json.dumps(data)
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, str(value))
+        self.end_headers()
+        self.wfile.write(body)
+
+    ########################################################################
+    ## Parameters
+
+    def _int(self, name, default=None):
+        try:
+            return int(self.params[name])
+        except (KeyError, ValueError):
+            return default
+
+    def _user_id(self):
+        user_id = self._int('user_id') or self._int('id')
+        if user_id is None:
+            name = self.params.get('screen_name') or ''
+            user_id = name.startswith('user') and name[4:].isdigit() and int(name[4:]) or 1
+        return user_id
+
+    def _author(self, id):
+        return id % self.server.users + 1
+
+    ########################################################################
+    ## REST
+
+    def _timeline(self, *args):
+        server = self.server
+        count = min(self._int('count') or self._int('per_page') or 20, 200)
+        top = min(self._int('max_id') or server.statuses, server.statuses)
+        bottom = (self._int('since_id') or 0) + 1
+        top -= ((self._int('page') or 1) - 1) * count
+        ids = xrange(top, max(bottom, top - count + 1) - 1, -1)
+        return [make_status(id, self._author(id)) for id in ids]
+
+    def _status(self, action=None, id=None):
+        id = id and int(id) or self.server.statuses + 1
+        text = self.params.get('status')
+        return make_status(id, self._author(id), text)
+
+    def _user(self, *args):
+        return make_user(self._user_id())
+
+    def _profile_image(self, kind):
+        # the image is not decoded, its size is part of the new url
+        content_type = self.headers.get('Content-Type', '')
+        boundary = content_type.partition('boundary=')[2]
+        if not boundary or not self.body.endswith('--%s--\r\n'%(boundary)):
+            return {'error': 'Malformed multipart body'}
+        user = make_user(self._user_id())
+        user['profile_%s_url'%(kind)] = 'http://a1.twimg.com/profile_%ss/%d/upload.png'%(kind, len(self.body))
+        return user
+
+    def _users(self, *args):
+        count = min(self._int('per_page') or self._int('count') or 20, USERS_PAGE)
+        page = self._int('page') or 1
+        first = (page - 1) * count + 1
+        return [make_user(id) for id in range(first, min(first + count, self.server.users + 1))]
+
+    def _lookup(self):
+        if 'user_id' in self.params:
+            ids = [int(id) for id in self.params['user_id'].split(',') if id]
+        else:
+            names = self.params.get('screen_name', '').split(',')
+            ids = [int(name[4:]) for name in names if name[4:].isdigit()]
+        # unknown users are not returned, like twitter
+        return [make_user(id) for id in ids[:100] if 0 < id <= self.server.users]
+
+    def _cursor_page(self, size):
+        """-> (offset, next_cursor, previous_cursor) of the cursor parameter"""
+        cursor = self._int('cursor', -1)
+        offset = cursor > 0 and cursor - 1 or 0
+        total = self.server.followers
+        next_cursor = offset + size < total and offset + size + 1 or 0
+        previous_cursor = offset and -(offset + 1) or 0
+        return offset, next_cursor, previous_cursor
+
+    def _ids(self, *args):
+        total = self.server.followers
+        users = self.server.users
+        if 'cursor' not in self.params:
+            return [id % users + 1 for id in xrange(total)]
+        offset, next_cursor, previous_cursor = self._cursor_page(IDS_PAGE)
+        ids = [id % users + 1 for id in xrange(offset, min(offset + IDS_PAGE, total))]
+        return {'ids': ids, 'next_cursor': next_cursor,
+                'previous_cursor': previous_cursor}
+
+    def _cursored_users(self, *args):
+        offset, next_cursor, previous_cursor = self._cursor_page(USERS_PAGE)
+        users = [make_user(self._author(id))
+                 for id in xrange(offset, min(offset + USERS_PAGE, self.server.followers))]
+        if 'cursor' not in self.params:
+            return users
+        return {'users': users, 'next_cursor': next_cursor,
+                'previous_cursor': previous_cursor}
+
+    def _exists(self):
+        return True
+
+    def _relationship(self):
+        source = self._int('source_id', 1)
+        target = self._int('target_id', 2)
+        return {'relationship': {
+            'source': {'id': source, 'screen_name': 'user%d'%source,
+                       'following': True, 'followed_by': True,
+                       'notifications_enabled': False, 'blocking': False},
+            'target': {'id': target, 'screen_name': 'user%d'%target,
+                       'following': True, 'followed_by': True}}}
+
+    def _suggestions(self):
+        return [{'name': name, 'slug': name} for name in ('twitter', 'music', 'sports')]
+
+    def _suggestion(self, slug):
+        return {'name': slug, 'slug': slug, 'users': self._users()}
+
+    def _rate_limit_status(self):
+        server = self.server
+        if server.rate_limit is None:
+            return {'remaining_hits': 20000, 'hourly_limit': 20000,
+                    'reset_time_in_seconds': int(time.time() + 3600)}
+        token = self.params.get('oauth_token') or self.client_address[0]
+        remaining, reset = server._status(token)
+        return {'remaining_hits': remaining, 'hourly_limit': server.rate_limit,
+                'reset_time_in_seconds': reset,
+                'reset_time': time.strftime('%a %b %d %H:%M:%S +0000 %Y', time.gmtime(reset))}
+
+    def _trend_list(self):
+        return [{'name': name, 'query': name, 'url': 'http://search.twitter.com/search?q=%s'%name}
+                for name in TREND_NAMES]
+
+    def _trends(self):
+        return {'trends': self._trend_list(), 'as_of': CREATED_AT}
+
+    def _trends_dated(self, period):
+        stamp = time.strftime('%Y-%m-%d %H:%M', time.gmtime())
+        return {'trends': {stamp: self._trend_list()}, 'as_of': int(time.time())}
+
+    def _trends_available(self):
+        return [{'woeid': 1, 'name': 'Worldwide', 'placeType': {'code': 19, 'name': 'Supername'}},
+                {'woeid': 116545, 'name': 'Mexico City', 'placeType': {'code': 7, 'name': 'Town'}}]
+
+    def _trends_location(self, woeid):
+        return [{'trends': self._trend_list(), 'as_of': CREATED_AT,
+                 'locations': [{'woeid': int(woeid), 'name': 'Location %s'%woeid}]}]
+
+    def _search(self):
+        server = self.server
+        query = self.params.get('q', '')
+        rpp = min(self._int('rpp') or 15, 100)
+        page = self._int('page') or 1
+        top = min(self._int('max_id') or server.search_results, server.search_results)
+        bottom = (self._int('since_id') or 0) + 1
+        first = top - (page - 1) * rpp
+        results = []
+        if (page - 1) * rpp < 1500:
+            ids = xrange(first, max(bottom, first - rpp + 1) - 1, -1)
+            results = [make_search_result(id, self._author(id), query) for id in ids]
+        data = {'results': results, 'max_id': top, 'since_id': bottom - 1,
+                'page': page, 'results_per_page': rpp, 'query': query,
+                'completed_in': 0.01,
+                'refresh_url': '?since_id=%d&q=%s'%(top, query)}
+        if results and results[-1]['id'] > bottom and page * rpp < 1500:
+            data['next_page'] = '?page=%d&max_id=%d&rpp=%d&q=%s'%(page + 1, top, rpp, query)
+        return data
+
+    def _ok(self):
+        return 'ok'
+
+    def _saved_searches(self):
+        return [make_saved_search(id, query)
+                for id, query in enumerate(SAVED_SEARCHES, 1)]
+
+    def _saved_search(self, action='create', id=None):
+        if id is None:
+            return make_saved_search(len(SAVED_SEARCHES) + 1, self.params.get('query', ''))
+        id = int(id)
+        return make_saved_search(id, SAVED_SEARCHES[(id - 1) % len(SAVED_SEARCHES)])
+
+    def _lists(self, user, kind=None):
+        user_id = self._user_id_of(user)
+        if self.command == 'POST':
+            return make_list(1, user_id, self.params.get('name'))
+        return {'lists': [make_list(id, user_id) for id in range(1, 6)],
+                'next_cursor': 0, 'previous_cursor': 0}
+
+    def _list(self, user, list_id, kind=None):
+        list_id = list_id.isdigit() and int(list_id) or 1
+        return make_list(list_id, self._user_id_of(user))
+
+    def _members(self, user, list_id, kind):
+        if self.command == 'POST' or self.params.get('_method') == 'DELETE':
+            return self._list(user, list_id)
+        return self._cursored_users()
+
+    def _user_id_of(self, user):
+        if user.isdigit():
+            return int(user)
+        return user.startswith('user') and user[4:].isdigit() and int(user[4:]) or 1
+
+    ########################################################################
+    ## Streaming
+
+    def _stream(self, name):
+        server = self.server
+        track = self.params.get('track', '').split(',')[0]
+        delimited = self.params.get('delimited') == 'length'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = 1
+        interval = server.stream_rate and 1.0 / server.stream_rate
+        id = sent = 0
+        started = time.time()
+        try:
+            while server.stream_limit is None or sent < server.stream_limit:
+                id += 1
+                text = track and 'status %d about %s'%(id, track) or None
+                frame = json.dumps(make_status(id, self._author(id), text))
+                if delimited:
+                    self.wfile.write('%d\r\n%s'%(len(frame), frame))
+                else:
+                    self.wfile.write(frame + '\r\n')
+                sent += 1
+                if interval:
+                    delay = started + sent * interval - time.time()
+                    if delay > 0:
+                        self.wfile.flush()
+                        time.sleep(delay)
+            self.wfile.flush()
+        except Exception:
+            # the client disconnected
+            pass
+
+############################################################################
+## Main
+############################################################################
+
+def main(argv=None):
+    parser = OptionParser(usage="%prog [options]")
+    parser.add_option('--host', default='127.0.0.1')
+    parser.add_option('--port', type='int', default=8000)
+    parser.add_option('--latency', type='float', default=0)
+    parser.add_option('--rate-limit', dest='rate_limit', type='int', default=350)
+    parser.add_option('--error-rate', dest='error_rate', type='float', default=0.0)
+    parser.add_option('--users', type='int', default=10000)
+    parser.add_option('--statuses', type='int', default=3200)
+    parser.add_option('--stream-rate', dest='stream_rate', type='float', default=None)
+    parser.add_option('--verbose', action='store_true', default=False)
+    options, args = parser.parse_args(argv)
+    server = FakeTwitterServer(options.host, options.port, options.latency,
+                               options.rate_limit, error_rate=options.error_rate,
+                               users=options.users, statuses=options.statuses,
+                               stream_rate=options.stream_rate,
+                               verbose=options.verbose)
+    print "Fake twitter listening on %s"%server.url
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
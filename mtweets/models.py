@@ -0,0 +1,183 @@
+"""mtweets - Easy Twitter utilities in Python
+
+Compact model objects for the API responses.
+
+The models use __slots__ instead of a dict per object, repeated strings
+(screen names, lang, source, ...) are shared through an intern table and
+the statuses of a response share a single User object per author. Fields
+that are not declared by a model are kept in its `extra` dict.
+
+    >>> api = mtweets.API((key, secret), models=True)
+    >>> status = api.home_timeline_get()[0]
+    >>> status.user.screen_name
+    >>> api.home_timeline_get(models=False)   # raw dicts for this call
+
+Models support read access like dicts too (status['id'], status.get('text'))
+so helpers written for raw responses keep working.
+"""
+
+class Model(object):
+    """Base of the models, subclasses declare their fields in __slots__."""
+
+    __slots__ = ('extra',)
+
+    # fields whose values are interned
+    interned = ()
+
+    def __init__(self, **kwargs):
+        self.extra = None
+        for name in self.__slots__:
+            setattr(self, name, kwargs.pop(name, None))
+        if kwargs:
+            self.extra = kwargs
+
+    def __getitem__(self, key):
+        if key in self.__slots__ and key != 'extra':
+            return getattr(self, key)
+        if self.extra is not None and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def to_dict(self):
+        """to_dict() -> dict with the fields, nested models are converted"""
+        data = {}
+        for name in self.__slots__:
+            if name != 'extra':
+                data[name] = _to_raw(getattr(self, name))
+        if self.extra:
+            for key, value in self.extra.iteritems():
+                data[key] = _to_raw(value)
+        return data
+
+    def __repr__(self):
+        return '<%s %s>'%(self.__class__.__name__, getattr(self, 'id', None) or getattr(self, 'name', ''))
+
+def _to_raw(value):
+    if isinstance(value, Model):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [_to_raw(item) for item in value]
+    if isinstance(value, dict):
+        return dict([(key, _to_raw(item)) for key, item in value.iteritems()])
+    return value
+
+class User(Model):
+    __slots__ = ('id', 'screen_name', 'name', 'location', 'description', 'url',
+                 'protected', 'verified', 'followers_count', 'friends_count',
+                 'statuses_count', 'favourites_count', 'listed_count',
+                 'created_at', 'utc_offset', 'time_zone', 'lang', 'geo_enabled',
+                 'profile_image_url', 'following', 'notifications', 'status')
+    interned = ('screen_name', 'location', 'time_zone', 'lang')
+
+class Status(Model):
+    __slots__ = ('id', 'text', 'created_at', 'source', 'truncated', 'user',
+                 'in_reply_to_status_id', 'in_reply_to_user_id',
+                 'in_reply_to_screen_name', 'favorited', 'retweeted',
+                 'retweet_count', 'retweeted_status', 'geo', 'coordinates',
+                 'place', 'contributors', 'entities')
+    interned = ('source', 'in_reply_to_screen_name')
+
+class DirectMessage(Model):
+    __slots__ = ('id', 'text', 'created_at', 'sender_id', 'sender_screen_name',
+                 'sender', 'recipient_id', 'recipient_screen_name', 'recipient')
+    interned = ('sender_screen_name', 'recipient_screen_name')
+
+class List(Model):
+    __slots__ = ('id', 'name', 'full_name', 'slug', 'description', 'mode',
+                 'uri', 'member_count', 'subscriber_count', 'following', 'user')
+    interned = ('mode',)
+
+class Place(Model):
+    __slots__ = ('id', 'name', 'full_name', 'place_type', 'country',
+                 'country_code', 'url', 'bounding_box', 'attributes')
+    interned = ('place_type', 'country', 'country_code')
+
+class Trend(Model):
+    __slots__ = ('name', 'query', 'url', 'events', 'promoted_content')
+
+def _model_class(data):
+    """Recognizes the model of a decoded object by its keys."""
+    if 'text' in data:
+        if 'sender_id' in data:
+            return DirectMessage
+        if 'user' in data and 'id' in data:
+            return Status
+    elif 'screen_name' in data and 'followers_count' in data:
+        return User
+    elif 'slug' in data and 'member_count' in data:
+        return List
+    elif 'place_type' in data:
+        return Place
+    elif 'query' in data and 'name' in data and 'created_at' not in data:
+        # saved searches have name and query too
+        return Trend
+    return None
+
+# strings kept by the intern table of a parser
+MAX_INTERNED = 50000
+
+class ModelParser(object):
+    """Converts decoded responses to models.
+
+    The intern table lives as long as the parser, one parser is kept by each
+    API instance. It is emptied when it reaches max_strings, so a parser fed
+    by a long running stream does not keep every screen name seen.
+    """
+
+    def __init__(self, max_strings=MAX_INTERNED):
+        self.max_strings = max_strings
+        self._strings = {}
+
+    def intern(self, value):
+        if isinstance(value, basestring):
+            strings = self._strings
+            if len(strings) >= self.max_strings:
+                strings.clear()
+            return strings.setdefault(value, value)
+        return value
+
+    def parse(self, data):
+        """parse(data) -> models
+
+        Converts the statuses, users, direct messages, lists, places and
+        trends found in data, other values are left untouched.
+        """
+        return self._parse(data, {})
+
+    def _parse(self, data, users):
+        if isinstance(data, list):
+            return [self._parse(item, users) for item in data]
+        if not isinstance(data, dict):
+            return data
+        klass = _model_class(data)
+        if klass is User and data['id'] in users:
+            return users[data['id']]
+
+        fields = {}
+        for key, value in data.iteritems():
+            if isinstance(value, (list, dict)):
+                value = self._parse(value, users)
+            fields[key] = value
+        if klass is None:
+            return fields
+        fields = dict([(str(key), value) for key, value in fields.iteritems()])
+        for name in klass.interned:
+            if name in fields:
+                fields[name] = self.intern(fields[name])
+        model = klass(**fields)
+        if klass is User:
+            users[model.id] = model
+        return model
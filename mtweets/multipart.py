@@ -0,0 +1,127 @@
+"""mtweets - Easy Twitter utilities in Python
+
+Streaming multipart/form-data bodies.
+
+MultipartBody describes the body of an upload without loading the files:
+the part headers are built once, the files are read in chunks while the
+body is sent, and the Content-Length is known before sending because the
+file sizes are taken from the file system. httplib sends any object with a
+read() method in blocks, so the body goes to the socket without building
+the whole request in memory.
+
+    >>> body = MultipartBody([('tile', 'true')], [('image', 'avatar.png')])
+    >>> request = urllib2.Request(url, body, {'Content-Type': body.content_type,
+    ...                                       'Content-Length': str(len(body))})
+"""
+
+import os
+import mimetypes
+import mimetools
+
+CRLF = '\r\n'
+
+# bytes read from the files at a time
+CHUNK_SIZE = 64 * 1024
+
+def get_content_type(filename):
+    """get_content_type(filename) -> mime type guessed from the extension"""
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+def _utf8(value):
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return str(value)
+
+class MultipartBody(object):
+    """File-like multipart/form-data body.
+
+    Parameters:
+        fields - List of (name, value) form fields.
+
+        files - List of (name, path) file fields, or (name, path, filename)
+                to send another file name. The files are opened when they
+                are sent.
+
+        boundary - Defaults to a new random boundary.
+
+        chunk_size - Bytes read from the files at a time.
+    """
+
+    def __init__(self, fields=(), files=(), boundary=None, chunk_size=CHUNK_SIZE):
+        self.boundary = boundary or mimetools.choose_boundary()
+        self.content_type = 'multipart/form-data; boundary=%s'%(self.boundary)
+        self.chunk_size = chunk_size
+
+        # parts are strings or (path, size) of the files
+        parts = []
+        head = []
+        for name, value in fields:
+            head.append('--%s%sContent-Disposition: form-data; name="%s"%s%s%s%s'%(
+                self.boundary, CRLF, _utf8(name), CRLF, CRLF, _utf8(value), CRLF))
+        for item in files:
+            name, path = item[0], item[1]
+            filename = len(item) > 2 and item[2] or os.path.basename(path)
+            head.append('--%s%sContent-Disposition: form-data; name="%s"; filename="%s"%sContent-Type: %s%s%s'%(
+                self.boundary, CRLF, _utf8(name), _utf8(filename), CRLF,
+                get_content_type(filename), CRLF, CRLF))
+            parts.append(''.join(head))
+            parts.append((path, os.path.getsize(path)))
+            head = [CRLF]
+        head.append('--%s--%s'%(self.boundary, CRLF))
+        parts.append(''.join(head))
+        self.parts = parts
+        self.length = sum([isinstance(part, str) and len(part) or part[1]
+                           for part in parts])
+        self._chunks = None
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        """Yields the body in chunks, opening each file when it is reached."""
+        for part in self.parts:
+            if isinstance(part, str):
+                yield part
+                continue
+            path, size = part
+            fp = open(path, 'rb')
+            try:
+                while size > 0:
+                    chunk = fp.read(min(self.chunk_size, size))
+                    if not chunk:
+                        raise IOError("MultipartBody: %s is shorter than when it was sized"%(path))
+                    size -= len(chunk)
+                    yield chunk
+            finally:
+                fp.close()
+
+    def seek(self, offset):
+        """seek(0) restarts the body, to send it again."""
+        if offset != 0:
+            raise IOError("MultipartBody can only seek to the start")
+        if self._chunks is not None:
+            self._chunks.close()
+        self._chunks = None
+
+    def read(self, size=-1):
+        """read(size=-1) -> next bytes of the body, '' at the end"""
+        if self._chunks is None:
+            self._chunks = iter(self)
+            self._buffer = ''
+            self._offset = 0
+        pieces = []
+        while size != 0:
+            if self._offset >= len(self._buffer):
+                try:
+                    self._buffer = self._chunks.next()
+                except StopIteration:
+                    break
+                self._offset = 0
+            if size < 0:
+                piece = self._buffer[self._offset:]
+            else:
+                piece = self._buffer[self._offset:self._offset + size]
+                size -= len(piece)
+            self._offset += len(piece)
+            pieces.append(piece)
+        return ''.join(pieces)
@@ -0,0 +1,223 @@
+"""mtweets - Easy Twitter utilities in Python
+
+Helpers to walk paginated resources.
+
+The next page is requested in a background thread while the current one is
+consumed, so network time overlaps with the caller's processing.
+"""
+
+from array import array
+
+from mtweets.concurrency import spawn
+
+############################################################################
+## Compact ids
+############################################################################
+
+# array('q') is not available on every python, 'l' is 64 bits on LP64
+# platforms which is enough for twitter ids.
+try:
+    array('q')
+    ID_TYPECODE = 'q'
+except ValueError:
+    ID_TYPECODE = 'l'
+
+def compact_ids(ids):
+    """compact_ids(ids) -> array of 64 bits integers"""
+    return array(ID_TYPECODE, ids)
+
+############################################################################
+## Cursor pagination
+############################################################################
+
+def iter_cursor(method, key, cursor=-1, prefetch=True, **kwargs):
+    """iter_cursor(method, key, cursor=-1, prefetch=True, **kwargs)
+
+    Follows the cursor/next_cursor protocol of method yielding page[key] for
+    each page until next_cursor is 0.
+
+    Parameters:
+        method - API method that accepts a cursor argument, like
+                 API.followers_ids_get.
+
+        key - Key of the page holding the items, like "ids" or "users".
+
+        cursor - First cursor to request, -1 starts from the beginning.
+
+        prefetch - Request the next page while the current one is consumed.
+
+        kwargs - Extra parameters passed to method in every request.
+    """
+    def fetch(cursor):
+        return method(cursor=cursor, **kwargs)
+
+    page = fetch(cursor)
+    while True:
+        next_cursor = page.get('next_cursor', 0)
+        pending = None
+        if next_cursor and prefetch:
+            pending = spawn(fetch, next_cursor)
+        yield page[key]
+        if not next_cursor:
+            break
+        if pending is not None:
+            page = pending.result()
+        else:
+            page = fetch(next_cursor)
+
+############################################################################
+## Timeline pagination
+############################################################################
+
+# Number of statuses twitter keeps reachable through paging for each timeline
+TIMELINE_LIMITS = {
+    'home_timeline_get': 800,
+    'friends_timeline_get': 800,
+    'user_timeline_get': 3200,
+    'mentions_get': 800,
+    'retweeted_of_me_get': 800,
+    'retweeted_by_me_get': 800,
+    'retweeted_to_me_get': 800,
+    'direct_messages_get': 800,
+    'direct_messages_sent_get': 800,
+    'favorites_get': 800,
+}
+
+DEFAULT_TIMELINE_LIMIT = 800
+
+def iter_timeline(method, since_id=None, max_id=None, count=200, limit=None,
+                  prefetch=True, **kwargs):
+    """iter_timeline(method, since_id=None, max_id=None, count=200, limit=None, prefetch=True, **kwargs)
+
+    Walks a timeline backward with max_id yielding statuses from the newest
+    to the oldest one.
+
+    Parameters:
+        method - API timeline method, like API.home_timeline_get.
+
+        since_id - Stop when reaching this status id, used to catch up from a
+                   saved point. The status itself is not returned.
+
+        max_id - Start from this status id (included).
+
+        count - Statuses requested per page.
+
+        limit - Maximum number of statuses to yield, defaults to the number of
+                statuses reachable in the timeline (800 or 3200).
+
+        prefetch - Request the next page in a background thread while the
+                   current one is consumed.
+
+        kwargs - Extra parameters passed to method in every request.
+    """
+    if limit is None:
+        limit = TIMELINE_LIMITS.get(method.__name__, DEFAULT_TIMELINE_LIMIT)
+    if since_id is not None:
+        kwargs['since_id'] = since_id
+
+    def fetch(max_id):
+        if max_id is None:
+            return method(count=count, **kwargs)
+        return method(count=count, max_id=max_id, **kwargs)
+
+    page = fetch(max_id)
+    yielded = 0
+    while page:
+        # max_id is inclusive, ignore the boundary status if it comes again
+        if max_id is not None:
+            page = [status for status in page if status['id'] <= max_id]
+        if since_id is not None:
+            page = [status for status in page if status['id'] > since_id]
+        if not page:
+            break
+
+        max_id = min([status['id'] for status in page]) - 1
+        pending = None
+        if prefetch and yielded + len(page) < limit:
+            pending = spawn(fetch, max_id)
+
+        for status in page:
+            if yielded >= limit:
+                return
+            yielded += 1
+            yield status
+
+        if pending is None:
+            if yielded >= limit:
+                return
+            page = fetch(max_id)
+        else:
+            page = pending.result()
+
+############################################################################
+## Search pagination
+############################################################################
+
+# Number of results reachable through paging for a search query
+SEARCH_LIMIT = 1500
+
+def iter_search(method, q, rpp=100, limit=SEARCH_LIMIT, since_id=None,
+                prefetch=True, **kwargs):
+    """iter_search(method, q, rpp=100, limit=1500, since_id=None, prefetch=True, **kwargs)
+
+    Pages a search query with rpp and page yielding the results from the
+    newest to the oldest. Every page after the first one is requested with
+    the max_id of the first page, so new tweets do not shift the pages.
+
+    Parameters:
+        method - API.search.
+
+        q - Search query.
+
+        rpp - Results requested per page, up to 100.
+
+        limit - Maximum number of results to yield, search does not reach
+                more than 1500.
+
+        since_id - Only the results newer than this id.
+
+        prefetch - Request the next page in a background thread while the
+                   current one is consumed.
+
+        kwargs - Extra parameters passed to method in every request.
+    """
+    limit = min(limit, SEARCH_LIMIT)
+    if since_id is not None:
+        kwargs['since_id'] = since_id
+
+    def fetch(page, max_id):
+        if max_id is None:
+            return method(q, rpp=rpp, page=page, models=False, **kwargs)
+        return method(q, rpp=rpp, page=page, max_id=max_id, models=False,
+                      **kwargs)
+
+    data = fetch(1, None)
+    max_id = data.get('max_id')
+    page = 1
+    yielded = 0
+    while True:
+        results = data.get('results') or []
+        if since_id is not None:
+            results = [result for result in results if result['id'] > since_id]
+        if not results:
+            return
+
+        more = ('next_page' in data and page * rpp < SEARCH_LIMIT and
+                yielded + len(results) < limit)
+        pending = None
+        if more and prefetch:
+            pending = spawn(fetch, page + 1, max_id)
+
+        for result in results:
+            if yielded >= limit:
+                return
+            yielded += 1
+            yield result
+
+        if not more:
+            return
+        page += 1
+        if pending is None:
+            data = fetch(page, max_id)
+        else:
+            data = pending.result()
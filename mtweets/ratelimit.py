@@ -0,0 +1,175 @@
+"""mtweets - Easy Twitter utilities in Python
+
+Client side rate limit scheduler.
+
+Twitter counts the requests of every token in fixed windows (one hour for
+the REST API) and reports the budget in the X-RateLimit-* response headers.
+RateLimiter keeps a token bucket per endpoint family that is refreshed with
+those headers, so requests are delayed before the budget is exhausted
+instead of failing with 400/420 errors.
+
+    >>> api = mtweets.API((key, secret), rate_limiter=RateLimiter(pace=True))
+    >>> api.rate_limit_sync()
+    >>> api.rate_limiter.budget()
+    {'rest': {'limit': 350, 'remaining': 349, 'reset': 1277485629}}
+"""
+
+import time
+
+from threading import Lock
+
+from mtweets.endpoints import ENDPOINTS
+from mtweets.endpoints import REST
+
+DEFAULT_FAMILY = REST
+
+def rate_limit_family(method_name):
+    """rate_limit_family(method_name) -> family name or None
+
+    The family comes from the endpoint registry, None means the method does
+    not consume rate limit. Unknown methods are counted in 'rest'.
+    """
+    endpoint = ENDPOINTS.get(method_name)
+    if endpoint is None:
+        return DEFAULT_FAMILY
+    return endpoint.family
+
+class _Bucket(object):
+
+    def __init__(self, limit, remaining, reset):
+        self.limit = limit
+        self.remaining = remaining
+        self.reset = reset
+        self.next_slot = 0.0
+
+class RateLimiter(object):
+    """Token bucket per endpoint family.
+
+    Parameters:
+        pace - Spread the remaining requests evenly until the window reset
+               instead of spending the budget as fast as possible.
+
+        reserve - Number of requests per window that are never used, left
+                  for other clients of the same token.
+
+        max_wait - Maximum seconds that acquire() sleeps, it fails when the
+                   request would need to wait longer. None waits as needed,
+                   0 never waits.
+
+    Families without information are not limited until a response tells
+    their budget.
+    """
+
+    def __init__(self, pace=False, reserve=0, max_wait=None):
+        self.pace = pace
+        self.reserve = reserve
+        self.max_wait = max_wait
+        self._buckets = {}
+        self._lock = Lock()
+
+    def acquire(self, family):
+        """acquire(family) -> bool
+
+        Takes one request from the family budget, sleeping until the window
+        reset (or the next paced slot) if needed. Returns False when the
+        budget is not available within max_wait seconds.
+        """
+        if family is None:
+            return True
+        while True:
+            self._lock.acquire()
+            try:
+                bucket = self._buckets.get(family)
+                if bucket is None:
+                    return True
+                now = time.time()
+                if bucket.reset is not None and bucket.reset <= now:
+                    # new window, the headers of the next response tell the
+                    # real values
+                    bucket.remaining = bucket.limit
+                    bucket.reset = None
+                if bucket.remaining > self.reserve:
+                    wait = 0
+                    if self.pace and bucket.reset is not None:
+                        interval = (bucket.reset - now) / bucket.remaining
+                        slot = max(now, bucket.next_slot)
+                        wait = slot - now
+                        if self.max_wait is not None and wait > self.max_wait:
+                            # refused, the slot stays free for the next call
+                            return False
+                        bucket.next_slot = slot + interval
+                    bucket.remaining -= 1
+                    acquired = True
+                elif bucket.reset is None:
+                    # exhausted without a known reset, let twitter decide
+                    return True
+                else:
+                    wait = bucket.reset - now
+                    if self.max_wait is not None and wait > self.max_wait:
+                        return False
+                    acquired = False
+            finally:
+                self._lock.release()
+
+            if wait > 0:
+                time.sleep(wait)
+            if acquired:
+                return True
+
+    def update(self, family, headers):
+        """update(family, headers)
+
+        Refreshes the family budget with the X-RateLimit-* headers of a
+        response, headers should be the object returned by response.info().
+        """
+        if family is None or headers is None:
+            return
+        try:
+            limit = int(headers.get('X-RateLimit-Limit'))
+            remaining = int(headers.get('X-RateLimit-Remaining'))
+            reset = int(headers.get('X-RateLimit-Reset'))
+        except (TypeError, ValueError):
+            return
+        self.set_budget(family, limit, remaining, reset)
+
+    def seed(self, family, status):
+        """seed(family, status)
+
+        Sets the family budget from the dict returned by
+        API.rate_limit_status.
+        """
+        self.set_budget(family, int(status['hourly_limit']),
+                        int(status['remaining_hits']),
+                        int(status['reset_time_in_seconds']))
+
+    def set_budget(self, family, limit, remaining, reset):
+        self._lock.acquire()
+        try:
+            bucket = self._buckets.get(family)
+            if bucket is None:
+                self._buckets[family] = _Bucket(limit, remaining, reset)
+            else:
+                bucket.limit = limit
+                bucket.remaining = remaining
+                bucket.reset = reset
+        finally:
+            self._lock.release()
+
+    def budget(self, family=None):
+        """budget(family=None) -> dict
+
+        Returns {'limit', 'remaining', 'reset'} for the family, or a dict
+        with every known family when family is None.
+        """
+        self._lock.acquire()
+        try:
+            result = {}
+            for name, bucket in self._buckets.items():
+                result[name] = {'limit': bucket.limit,
+                                'remaining': bucket.remaining,
+                                'reset': bucket.reset}
+        finally:
+            self._lock.release()
+        if family is not None:
+            return result.get(family)
+        return result
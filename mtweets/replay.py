@@ -0,0 +1,258 @@
+"""mtweets - Easy Twitter utilities in Python
+
+Record and replay of stream traffic.
+
+StreamRecorder tees the raw frames read by a Stream to rotating compressed
+files, each frame with the time it was received. ReplayStream plays those
+files through the same callback and iterator methods of Stream, at the
+original speed, N times faster or as fast as possible, without credentials
+or network.
+
+    >>> stream = mtweets.Stream((key, secret))
+    >>> with StreamRecorder('/var/data/sample') as stream.recorder:
+    ...     for status in stream.iter_sample():
+    ...         handle(status)
+
+    >>> replay = ReplayStream('/var/data/sample', speed=None)
+    >>> for status in replay.iter_sample():
+    ...     handle(status)
+
+Record format: a header line "<timestamp> <length>" followed by exactly
+length bytes of the raw frame. The files of a recorder that was killed end
+with a partial record, the replay stops at the last complete one.
+"""
+
+import os
+import bz2
+import gzip
+import time
+import struct
+
+from threading import Lock
+
+from mtweets.streaming import Stream
+from mtweets.streaming import _StreamReader
+
+_OPENERS = {
+    'gzip': (gzip.open, '.gz'),
+    'bz2': (bz2.BZ2File, '.bz2'),
+    None: (open, ''),
+}
+
+############################################################################
+## Recorder
+############################################################################
+
+class StreamRecorder(object):
+    """Writes the frames of a stream to rotating files in directory.
+
+    Parameters:
+        directory - Where the files are written, created if needed.
+
+        prefix - Prefix of the file names, followed by the time the file
+                 was opened so the names sort in recording order.
+
+        rotate_bytes - Start a new file after this many uncompressed bytes.
+
+        rotate_seconds - Start a new file after this many seconds.
+
+        compress - 'gzip', 'bz2' or None.
+
+        flush_seconds - Flush the file after this many seconds, so a crash
+                        loses at most that much of the recording. bz2 files
+                        can not be flushed before they are closed.
+    """
+
+    def __init__(self, directory, prefix='stream', rotate_bytes=64 * 1024 * 1024,
+                 rotate_seconds=3600, compress='gzip', flush_seconds=5):
+        if compress not in _OPENERS:
+            raise ValueError("StreamRecorder(): compress should be gzip, bz2 or None")
+        self.directory = directory
+        self.prefix = prefix
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.compress = compress
+        self.flush_seconds = flush_seconds
+        self.files = []
+        self.frames = 0
+
+        self._fp = None
+        self._opened = 0
+        self._flushed = 0
+        self._written = 0
+        self._lock = Lock()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _rotate(self, now):
+        if self._fp is not None:
+            self._fp.close()
+        opener, extension = _OPENERS[self.compress]
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.gmtime(now))
+        name = '%s-%s-%06d%s'%(self.prefix, stamp, int(now * 1000000) % 1000000, extension)
+        path = os.path.join(self.directory, name)
+        self._fp = opener(path, 'wb')
+        self._opened = self._flushed = now
+        self._written = 0
+        self.files.append(path)
+
+    def write(self, frame, timestamp=None):
+        """write(frame, timestamp=None)
+
+        Appends a raw frame, timestamp defaults to now.
+        """
+        now = timestamp or time.time()
+        self._lock.acquire()
+        try:
+            if (self._fp is None or self._written >= self.rotate_bytes or
+                now - self._opened >= self.rotate_seconds):
+                self._rotate(now)
+            self._fp.write('%.6f %d\n'%(now, len(frame)))
+            self._fp.write(frame)
+            self._written += len(frame)
+            self.frames += 1
+            if (self.flush_seconds is not None and
+                now - self._flushed >= self.flush_seconds):
+                self._flush(now)
+        finally:
+            self._lock.release()
+
+    def _flush(self, now):
+        flush = getattr(self._fp, 'flush', None)
+        if flush is not None:
+            flush()
+        self._flushed = now
+
+    def flush(self):
+        """Writes the buffered frames to the file."""
+        self._lock.acquire()
+        try:
+            if self._fp is not None:
+                self._flush(time.time())
+        finally:
+            self._lock.release()
+
+    def tee(self, frames):
+        """tee(frames) -> generator that records each frame it yields"""
+        for frame in frames:
+            self.write(frame)
+            yield frame
+
+    def close(self):
+        self._lock.acquire()
+        try:
+            if self._fp is not None:
+                self._fp.close()
+                self._fp = None
+        finally:
+            self._lock.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+############################################################################
+## Replay
+############################################################################
+
+def recording_files(path):
+    """recording_files(path) -> sorted list of recording files
+
+    path can be a single file or a directory written by StreamRecorder.
+    """
+    if not os.path.isdir(path):
+        return [path]
+    return [os.path.join(path, name) for name in sorted(os.listdir(path))]
+
+def _open_recording(path):
+    for compress, (opener, extension) in _OPENERS.items():
+        if extension and path.endswith(extension):
+            return opener(path, 'rb')
+    return open(path, 'rb')
+
+def _read_record(fp):
+    """-> (timestamp, frame), None at the end or at a partial record"""
+    try:
+        header = fp.readline()
+        if not header.endswith('\n'):
+            return None
+        timestamp, size = header.split()
+        timestamp, size = float(timestamp), int(size)
+        frame = fp.read(size)
+    except (IOError, EOFError, ValueError, struct.error):
+        # truncated compressed data, gzip fails with struct.error when the
+        # file ends in its trailer
+        return None
+    if len(frame) < size:
+        return None
+    return timestamp, frame
+
+def iter_records(paths):
+    """iter_records(paths) -> generator of (timestamp, frame)
+
+    Each file is read up to its last complete record.
+    """
+    for path in paths:
+        fp = _open_recording(path)
+        try:
+            while True:
+                record = _read_record(fp)
+                if record is None:
+                    break
+                yield record
+        finally:
+            fp.close()
+
+class _Replay(object):
+    """Recorded frames played as a stream that can be closed by another
+    thread, like a connection."""
+
+    def __init__(self, paths, speed=1.0):
+        self.paths = paths
+        self.speed = speed
+        self.closed = False
+
+    def __iter__(self):
+        started = first = None
+        for timestamp, frame in iter_records(self.paths):
+            if self.closed:
+                return
+            if self.speed:
+                if first is None:
+                    started, first = time.time(), timestamp
+                delay = started + (timestamp - first) / self.speed - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+            yield frame
+
+    def close(self):
+        self.closed = True
+
+class ReplayStream(Stream):
+    """Stream whose feeds play recorded files instead of connecting.
+
+    Every feed method (sample, filter, firehose, retweet and their iter_*
+    variants) plays the same recording, their twitter parameters are
+    ignored. Dispatchers, decoding and models work as for a live stream.
+
+    Parameters:
+        path - Recording file or directory written by StreamRecorder.
+
+        speed - 1.0 for the original speed, N for N times faster and None
+                for as fast as possible.
+
+        Any other parameter is passed to TwitterClient, like models.
+    """
+
+    def __init__(self, path, speed=1.0, **kwargs):
+        Stream.__init__(self, ('', ''), **kwargs)
+        self.paths = recording_files(path)
+        self.speed = speed
+
+    def is_authorized(self):
+        return True
+
+    def _open_reader(self, name, endpoint, reconnect, parameters):
+        return _StreamReader(_Replay(self.paths, self.speed), None, self.recorder)
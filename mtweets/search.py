@@ -0,0 +1,445 @@
+"""mtweets - Easy Twitter utilities in Python
+
+Incremental polling of search queries.
+
+SearchPoller keeps the since_id of every query, so each poll only requests
+the results newer than the previous one, and polls the queries
+concurrently over the keep-alive connections of the api.
+
+    >>> poller = SearchPoller(api, ['#python', 'mtweets'], concurrency=20)
+    >>> while True:
+    ...     for query, results in poller.poll().items():
+    ...         handle(query, results)
+    ...     time.sleep(60)
+
+state() returns the since_ids to save them and start from the same point
+later with SearchPoller(api, state=saved). With backlog=False the new
+queries start from their newest result instead of returning the recent
+ones in their first poll.
+
+SearchScheduler polls each query on its own interval, adapted to how often
+the query has new results, and sends the new results to handlers. It can
+follow the saved searches of the authenticated user.
+
+    >>> scheduler = SearchScheduler(api, [store_results], requests_per_hour=1000)
+    >>> scheduler.add_saved_searches()
+    >>> scheduler.add('#python')
+    >>> scheduler.start()
+"""
+
+import time
+
+from collections import deque
+from threading import Lock
+from threading import Event
+from threading import Thread
+
+from mtweets.concurrency import WorkerPool
+from mtweets.paging import iter_search
+from mtweets.paging import SEARCH_LIMIT
+
+# handler errors kept by a SearchScheduler
+MAX_HANDLER_ERRORS = 100
+
+class SearchPoller(object):
+    """Polls many search queries keeping the since_id of each one.
+
+    Parameters:
+        api - API instance used for the requests.
+
+        queries - Queries to poll, more can be added with add().
+
+        concurrency - Number of queries requested at the same time.
+
+        rpp - Results per page, up to 100.
+
+        limit - Maximum number of results of a query in a single poll,
+                search does not reach more than 1500. When more results
+                are new the oldest ones are skipped.
+
+        state - dict {query: since_id} saved from state().
+
+        backlog - The first poll of a query without since_id returns its
+                  recent results, up to limit. False makes that poll a
+                  single request of one result that only sets the since_id,
+                  so the query starts from now.
+    """
+
+    def __init__(self, api, queries=(), concurrency=10, rpp=100,
+                 limit=SEARCH_LIMIT, state=None, backlog=True):
+        self.api = api
+        self.concurrency = concurrency
+        self.rpp = rpp
+        self.limit = limit
+        self.backlog = backlog
+        self.since_ids = {}
+        self.params = {}
+        self.errors = {}
+        self.requests = {}
+        self.workers = WorkerPool(concurrency)
+        self._lock = Lock()
+
+        api.connection_pool.reserve(concurrency)
+
+        for query in queries:
+            self.add(query)
+        for query, since_id in (state or {}).items():
+            self.add(query, since_id)
+
+    def add(self, query, since_id=None, **params):
+        """add(query, since_id=None, **params)
+
+        Adds a query, params (lang, geocode, result_type...) are passed to
+        search in every poll of this query.
+        """
+        self._lock.acquire()
+        try:
+            if since_id is not None or query not in self.since_ids:
+                self.since_ids[query] = since_id
+            self.params[query] = params
+        finally:
+            self._lock.release()
+
+    def remove(self, query):
+        self._lock.acquire()
+        try:
+            self.since_ids.pop(query, None)
+            self.params.pop(query, None)
+            self.errors.pop(query, None)
+            self.requests.pop(query, None)
+        finally:
+            self._lock.release()
+
+    def state(self):
+        """state() -> dict {query: since_id}"""
+        self._lock.acquire()
+        try:
+            return dict(self.since_ids)
+        finally:
+            self._lock.release()
+
+    def poll_query(self, query):
+        """poll_query(query) -> list of new results, newest first
+
+        Polls a single query in the calling thread and advances its
+        since_id. A failed request is raised and the since_id is kept. The
+        number of requests sent is kept in self.requests[query].
+        """
+        self._lock.acquire()
+        try:
+            since_id = self.since_ids[query]
+            params = self.params[query]
+        finally:
+            self._lock.release()
+        requests = [0]
+        def search(*args, **kwargs):
+            requests[0] += 1
+            return self.api.search(*args, **kwargs)
+        if since_id is None and not self.backlog:
+            data = search(query, rpp=1, models=False, **params)
+            ids = [result['id'] for result in data.get('results') or []]
+            newest = max([data.get('max_id') or 0] + ids)
+            results = []
+        else:
+            results = list(iter_search(search, query, self.rpp, self.limit,
+                                       since_id, False, **params))
+            newest = max([result['id'] for result in results] or [None])
+        self._lock.acquire()
+        try:
+            if newest is not None and query in self.since_ids:
+                self.since_ids[query] = max(newest, since_id or 0)
+            if query in self.since_ids:
+                self.requests[query] = requests[0]
+            self.errors.pop(query, None)
+        finally:
+            self._lock.release()
+        return results
+
+    def poll(self, queries=None):
+        """poll(queries=None) -> dict {query: new results}
+
+        Polls every query, or the given ones, concurrently. The queries that
+        failed are not in the result, their exception is in self.errors.
+        """
+        if queries is None:
+            queries = self.state().keys()
+        futures = [(query, self.workers.submit(self.poll_query, query))
+                   for query in queries]
+        polled = {}
+        for query, future in futures:
+            error = future.exception()
+            if error is not None:
+                self._lock.acquire()
+                try:
+                    self.errors[query] = error
+                finally:
+                    self._lock.release()
+            else:
+                polled[query] = future.result()
+        return polled
+
+    def close(self):
+        """Stops the worker threads."""
+        self.workers.shutdown()
+
+############################################################################
+## Scheduler
+############################################################################
+
+class _Schedule(object):
+
+    __slots__ = ('interval', 'next_poll', 'last_poll', 'rate', 'requests',
+                 'saved_id')
+
+    def __init__(self, interval, next_poll, saved_id=None):
+        self.interval = interval
+        self.next_poll = next_poll
+        self.last_poll = None
+        self.rate = None
+        # average requests of a poll, a poll with many new results pages
+        self.requests = 1.0
+        self.saved_id = saved_id
+
+class SearchScheduler(object):
+    """Polls search queries with adaptive intervals.
+
+    After every poll the interval of a query is set so the next poll finds
+    about target_results new results: queries with many new results are
+    polled often and the ones without results less and less often. A poll
+    that reaches limit (and may have lost results) polls again after
+    min_interval, a failed poll doubles the interval.
+
+    Parameters:
+        api - API instance, every query shares its connection pool and rate
+              limiter.
+
+        handlers - Callables handler(query, results) called with the new
+                   results of a query, newest first, from the scheduler
+                   thread. The errors of a handler do not stop the
+                   scheduler nor the other handlers, the last ones are kept
+                   in handler_errors as (query, handler, exception).
+
+        concurrency - Number of queries requested at the same time.
+
+        min_interval, max_interval - Bounds of the interval of a query in
+                                     seconds.
+
+        interval - Interval of a new query until its rate is known.
+
+        target_results - New results expected in each poll.
+
+        requests_per_hour - Budget of search requests per hour shared by
+                            every query, counting every page of a poll.
+                            The intervals are stretched when the queries
+                            need more. None for no budget.
+
+        rpp, limit, backlog - see SearchPoller.
+
+        state - dict {query: since_id} saved from state().
+    """
+
+    def __init__(self, api, handlers=(), concurrency=10, min_interval=30,
+                 max_interval=1800, interval=60, target_results=20,
+                 requests_per_hour=None, rpp=100, limit=SEARCH_LIMIT,
+                 state=None, backlog=True):
+        self.api = api
+        self.handlers = list(handlers)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = interval
+        self.target_results = target_results
+        self.requests_per_hour = requests_per_hour
+        self.poller = SearchPoller(api, (), concurrency, rpp, limit,
+                                   backlog=backlog)
+        self.schedules = {}
+        self.handler_errors = deque(maxlen=MAX_HANDLER_ERRORS)
+        self._lock = Lock()
+        self._wakeup = Event()
+        self._stopped = Event()
+        self._thread = None
+        for query, since_id in (state or {}).items():
+            self.add(query, since_id)
+
+    def add_handler(self, handler):
+        self.handlers.append(handler)
+
+    def add(self, query, since_id=None, saved_id=None, **params):
+        """add(query, since_id=None, saved_id=None, **params)
+
+        Adds a query polled from now on, see SearchPoller.add. saved_id is
+        the id of the saved search of the query.
+        """
+        self.poller.add(query, since_id, **params)
+        self._lock.acquire()
+        try:
+            schedule = self.schedules.get(query)
+            if schedule is None:
+                self.schedules[query] = _Schedule(self.interval, time.time(), saved_id)
+            elif saved_id is not None:
+                schedule.saved_id = saved_id
+        finally:
+            self._lock.release()
+        self._wakeup.set()
+
+    def remove(self, query):
+        self._lock.acquire()
+        try:
+            self.schedules.pop(query, None)
+        finally:
+            self._lock.release()
+        self.poller.remove(query)
+
+    def add_saved_searches(self, version=None):
+        """add_saved_searches() -> list of queries
+
+        Polls the saved searches of the authenticated user. The queries of
+        saved searches deleted since the previous call are removed, call it
+        from time to time to follow the changes.
+        """
+        saved = dict((search['id'], search['query'])
+                     for search in self.api.saved_searches_get(version, models=False))
+        self._lock.acquire()
+        try:
+            deleted = [query for query, schedule in self.schedules.items()
+                       if schedule.saved_id is not None and schedule.saved_id not in saved]
+        finally:
+            self._lock.release()
+        for query in deleted:
+            self.remove(query)
+        for saved_id, query in saved.items():
+            self.add(query, saved_id=saved_id)
+        return saved.values()
+
+    def state(self):
+        """state() -> dict {query: since_id}"""
+        return self.poller.state()
+
+    def intervals(self):
+        """intervals() -> dict {query: seconds between polls}"""
+        factor = self._budget_factor()
+        self._lock.acquire()
+        try:
+            return dict((query, schedule.interval * factor)
+                        for query, schedule in self.schedules.items())
+        finally:
+            self._lock.release()
+
+    ############################################################################
+    ## Scheduling
+    ############################################################################
+
+    def _budget_factor(self):
+        if not self.requests_per_hour:
+            return 1.0
+        self._lock.acquire()
+        try:
+            demand = sum([schedule.requests * 3600.0 / schedule.interval
+                          for schedule in self.schedules.values()])
+        finally:
+            self._lock.release()
+        return max(1.0, demand / self.requests_per_hour)
+
+    def _adapt(self, schedule, results, requests, now):
+        if requests:
+            schedule.requests = (schedule.requests + requests) / 2.0
+        if results is None:
+            interval = schedule.interval * 2
+        elif len(results) >= self.poller.limit:
+            interval = self.min_interval
+        elif schedule.last_poll is None:
+            # the first poll returns the backlog, not the rate
+            interval = schedule.interval
+        else:
+            rate = len(results) / max(now - schedule.last_poll, 1e-3)
+            if schedule.rate is not None:
+                rate = (rate + schedule.rate) / 2
+            schedule.rate = rate
+            if rate > 0:
+                interval = self.target_results / rate
+            else:
+                interval = schedule.interval * 2
+        schedule.interval = min(max(interval, self.min_interval), self.max_interval)
+        if results is not None:
+            schedule.last_poll = now
+
+    def poll_due(self):
+        """poll_due() -> seconds until the next query is due
+
+        Polls the queries that are due, concurrently, and sends their new
+        results to the handlers.
+        """
+        now = time.time()
+        self._lock.acquire()
+        try:
+            due = [query for query, schedule in self.schedules.items()
+                   if schedule.next_poll <= now]
+        finally:
+            self._lock.release()
+
+        if due:
+            polled = self.poller.poll(due)
+            now = time.time()
+            self._lock.acquire()
+            try:
+                for query in due:
+                    schedule = self.schedules.get(query)
+                    if schedule is not None:
+                        requests = query in polled and self.poller.requests.get(query)
+                        self._adapt(schedule, polled.get(query), requests, now)
+            finally:
+                self._lock.release()
+            factor = self._budget_factor()
+            self._lock.acquire()
+            try:
+                for query in due:
+                    schedule = self.schedules.get(query)
+                    if schedule is not None:
+                        schedule.next_poll = now + schedule.interval * factor
+            finally:
+                self._lock.release()
+            for query in due:
+                results = polled.get(query)
+                if results:
+                    for handler in self.handlers:
+                        try:
+                            handler(query, results)
+                        except Exception, e:
+                            self.handler_errors.append((query, handler, e))
+
+        self._lock.acquire()
+        try:
+            if not self.schedules:
+                return None
+            return max(0, min([schedule.next_poll for schedule in
+                               self.schedules.values()]) - time.time())
+        finally:
+            self._lock.release()
+
+    def run(self):
+        """Polls until stop() is called, in the calling thread."""
+        while not self._stopped.isSet():
+            delay = self.poll_due()
+            if delay:
+                self._wakeup.wait(delay)
+            elif delay is None:
+                self._wakeup.wait()
+            self._wakeup.clear()
+
+    def start(self):
+        """Polls in a daemon thread."""
+        self._stopped.clear()
+        self._thread = Thread(target=self.run)
+        self._thread.setDaemon(True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        """Stops polling and the worker threads."""
+        self.stop()
+        self.poller.close()
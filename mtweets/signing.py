@@ -0,0 +1,116 @@
+"""mtweets - Easy Twitter utilities in Python
+
+Fast OAuth HMAC-SHA1 request signing.
+
+OAuthRequest builds a request object, normalizes and encodes every
+parameter and derives the HMAC key from the secrets each time a request is
+signed. RequestSigner does the same signature with the work that does not
+change between requests done once per (consumer, token): the HMAC object is
+prepared with the key and copied for each request, and the static oauth
+parameters are kept percent encoded.
+
+    >>> signer = RequestSigner(consumer, token)
+    >>> query = signer.sign('GET', 'http://api.twitter.com/1/statuses/home_timeline.json',
+    ...                     {'count': 200})
+
+The signatures are the same as the ones of the oauth library.
+"""
+
+import hmac
+import time
+import random
+import urllib
+import binascii
+
+from urlparse import urlparse
+
+try:
+    from hashlib import sha1
+except ImportError:
+    from sha import new as sha1
+
+SIGNATURE_METHOD = 'HMAC-SHA1'
+
+# normalized urls kept by normalize_url, cleared when full
+MAX_NORMALIZED_URLS = 1024
+
+def escape(value):
+    """escape(value) -> percent encoded utf-8 string, as OAuth requires"""
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    else:
+        value = str(value)
+    return urllib.quote(value, safe='~')
+
+_normalized_urls = {}
+
+def normalize_url(url):
+    """normalize_url(url) -> url without query, lower case host and without
+    the default port, as it is signed"""
+    normalized = _normalized_urls.get(url)
+    if normalized is None:
+        parts = urlparse(url)
+        scheme, netloc = parts[0].lower(), parts[1].lower()
+        if ((scheme == 'http' and netloc.endswith(':80')) or
+            (scheme == 'https' and netloc.endswith(':443'))):
+            netloc = netloc.rsplit(':', 1)[0]
+        normalized = '%s://%s%s'%(scheme, netloc, parts[2])
+        if len(_normalized_urls) >= MAX_NORMALIZED_URLS:
+            _normalized_urls.clear()
+        _normalized_urls[url] = normalized
+    return normalized
+
+class RequestSigner(object):
+    """Signs requests for a consumer and an optional token with HMAC-SHA1.
+
+    Parameters:
+        consumer - OAuthConsumer, with key and secret.
+
+        token - OAuthToken or None.
+    """
+
+    def __init__(self, consumer, token=None):
+        key = '%s&%s'%(escape(consumer.secret), token is not None and escape(token.secret) or '')
+        self._hmac = hmac.new(key, digestmod=sha1)
+        static = [('oauth_consumer_key', consumer.key),
+                  ('oauth_signature_method', SIGNATURE_METHOD),
+                  ('oauth_version', '1.0')]
+        if token is not None:
+            static.append(('oauth_token', token.key))
+        self._static = [(escape(name), escape(value)) for name, value in static]
+
+    def _signed(self, http_method, url, parameters):
+        encoded = self._static + [('oauth_nonce', str(random.getrandbits(48))),
+                                  ('oauth_timestamp', str(int(time.time())))]
+        if parameters:
+            encoded.extend([(escape(name), escape(value))
+                            for name, value in parameters.iteritems()])
+        encoded.sort()
+        normalized = '&'.join(['%s=%s'%pair for pair in encoded])
+        digest = self._hmac.copy()
+        digest.update('%s&%s&%s'%(escape(http_method.upper()),
+                                  escape(normalize_url(url)),
+                                  escape(normalized)))
+        signature = binascii.b2a_base64(digest.digest())[:-1]
+        return encoded, normalized, escape(signature)
+
+    def sign(self, http_method, url, parameters=None):
+        """sign(http_method, url, parameters=None) -> encoded parameters
+
+        Returns the parameters with the oauth ones and the signature, percent
+        encoded and joined with &, ready for the query string or the body of
+        a POST. url should not have a query string.
+        """
+        encoded, normalized, signature = self._signed(http_method, url, parameters)
+        return '%s&oauth_signature=%s'%(normalized, signature)
+
+    def authorization(self, http_method, url, realm=''):
+        """authorization(http_method, url, realm='') -> Authorization header
+
+        Signs a request whose parameters are not signed, like the fields of
+        a multipart/form-data body, and returns the value of the OAuth
+        Authorization header.
+        """
+        encoded, normalized, signature = self._signed(http_method, url, None)
+        encoded.append(('oauth_signature', signature))
+        return 'OAuth realm="%s", %s'%(realm, ', '.join(['%s="%s"'%pair for pair in encoded]))
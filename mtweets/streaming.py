@@ -17,8 +17,9 @@ and stream api doc:
 __author__ = "Luis C. Cruz <carlitos.kyo@gmail.com>"
 __version__ = "0.1"
 
-import httplib, urllib, urllib2, mimetypes, mimetools
+import time, socket, httplib, urllib, urllib2, mimetypes, mimetools
 
+from threading import Event
 from threading import Thread
 
 from urlparse import urlparse
@@ -27,22 +28,249 @@ from urllib2 import HTTPError
 from mtweets.utils import AuthError
 from mtweets.utils import RequestError
 from mtweets.utils import TwitterClient
+from mtweets.decoding import LazyStatus
+from mtweets.concurrency import iter_prefetched
+
+def _iter_delimited(stream):
+    """Yields the statuses of a delimited=length stream.
+    
+    Each status is preceded by its length in bytes and a newline, so the
+    body is taken with a single read of exactly that size instead of
+    scanning it for the end of line. Keep-alive newlines are skipped.
+    """
+    readline = stream.readline
+    read = stream.read
+    while True:
+        line = readline()
+        if not line:
+            return
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            size = int(line)
+        except ValueError:
+            # the stream lost its framing, drop it like a broken connection
+            raise httplib.HTTPException("delimited stream: invalid length %r"%(line))
+        data = read(size)
+        if len(data) < size:
+            return
+        yield data
+
+def _iter_frames(stream, delimited=None):
+    """Yields the raw statuses of stream according to its delimited mode."""
+    if delimited == 'length':
+        return _iter_delimited(stream)
+    return iter(stream)
+
+class ReconnectPolicy(object):
+    """Reconnects a dropped stream following twitter's backoff advice.
+    
+    Network errors back off linearly from 250ms up to 16 seconds, HTTP
+    errors exponentially from 10 seconds up to 240 seconds (from 60 seconds
+    for 420 rate limited responses). The delay is reset once a connection
+    succeeds.
+    
+    The policy keeps an estimate of the statuses received per second and the
+    time of the last status, with backfill=True the reconnection requests
+    the estimated backlog with the count parameter (only allowed on firehose,
+    sample and elevated filter roles).
+    
+    Parameters:
+        backfill - Request the missed statuses with count on reconnect.
+        
+        max_backfill - Upper bound of count.
+        
+        max_retries - Attempts for a single disconnection, None retries
+                      forever.
+        
+        on_disconnect - callback(error) called when the stream drops, error
+                        is None when the server closed it cleanly.
+        
+        on_reconnect - callback(attempts, count) called after reconnecting,
+                       count is the backfill requested or None.
+    """
+    
+    def __init__(self, backfill=False, max_backfill=150000, max_retries=None,
+                 on_disconnect=None, on_reconnect=None):
+        self.backfill = backfill
+        self.max_backfill = max_backfill
+        self.max_retries = max_retries
+        self.on_disconnect = on_disconnect
+        self.on_reconnect = on_reconnect
+        
+        self.rate = None
+        self.last_status_time = None
+        self.disconnections = 0
+        self._window_start = time.time()
+        self._window_count = 0
+        self._attempts = 0
+        self._delay = 0
+    
+    def received(self):
+        """Notifies a status, updates the statuses per second estimate."""
+        now = time.time()
+        self.last_status_time = now
+        self._window_count += 1
+        elapsed = now - self._window_start
+        if elapsed >= 1.0:
+            rate = self._window_count / elapsed
+            if self.rate is None:
+                self.rate = rate
+            else:
+                self.rate = 0.8 * self.rate + 0.2 * rate
+            self._window_start = now
+            self._window_count = 0
+    
+    def backlog(self):
+        """backlog() -> estimated number of statuses missed or None"""
+        if not self.backfill or self.rate is None or self.last_status_time is None:
+            return None
+        missed = int(self.rate * (time.time() - self.last_status_time))
+        return max(1, min(missed, self.max_backfill))
+    
+    def disconnected(self, error):
+        self.disconnections += 1
+        self._attempts = 0
+        self._delay = 0
+        if self.on_disconnect is not None:
+            self.on_disconnect(error)
+    
+    def next_delay(self, error):
+        """next_delay(error) -> seconds to wait or None to give up"""
+        if self.max_retries is not None and self._attempts >= self.max_retries:
+            return None
+        self._attempts += 1
+        if isinstance(error, HTTPError):
+            if self._delay < 10:
+                self._delay = error.code == 420 and 60 or 10
+            else:
+                self._delay = min(self._delay * 2, 240)
+        else:
+            self._delay = min(self._delay + 0.25, 16)
+        return self._delay
+    
+    def reconnected(self, count):
+        if self.on_reconnect is not None:
+            self.on_reconnect(self._attempts, count)
+        self._attempts = 0
+        self._delay = 0
+
+# errors that drop a stream
+_STREAM_ERRORS = (socket.error, httplib.HTTPException, urllib2.URLError)
+
+class _StreamReader(object):
+    """Iterates over the raw statuses of a stream.
+    
+    With a reconnect policy the stream is opened again, through
+    open_stream(parameters), when the connection drops. With a recorder
+    (see mtweets.replay) every frame read is recorded too.
+    """
+    
+    def __init__(self, stream, delimited=None, recorder=None):
+        self.stream = stream
+        self.delimited = delimited
+        self.recorder = recorder
+        self.reconnect = None
+        self.closed = Event()
+    
+    def set_reconnect(self, policy, open_stream, parameters):
+        self.reconnect = policy
+        self.__open_stream = open_stream
+        self.__parameters = parameters
+    
+    def __iter__(self):
+        while self.stream is not None:
+            error = None
+            try:
+                for frame in self._frames():
+                    yield frame
+            except _STREAM_ERRORS, e:
+                error = e
+            except Exception:
+                # reading a stream closed by close() fails
+                if not self.closed.isSet():
+                    raise
+            if self.closed.isSet():
+                break
+            if self.reconnect is None:
+                if error is not None:
+                    raise error
+                break
+            self._close_stream()
+            self.reconnect.disconnected(error)
+            self.stream = self._reopen(error)
+    
+    def _frames(self):
+        frames = _iter_frames(self.stream, self.delimited)
+        if self.recorder is not None:
+            frames = self.recorder.tee(frames)
+        if self.reconnect is None:
+            return frames
+        return self._count_frames(frames)
+    
+    def _count_frames(self, frames):
+        received = self.reconnect.received
+        for frame in frames:
+            if frame.strip():
+                received()
+            yield frame
+    
+    def _reopen(self, error):
+        while True:
+            delay = self.reconnect.next_delay(error)
+            if delay is None:
+                return None
+            self.closed.wait(delay)
+            if self.closed.isSet():
+                return None
+            parameters = dict(self.__parameters)
+            count = self.reconnect.backlog()
+            if count is not None:
+                parameters['count'] = count
+            try:
+                stream = self.__open_stream(parameters)
+            except _STREAM_ERRORS, e:
+                error = e
+                continue
+            self.reconnect.reconnected(count)
+            return stream
+    
+    def _close_stream(self):
+        stream = self.stream
+        if stream is not None and not getattr(stream, 'closed', False):
+            stream.close()
+    
+    def close(self):
+        self.closed.set()
+        self._close_stream()
 
 class _Producer(Thread):
     """Simple thread that notify and sends new tweets to a reiciver.
+    
+    With a dispatcher the lines are pushed to its buffer and the callback
+    runs in the dispatcher workers instead of this thread.
     """
     
-    def set_stream_callback(self, stream, callback):
-        self.__stream = stream
+    def set_stream_callback(self, reader, callback, dispatcher=None):
+        self.__reader = reader
         self.__callback = callback
+        self.dispatcher = dispatcher
         
     def run(self):
-        for line in self.__stream:
-            self.__callback(line)
+        if self.dispatcher is None:
+            for line in self.__reader:
+                self.__callback(line)
+            return
+        self.dispatcher.start(self.__callback)
+        try:
+            for line in self.__reader:
+                self.dispatcher.put(line)
+        finally:
+            self.dispatcher.close()
     
     def close_stream(self):
-        if not self.__stream.closed:
-            self.__stream.close()
+        self.__reader.close()
 
 class Stream(TwitterClient):
     """ This handle simple authentication flow.
@@ -80,13 +308,69 @@ class Stream(TwitterClient):
     >>> api.firehorse(callback)
     
     where callback will reicive new tweets from the stream. 
+    
+    Set recorder to a mtweets.replay.StreamRecorder to save the raw frames
+    of the streams opened by this instance.
     """
     
+    recorder = None
+    
+    ############################################################################
+    ## Producer
+    ############################################################################
+    
+    def _open_reader(self, name, endpoint, reconnect, parameters):
+        if not self.is_authorized():
+            raise AuthError("%s(): requires you to be authenticated"%(name))
+        def open_stream(parameters):
+            return self.fetch_endpoint(endpoint, (), parameters)
+        try:
+            reader = _StreamReader(open_stream(parameters), parameters.get('delimited'),
+                                   self.recorder)
+        except HTTPError, e:
+            raise RequestError("%s(): %s"%(name, e.msg), e.code)
+        if reconnect is not None:
+            reader.set_reconnect(reconnect, open_stream, parameters)
+        return reader
+    
+    def _start_producer(self, name, endpoint, callback, dispatcher, reconnect,
+                        parameters):
+        p = _Producer()
+        p.set_stream_callback(self._open_reader(name, endpoint, reconnect, parameters),
+                              callback, dispatcher)
+        p.start()
+        return p
+    
+    def _iter_stream(self, name, endpoint, decode, prefetch, reconnect, parameters):
+        reader = self._open_reader(name, endpoint, reconnect, parameters)
+        return self._iter_statuses(reader, decode, prefetch)
+    
+    def _iter_statuses(self, reader, decode, prefetch):
+        frames = iter(reader)
+        if prefetch:
+            frames = iter_prefetched(frames, prefetch)
+        loads = self.decoder.loads
+        try:
+            for frame in frames:
+                if not frame.strip():
+                    continue
+                if decode == 'lazy':
+                    yield LazyStatus(frame, loads)
+                elif decode:
+                    status = loads(frame)
+                    if self.models:
+                        status = self.model_parser.parse(status)
+                    yield status
+                else:
+                    yield frame
+        finally:
+            reader.close()
+    
     ############################################################################
     ## Feeds implementation
     ############################################################################
     
-    def filter(self, callback, **kwargs):
+    def filter(self, callback, dispatcher=None, reconnect=None, **kwargs):
         """filter()
 
         Returns public statuses that match one or more filter predicates. At
@@ -104,6 +388,15 @@ class Stream(TwitterClient):
         statuses before limiting the stream.
         
         Parameters:
+            dispatcher - Optional StreamDispatcher. The lines are pushed to its
+                         bounded buffer and the callback runs in its worker
+                         threads, so a slow callback does not stall the
+                         reading of the stream.
+                         
+            reconnect - Optional ReconnectPolicy. Without it the producer
+                        thread ends when the connection drops, with it the
+                        stream is opened again with backoff (and backfill).
+                        
             count - Indicates the number of previous statuses to consider for
                     delivery before transitioning to live stream delivery. On
                     unfiltered streams, all considered statuses are delivered,
@@ -122,7 +415,9 @@ class Stream(TwitterClient):
                         stream. Statuses are represented by a length, in bytes,
                         a newline, and the status text that is exactly length
                         bytes. Note that "keep-alive" newlines may be inserted
-                        before each length.
+                        before each length. With delimited="length" the stream
+                        is read by frames and the callback receives each
+                        status without the length prefix.
                         
             follow - Returns public statuses that reference the given set of
                      users. Users specified by a comma separated list.
@@ -154,18 +449,9 @@ class Stream(TwitterClient):
                     The phrase, excluding quotes, "hard alee" won't match anything.
                     The keyword "helm's-alee" will match helm's-alee but not #helm's-alee.
         """
-        if self.is_authorized():
-            try:
-                p = _Producer()
-                p.set_stream_callback(self.fetch_resource("http://stream.twitter.com/statuses/filter.json", kwargs, 'POST'), callback)
-                p.start()
-                return p
-            except HTTPError, e:
-                raise RequestError("filter(): %s"%(e.msg), e.code)
-        else:
-            raise AuthError("filter(): requires you to be authenticated")
+        return self._start_producer("filter", "filter", callback, dispatcher, reconnect, kwargs)
         
-    def firehose(self, callback, **kwargs):
+    def firehose(self, callback, dispatcher=None, reconnect=None, **kwargs):
         """firehose()
 
         Returns all public statuses. The Firehose is not a generally available
@@ -174,6 +460,15 @@ class Stream(TwitterClient):
         nearly every application use case.
         
         Parameters:
+            dispatcher - Optional StreamDispatcher. The lines are pushed to its
+                         bounded buffer and the callback runs in its worker
+                         threads, so a slow callback does not stall the
+                         reading of the stream.
+                         
+            reconnect - Optional ReconnectPolicy. Without it the producer
+                        thread ends when the connection drops, with it the
+                        stream is opened again with backoff (and backfill).
+                        
             count - Indicates the number of previous statuses to consider for
                     delivery before transitioning to live stream delivery. On
                     unfiltered streams, all considered statuses are delivered,
@@ -192,20 +487,13 @@ class Stream(TwitterClient):
                         stream. Statuses are represented by a length, in bytes,
                         a newline, and the status text that is exactly length
                         bytes. Note that "keep-alive" newlines may be inserted
-                        before each length.
+                        before each length. With delimited="length" the stream
+                        is read by frames and the callback receives each
+                        status without the length prefix.
         """
-        if self.is_authorized():
-            try:
-                p = _Producer()
-                p.set_stream_callback(self.fetch_resource("http://stream.twitter.com/statuses/firehose.json", kwargs), callback)
-                p.start()
-                return p
-            except HTTPError, e:
-                raise RequestError("firehose(): %s"%(e.msg), e.code)
-        else:
-            raise AuthError("firehose(): requires you to be authenticated")
+        return self._start_producer("firehose", "firehose", callback, dispatcher, reconnect, kwargs)
         
-    def retweet(self, callback, **kwargs):
+    def retweet(self, callback, dispatcher=None, reconnect=None, **kwargs):
         """retweet()
 
         Returns all retweets. The retweet stream is not a generally available
@@ -214,24 +502,26 @@ class Stream(TwitterClient):
         nearly every application use case.
         
         Parameters:
+            dispatcher - Optional StreamDispatcher. The lines are pushed to its
+                         bounded buffer and the callback runs in its worker
+                         threads, so a slow callback does not stall the
+                         reading of the stream.
+                         
+            reconnect - Optional ReconnectPolicy. Without it the producer
+                        thread ends when the connection drops, with it the
+                        stream is opened again with backoff (and backfill).
+                        
             delimited - Indicates that statuses should be delimited in the
                         stream. Statuses are represented by a length, in bytes,
                         a newline, and the status text that is exactly length
                         bytes. Note that "keep-alive" newlines may be inserted
-                        before each length.
+                        before each length. With delimited="length" the stream
+                        is read by frames and the callback receives each
+                        status without the length prefix.
         """
-        if self.is_authorized():
-            try:
-                p = _Producer()
-                p.set_stream_callback(self.fetch_resource("http://stream.twitter.com/statuses/retweet.json", kwargs), callback)
-                p.start()
-                return p
-            except HTTPError, e:
-                raise RequestError("retweet(): %s"%(e.msg), e.code)
-        else:
-            raise AuthError("retweet(): requires you to be authenticated")
+        return self._start_producer("retweet", "retweet", callback, dispatcher, reconnect, kwargs)
         
-    def sample(self, callback, **kwargs):
+    def sample(self, callback, dispatcher=None, reconnect=None, **kwargs):
         """sample()
 
         Returns a random sample of all public statuses. The default access level
@@ -241,6 +531,15 @@ class Stream(TwitterClient):
         significant sample.
         
         Parameters:
+            dispatcher - Optional StreamDispatcher. The lines are pushed to its
+                         bounded buffer and the callback runs in its worker
+                         threads, so a slow callback does not stall the
+                         reading of the stream.
+                         
+            reconnect - Optional ReconnectPolicy. Without it the producer
+                        thread ends when the connection drops, with it the
+                        stream is opened again with backoff (and backfill).
+                        
             count - Indicates the number of previous statuses to consider for
                     delivery before transitioning to live stream delivery. On
                     unfiltered streams, all considered statuses are delivered,
@@ -259,16 +558,104 @@ class Stream(TwitterClient):
                         stream. Statuses are represented by a length, in bytes,
                         a newline, and the status text that is exactly length
                         bytes. Note that "keep-alive" newlines may be inserted
-                        before each length.
+                        before each length. With delimited="length" the stream
+                        is read by frames and the callback receives each
+                        status without the length prefix.
         """
-        if self.is_authorized():
-            try:
-                p = _Producer()
-                p.set_stream_callback(self.fetch_resource("http://stream.twitter.com/statuses/sample.json", kwargs), callback)
-                p.start()
-                return p
-            except HTTPError, e:
-                raise RequestError("sample(): %s"%(e.msg), e.code)
-        else:
-            raise AuthError("sample(): requires you to be authenticated")
+        return self._start_producer("sample", "sample", callback, dispatcher, reconnect, kwargs)
 
+    ############################################################################
+    ## Iterators
+    ############################################################################
+    
+    def iter_filter(self, decode=True, prefetch=0, reconnect=None, **kwargs):
+        """iter_filter()
+        
+        Same stream of filter() as a generator, the statuses are read,
+        framed and decoded in the thread that iterates.
+        
+        >>> for status in stream.iter_filter():
+        ...     handle(status)
+        
+        Parameters:
+            decode - True yields decoded statuses (models when the client has
+                     models=True), 'lazy' yields LazyStatus objects and False
+                     the raw frames. Keep-alive newlines are skipped.
+            
+            prefetch - Number of frames read ahead by a background thread, 0
+                       reads in the caller's thread.
+            
+            reconnect - Optional ReconnectPolicy, see filter().
+            
+            Any other parameter is the same of filter().
+        """
+        return self._iter_stream("iter_filter", "filter", decode, prefetch, reconnect, kwargs)
+    
+    def iter_firehose(self, decode=True, prefetch=0, reconnect=None, **kwargs):
+        """iter_firehose()
+        
+        Same stream of firehose() as a generator, the statuses are read,
+        framed and decoded in the thread that iterates.
+        
+        >>> for status in stream.iter_firehose():
+        ...     handle(status)
+        
+        Parameters:
+            decode - True yields decoded statuses (models when the client has
+                     models=True), 'lazy' yields LazyStatus objects and False
+                     the raw frames. Keep-alive newlines are skipped.
+            
+            prefetch - Number of frames read ahead by a background thread, 0
+                       reads in the caller's thread.
+            
+            reconnect - Optional ReconnectPolicy, see firehose().
+            
+            Any other parameter is the same of firehose().
+        """
+        return self._iter_stream("iter_firehose", "firehose", decode, prefetch, reconnect, kwargs)
+    
+    def iter_retweet(self, decode=True, prefetch=0, reconnect=None, **kwargs):
+        """iter_retweet()
+        
+        Same stream of retweet() as a generator, the statuses are read,
+        framed and decoded in the thread that iterates.
+        
+        >>> for status in stream.iter_retweet():
+        ...     handle(status)
+        
+        Parameters:
+            decode - True yields decoded statuses (models when the client has
+                     models=True), 'lazy' yields LazyStatus objects and False
+                     the raw frames. Keep-alive newlines are skipped.
+            
+            prefetch - Number of frames read ahead by a background thread, 0
+                       reads in the caller's thread.
+            
+            reconnect - Optional ReconnectPolicy, see retweet().
+            
+            Any other parameter is the same of retweet().
+        """
+        return self._iter_stream("iter_retweet", "retweet", decode, prefetch, reconnect, kwargs)
+    
+    def iter_sample(self, decode=True, prefetch=0, reconnect=None, **kwargs):
+        """iter_sample()
+        
+        Same stream of sample() as a generator, the statuses are read,
+        framed and decoded in the thread that iterates.
+        
+        >>> for status in stream.iter_sample():
+        ...     handle(status)
+        
+        Parameters:
+            decode - True yields decoded statuses (models when the client has
+                     models=True), 'lazy' yields LazyStatus objects and False
+                     the raw frames. Keep-alive newlines are skipped.
+            
+            prefetch - Number of frames read ahead by a background thread, 0
+                       reads in the caller's thread.
+            
+            reconnect - Optional ReconnectPolicy, see sample().
+            
+            Any other parameter is the same of sample().
+        """
+        return self._iter_stream("iter_sample", "sample", decode, prefetch, reconnect, kwargs)
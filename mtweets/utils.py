@@ -6,14 +6,27 @@ Twitter's API has evolved a bit. Here's hoping this helps.
 """
 
 import functools
+import urllib
 import urllib2
 
 from urllib2 import HTTPError
 
-try:
-    import simplejson
-except ImportError:
-    raise Exception("mtweets requires the simplejson library (or Python 2.6) to work. http://www.undefined.org/python/")
+from mtweets.connection import ConnectionPool
+from mtweets.connection import KeepAliveHandler
+from mtweets.connection import KeepAliveHTTPSHandler
+from mtweets.ratelimit import RateLimiter
+from mtweets.ratelimit import rate_limit_family
+from mtweets.cache import CACHE_TTLS
+from mtweets.cache import cache_key
+from mtweets.decoding import get_decoder
+from mtweets.models import ModelParser
+from mtweets.endpoints import ENDPOINTS
+from mtweets.endpoints import AUTH_NONE
+from mtweets.endpoints import AUTH_OPTIONAL
+from mtweets.endpoints import AUTH_REQUIRED
+from mtweets.signing import RequestSigner
+from mtweets.signing import normalize_url
+from mtweets.multipart import MultipartBody
 
 try:
     from oauth import OAuthClient
@@ -32,7 +45,10 @@ except ImportError:
 class TwitterClient(OAuthClient):
     
     def __init__(self, oauth_params, user_agent=None, desktop=False,
-                 force_login=False, proxy=None, version=1):
+                 force_login=False, proxy=None, version=1,
+                 connection_pool=None, rate_limiter=None, cache=None,
+                 cache_ttls=None, decoder=None, models=False, base_urls=None,
+                 scheme=None):
         """
         Instantiates an instance of mtweets. Takes optional parameters for
         authentication and such (see below).
@@ -64,30 +80,80 @@ class TwitterClient(OAuthClient):
 
         ** Note: versioning is not currently used by search.twitter functions; 
            when Twitter moves their junk, it'll be supported.
+
+        connection_pool - ConnectionPool instance used to keep alive the
+                          connections to twitter hosts. Defaults to a new pool,
+                          pass the same pool to many clients to share it.
+
+        rate_limiter - RateLimiter instance that tracks the X-RateLimit-*
+                       headers and delays the requests before the budget is
+                       exhausted. Defaults to a new RateLimiter.
+
+        cache - MemoryCache, FileCache or any object with get(key) and
+                set(key, data, ttl) used to cache the responses of read only
+                methods. Disabled by default.
+
+        cache_ttls - dict {method name: seconds} that overrides the default
+                     time to live of the cached methods, 0 disables the
+                     cache of a method.
+
+        decoder - JSONDecoder used to decode the responses, defaults to the
+                  fastest JSON library installed.
+
+        models - Return compact Status, User, DirectMessage, List, Place and
+                 Trend objects instead of dicts. Every resource method also
+                 accepts models=True/False to choose it for a single call.
+
+        base_urls - dict {host: base url} that sends the requests for the
+                    twitter hosts somewhere else, like a regional proxy, a
+                    caching gateway or a local mtweets.fakeserver (its
+                    base_urls()). The requests are still signed for the
+                    twitter url, the one the gateway forwards them to. See
+                    mtweets.endpoints.
+
+        scheme - 'http' or 'https' for all the twitter hosts not listed in
+                 base_urls, by default each endpoint uses its own scheme.
         """
         # setting super class variables
         OAuthClient.__init__(self, OAuthConsumer(*oauth_params), None)
         
+        # subclass variables
+        self.apiVersion = version
+        self.scheme = scheme
+        self.base_urls = dict((host, url.rstrip('/')) for host, url in (base_urls or {}).items())
+        self._bases = {}
+        self._urls = {}
+        
         # setting the the needed urls
-        self._url_request       = "https://api.twitter.com/oauth/request_token"
-        self._url_access        = "https://api.twitter.com/oauth/access_token"
-        self._url_autorize      = "https://api.twitter.com/oauth/authorize"
-        self._url_authenticate  = "https://api.twitter.com/oauth/authenticate"
+        self._url_request       = self.endpoint_url('request_token')
+        self._url_access        = self.endpoint_url('access_token')
+        self._url_autorize      = self.endpoint_url('authorize')
+        self._url_authenticate  = self.endpoint_url('authenticate')
         
         self._signature_method = OAuthSignatureMethod_HMAC_SHA1()
+        self._signers = {}
         
-        # subclass variables
-        self.apiVersion = version
         self.proxy = proxy
         self.user_agent = user_agent
         self.desktop = desktop
         self.force_login = force_login
         
+        self.connection_pool = connection_pool or ConnectionPool()
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.cache = cache
+        self.decoder = decoder or get_decoder()
+        self.models = models
+        self.model_parser = ModelParser()
+        self.cache_ttls = dict(CACHE_TTLS)
+        if cache_ttls is not None:
+            self.cache_ttls.update(cache_ttls)
+        handlers = [KeepAliveHandler(self.connection_pool),
+                    KeepAliveHTTPSHandler(self.connection_pool)]
+        
         if self.proxy is not None:
             self.proxyobj = urllib2.ProxyHandler({'http': 'http://%s:%s@%s:%d'%(self.proxy["username"], self.proxy["password"], self.proxy["host"], self.proxy["port"])})
-            self.opener = urllib2.build_opener(self.proxyobj)
-        else:
-            self.opener = urllib2.build_opener()
+            handlers.append(self.proxyobj)
+        self.opener = urllib2.build_opener(*handlers)
             
         if self.user_agent is not None:
             self.opener.addheaders = [('User-agent', self.user_agent)]
@@ -131,6 +197,114 @@ class TwitterClient(OAuthClient):
                                                     token=self.token,
                                                     parameters=parameters,
                                                     http_method=http_method)
+    
+    def get_signer(self):
+        """get_signer() -> RequestSigner of the current consumer and token
+        
+        The signers are kept per (consumer, token) so the HMAC key and the
+        static oauth parameters are prepared once for each pair.
+        """
+        consumer, token = self.consumer, self.token
+        key = (consumer.key, consumer.secret,
+               token is not None and (token.key, token.secret) or None)
+        signer = self._signers.get(key)
+        if signer is None:
+            signer = self._signers[key] = RequestSigner(consumer, token)
+        return signer
+    
+    def sign(self, url, parameters=None, http_method='GET'):
+        """sign(url, parameters=None, http_method='GET') -> encoded parameters
+        
+        Fast signing path, the same HMAC-SHA1 signature as
+        _get_resource_request() and sign_request() without building an
+        OAuthRequest. Returns the query string, or body of a POST.
+        """
+        return self.get_signer().sign(http_method, url, parameters)
+    
+    def fetch_resource(self, url, parameters=None, http_method='GET',
+                       signed_url=None):
+        """Sign the request and open it with self.opener so every resource
+        goes through the keep-alive connection pool. signed_url is the url
+        of the signature when the request is sent to another one."""
+        query = self.sign(signed_url or url, parameters, http_method)
+        if http_method == 'POST':
+            return self.opener.open(normalize_url(url), query)
+        return self.opener.open('%s?%s'%(normalize_url(url), query))
+    
+    ############################################################################
+    ## Endpoints
+    ############################################################################
+    
+    def _base_url(self, endpoint):
+        key = (endpoint.host, endpoint.scheme)
+        base = self._bases.get(key)
+        if base is None:
+            base = self.base_urls.get(endpoint.host)
+            if base is None:
+                base = '%s://%s'%(self.scheme or endpoint.scheme, endpoint.host)
+            self._bases[key] = base
+        return base
+    
+    def endpoint_url(self, name, args=(), version=None):
+        """endpoint_url(name, args=(), version=None) -> url
+        
+        Url of the endpoint registered as name for this client, the urls
+        without arguments are built once.
+        """
+        version = version or self.apiVersion
+        if args:
+            endpoint = ENDPOINTS[name]
+            return endpoint.url(self._base_url(endpoint), version, args)
+        url = self._urls.get((name, version))
+        if url is None:
+            endpoint = ENDPOINTS[name]
+            url = self._urls[(name, version)] = endpoint.url(self._base_url(endpoint), version)
+        return url
+    
+    def signed_url(self, name, args=(), version=None):
+        """signed_url(name, args=(), version=None) -> url
+        
+        Twitter url of the endpoint, the one its requests are signed for
+        even when base_urls sends them somewhere else.
+        """
+        endpoint = ENDPOINTS[name]
+        if endpoint.host not in self.base_urls:
+            return self.endpoint_url(name, args, version)
+        base = '%s://%s'%(self.scheme or endpoint.scheme, endpoint.host)
+        return endpoint.url(base, version or self.apiVersion, args)
+    
+    def fetch_endpoint(self, name, args=(), parameters=None, version=None):
+        """fetch_endpoint(name, args=(), parameters=None, version=None) -> response
+        
+        Requests an endpoint with its HTTP method, signed unless the endpoint
+        does not use authentication.
+        """
+        url = self.endpoint_url(name, args, version)
+        endpoint = ENDPOINTS[name]
+        if endpoint.auth is AUTH_NONE:
+            if parameters:
+                url = '%s?%s'%(url, urllib.urlencode(parameters))
+            return self.opener.open(url)
+        return self.fetch_resource(url, parameters, endpoint.http_method,
+                                   self.signed_url(name, args, version))
+    
+    def fetch_multipart(self, name, fields=(), files=(), version=None):
+        """fetch_multipart(name, fields=(), files=(), version=None) -> response
+        
+        Posts a multipart/form-data body to an endpoint, see MultipartBody
+        for fields and files. The files are streamed from disk and the OAuth
+        parameters go in the Authorization header, the form fields are not
+        part of the signature.
+        """
+        url = self.endpoint_url(name, (), version)
+        body = MultipartBody(fields, files)
+        authorization = self.get_signer().authorization(ENDPOINTS[name].http_method,
+                                                        self.signed_url(name, (), version))
+        request = urllib2.Request(normalize_url(url), body,
+                                  {'Content-Type': body.content_type,
+                                   'Content-Length': str(len(body)),
+                                   'Authorization': authorization})
+        return self.opener.open(request)
 
 ############################################################################
 ## Exceptions
@@ -144,6 +318,9 @@ class RequestError(Exception):
     def __str__(self):
         return "Error code: %s -> %s"%(self.error_code, self.msg)
 
+class RateLimitError(RequestError):
+    pass
+
 class AuthError(Exception):
     def __init__(self, msg):
         self.msg = msg
@@ -155,23 +332,57 @@ class AuthError(Exception):
 ## Decorators
 ############################################################################
 
-def authentication_required(func):
-    @functools.wraps(func)
-    def wrapper(self, *args, **kwargs):
-        if self.is_authorized():
-            try:
-                return simplejson.load(func(self, *args, **kwargs))
-            except HTTPError, e:
-                raise RequestError("%s(): %s"%(func.__name__, e.msg), e.code)
-        else:
-            raise AuthError("%s(): requires you to be authenticated"%(func.__name__))
+def _fetch_json(self, func, args, kwargs):
+    models = kwargs.pop('models', self.models)
+    ttl = self.cache is not None and self.cache_ttls.get(func.__name__)
+    if ttl:
+        key = cache_key(self, func.__name__, args, kwargs)
+        data = self.cache.get(key)
+        if data is None:
+            data = _fetch(self, func, args, kwargs).read()
+            self.cache.set(key, data, ttl)
+        data = self.decoder.loads(data)
+    else:
+        data = self.decoder.load(_fetch(self, func, args, kwargs))
+    if models:
+        return self.model_parser.parse(data)
+    return data
+
+def _fetch(self, func, args, kwargs):
+    family = rate_limit_family(func.__name__)
+    if not self.rate_limiter.acquire(family):
+        raise RateLimitError("%s(): %s rate limit exhausted"%(func.__name__, family), 400)
+    try:
+        response = func(self, *args, **kwargs)
+    except HTTPError, e:
+        self.rate_limiter.update(family, e.info())
+        raise RequestError("%s(): %s"%(func.__name__, e.msg), e.code)
+    self.rate_limiter.update(family, response.info())
+    return response
+
+def _resource(func, auth):
+    """Wraps a resource method, the endpoint registered with the name of the
+    method decides if it requires authentication."""
+    endpoint = ENDPOINTS.get(func.__name__)
+    if endpoint is not None:
+        auth = endpoint.auth
+    if auth == AUTH_REQUIRED:
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if self.is_authorized():
+                return _fetch_json(self, func, args, kwargs)
+            else:
+                raise AuthError("%s(): requires you to be authenticated"%(func.__name__))
+    else:
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            return _fetch_json(self, func, args, kwargs)
+    wrapper.resource = True
+    wrapper.endpoint = endpoint
     return wrapper
 
+def authentication_required(func):
+    return _resource(func, AUTH_REQUIRED)
+
 def simple_decorator(func):
-    @functools.wraps(func)
-    def wrapper(self, *args, **kwargs):
-        try:               
-            return simplejson.load(func(self, *args, **kwargs))
-        except HTTPError, e:
-            raise RequestError("%s(): %s"%(func.__name__, e.msg), e.code)
-    return wrapper
\ No newline at end of file
+    return _resource(func, AUTH_OPTIONAL)
@@ -12,7 +12,24 @@ METADATA = dict(
     py_modules = ['mtweets/__init__',
                   'mtweets/api',
                   'mtweets/utils',
-                  'mtweets/streaming'],
+                  'mtweets/streaming',
+                  'mtweets/connection',
+                  'mtweets/concurrency',
+                  'mtweets/asyncapi',
+                  'mtweets/paging',
+                  'mtweets/ratelimit',
+                  'mtweets/cache',
+                  'mtweets/dispatch',
+                  'mtweets/decoding',
+                  'mtweets/models',
+                  'mtweets/replay',
+                  'mtweets/fakeserver',
+                  'mtweets/endpoints',
+                  'mtweets/signing',
+                  'mtweets/apipool',
+                  'mtweets/multipart',
+                  'mtweets/batch',
+                  'mtweets/search'],
     author = 'Luis Carlos Cruz',
     author_email = 'carlitos.kyo@gmail.com',
     description = 'An easy (and up to date) way to access Twitter data with Python.',